@@ -8,6 +8,8 @@ from django.db import models
 from imagekit.models import ProcessedImageField
 from imagekit.processors import ResizeToFill
 
+from utils.renditions import add_renditions
+
 
 class User(AbstractUser):
     followings = models.ManyToManyField(
@@ -86,6 +88,9 @@ class User(AbstractUser):
         return followings_and_followers
 
 
+add_renditions(User, "image")
+
+
 class PointLog(models.Model):
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="point_logs"
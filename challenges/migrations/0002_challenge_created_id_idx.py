@@ -0,0 +1,17 @@
+# Generated by Django 3.2.18 on 2026-10-20 00:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('challenges', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='challenge',
+            index=models.Index(fields=['created', 'id'], name='challenge_created_id_idx'),
+        ),
+    ]
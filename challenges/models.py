@@ -5,6 +5,8 @@ from django.db import models
 from imagekit.models import ProcessedImageField
 from imagekit.processors import ResizeToFill
 
+from utils.renditions import add_renditions
+
 
 class Challenge(models.Model):
     title = models.CharField(max_length=200)
@@ -18,6 +20,12 @@ class Challenge(models.Model):
     # superuser만 등록하게 하려면 코드 추가해야하나 테스트 편의성을 위해 나중 추가
     creator = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            # 상세 페이지 이전/다음 챌린지 (utils.pagination.adjacent_objects)
+            models.Index(fields=["created", "id"], name="challenge_created_id_idx"),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -41,6 +49,9 @@ class ChallengeImage(models.Model):
         super(ChallengeImage, self).delete(*args, **kargs)
 
 
+add_renditions(ChallengeImage, "image")
+
+
 class Certification(models.Model):
     challenge = models.ForeignKey(
         Challenge, on_delete=models.CASCADE, related_name="certifications"
@@ -57,3 +68,6 @@ class Certification(models.Model):
     image = ProcessedImageField(
         upload_to=certification_image_path, blank=True, null=True
     )
+
+
+add_renditions(Certification, "image")
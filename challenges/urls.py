@@ -11,6 +11,7 @@ path('<int:challenge_pk>/update/', views.update, name='update'),
 path('<int:challenge_pk>/delete/', views.delete, name='delete'),
 path('<int:challenge_pk>/create/', views.certification_create, name='certification_create'),
 path('<int:challenge_pk>/<int:certification_pk>/update/', views.certification_update, name='certification_update'),
+path('<int:challenge_pk>/<int:certification_pk>/update/form/', views.certification_update_form, name='certification_update_form'),
 path('<int:challenge_pk>/<int:certification_pk>/delete/', views.certification_delete, name='certification_delete'),
 path('<int:challenge_pk>/participation/', views.participation, name='participation'),
 path('<int:challenge_pk>/join/', views.join_challenge, name='join'),
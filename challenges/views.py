@@ -5,9 +5,11 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 from django.http import HttpResponseForbidden, JsonResponse
-from django.shortcuts import redirect, render
+from django.shortcuts import get_object_or_404, redirect, render
 from pytz import timezone
 
+from utils.pagination import adjacent_objects
+
 from .forms import (
     CertificationForm,
     ChallengeForm,
@@ -59,8 +61,12 @@ def detail(request, challenge_pk):
         <= challenge.end_date.date()
     )
     challenge_images = ChallengeImage.objects.filter(challenge=challenge_pk)
+    previous_challenge, next_challenge = adjacent_objects(
+        challenge, Challenge.objects.only("id", "title"), "created"
+    )
     certification_form = CertificationForm()
-    certifications = challenge.certifications.all()
+    # 수정 폼은 certification_update_form 에서 필요할 때만 만든다
+    certifications = challenge.certifications.select_related("user")
     days_remaining = calculate_remaining_days(challenge.end_date.date())
     ended = False
     is_participant = request.user in challenge.participants.all()
@@ -80,20 +86,11 @@ def detail(request, challenge_pk):
         d_day_string = "종료되었습니다."
     else:
         d_day_string = f"D-{days_remaining}"
-    u_certification_forms = []
-
-    for certification in certifications:
-        u_certification_form = (
-            certification,
-            CertificationForm(instance=certification),
-        )
-        u_certification_forms.append(u_certification_form)
 
     context = {
         "challenge": challenge,
         "challenge_images": challenge_images,
         "certification_form": certification_form,
-        "u_certification_forms": u_certification_forms,
         "certifications": certifications,
         "days_remaining": days_remaining,
         "ended": ended,
@@ -102,6 +99,8 @@ def detail(request, challenge_pk):
         "certified_users": certified_users,
         "is_participant": is_participant,
         "in_progress": in_progress,
+        "previous_challenge": previous_challenge,
+        "next_challenge": next_challenge,
     }
 
     return render(request, "challenges/detail.html", context)
@@ -243,6 +242,21 @@ def certification_update(request, challenge_pk, certification_pk):
     return render(request, "challenges/detail.html", context)
 
 
+@login_required
+def certification_update_form(request, challenge_pk, certification_pk):
+    certification = get_object_or_404(
+        Certification, pk=certification_pk, challenge_id=challenge_pk
+    )
+    if request.user != certification.user:
+        return HttpResponseForbidden()
+    context = {
+        "challenge_pk": challenge_pk,
+        "certification": certification,
+        "u_certification_form": CertificationForm(instance=certification),
+    }
+    return render(request, "challenges/certification_update_form.html", context)
+
+
 @login_required
 def certification_delete(request, challenge_pk, certification_pk):
     certification = Certification.objects.filter(pk=certification_pk).first()
@@ -0,0 +1,160 @@
+"""
+보관 기간(CHAT_ARCHIVE_AFTER_DAYS)이 지난 채팅 메시지를 방별/월별 gzip JSON Lines
+파일(CHAT_ARCHIVE_ROOT/<방 id>/<YYYY-MM>.jsonl.gz)로 옮긴다.
+
+- 배치마다 파일 끝에 gzip member 를 하나 덧붙이고, 같은 트랜잭션에서
+  ArchivedSegment 의 범위와 member 위치(members)를 기록한 뒤 메시지를 삭제한다.
+  트랜잭션이 실패해 파일에만 남은 member 는 members 에 없으므로 읽히지 않는다.
+- 방의 마지막 메시지(채팅 목록 표시용)는 옮기지 않는다.
+- 메시지 API 는 DB 에 남은 메시지를 다 읽으면 이어서 보관 파일을 읽는다. 파일 전체
+  대신 필요한 member(최대 batch_size 개 메시지)만 seek 해서 푼다.
+"""
+import gzip
+import json
+import os
+from collections import defaultdict
+from datetime import date, datetime
+
+from django.db import router, transaction
+from django.db.models import prefetch_related_objects
+
+from .models import ArchivedSegment, Message
+
+
+def _append(path, messages):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lines = [
+        json.dumps(
+            {
+                "id": message.id,
+                "seq": message.seq,
+                "sender_id": message.sender_id,
+                "content": message.content,
+                "attachment_id": message.attachment_id,
+                "timestamp": message.timestamp.isoformat(),
+            },
+            ensure_ascii=False,
+        )
+        for message in messages
+    ]
+    data = gzip.compress(("\n".join(lines) + "\n").encode("utf-8"))
+    with open(path, "ab") as f:
+        offset = f.tell()
+        f.write(data)
+    return [offset, len(data), messages[0].id, messages[-1].id]
+
+
+def _members(segment):
+    if segment.members:
+        return segment.members
+    # members 를 기록하기 전에 만든 파일은 통째로 하나의 member 로 읽음
+    return [[0, None, segment.first_id, segment.last_id]]
+
+
+def _read(segment, member):
+    offset, length, first_id, last_id = member
+    try:
+        with open(segment.file_path(), "rb") as f:
+            f.seek(offset)
+            data = f.read(length) if length is not None else f.read()
+    except FileNotFoundError:
+        return []
+    messages = []
+    for line in gzip.decompress(data).decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if first_id <= record["id"] <= last_id:
+            messages.append(
+                Message(
+                    id=record["id"],
+                    chat_room_id=segment.chat_room_id,
+                    sender_id=record["sender_id"],
+                    content=record["content"],
+                    attachment_id=record.get("attachment_id"),
+                    seq=record["seq"],
+                    timestamp=datetime.fromisoformat(record["timestamp"]),
+                )
+            )
+    return messages
+
+
+def archive_room(chat_room, cutoff, batch_size=1000):
+    """chat_room 에서 cutoff 이전에 보낸 메시지를 보관 파일로 옮기고 옮긴 개수를 반환"""
+    messages = Message.objects.filter(chat_room=chat_room)
+    # id 순서로 잘라서, 보관된 메시지는 항상 DB 에 남은 메시지보다 오래되도록 함
+    boundary = (
+        messages.filter(timestamp__gte=cutoff)
+        .order_by("id")
+        .values_list("id", flat=True)
+        .first()
+    )
+    if boundary is not None:
+        messages = messages.filter(id__lt=boundary)
+    if chat_room.last_message_id:
+        messages = messages.exclude(id=chat_room.last_message_id)
+
+    archived = 0
+    while True:
+        batch = list(messages.order_by("id")[:batch_size])
+        if not batch:
+            return archived
+        by_month = defaultdict(list)
+        for message in batch:
+            month = date(message.timestamp.year, message.timestamp.month, 1)
+            by_month[month].append(message)
+
+        with transaction.atomic(using=router.db_for_write(Message)):
+            for month, month_messages in by_month.items():
+                segment, _ = ArchivedSegment.objects.get_or_create(
+                    chat_room=chat_room,
+                    month=month,
+                    defaults={
+                        "first_id": month_messages[0].id,
+                        "last_id": month_messages[-1].id,
+                        "last_seq": 0,
+                    },
+                )
+                segment.members.append(_append(segment.file_path(), month_messages))
+                segment.first_id = min(segment.first_id, month_messages[0].id)
+                segment.last_id = max(segment.last_id, month_messages[-1].id)
+                segment.last_seq = max(
+                    [segment.last_seq] + [message.seq for message in month_messages]
+                )
+                segment.message_count += len(month_messages)
+                segment.save()
+            Message.objects.filter(id__in=[message.id for message in batch]).delete()
+        archived += len(batch)
+
+
+def read_archived_messages(chat_room, before=None, limit=30):
+    """보관 파일에서 id 가 before 보다 작은 메시지를 최신순으로 최대 limit 개 반환"""
+    segments = chat_room.archived_segments.all()
+    if before:
+        segments = segments.filter(first_id__lt=before)
+    members = sorted(
+        (
+            (segment, member)
+            for segment in segments
+            for member in _members(segment)
+            if before is None or member[2] < int(before)
+        ),
+        key=lambda item: item[1][3],
+        reverse=True,
+    )
+
+    messages = {}
+    for index, (segment, member) in enumerate(members):
+        for message in _read(segment, member):
+            if before is None or message.id < int(before):
+                messages[message.id] = message
+        # 월 경계에서 범위가 겹칠 수 있으므로 다음 member 에 더 최신 메시지가 없을 때만 멈춤
+        if len(messages) >= limit:
+            newest = sorted(messages, reverse=True)[:limit]
+            next_member = members[index + 1][1] if index + 1 < len(members) else None
+            if next_member is None or next_member[3] < newest[-1]:
+                break
+
+    messages = [messages[key] for key in sorted(messages, reverse=True)[:limit]]
+    prefetch_related_objects(messages, "sender", "attachment")
+    return messages
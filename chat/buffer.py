@@ -0,0 +1,123 @@
+"""
+채팅 메시지 write-behind 버퍼 (settings.CHAT_WRITE_BEHIND 가 True 일 때 사용).
+
+메시지는 받는 즉시 순번(seq)을 받아 방 group 으로 broadcast 되고, 저장은 이 버퍼에
+쌓였다가 CHAT_WRITE_BEHIND_MAX_MESSAGES 개가 모이거나 CHAT_WRITE_BEHIND_MAX_DELAY_MS
+가 지날 때마다 한 트랜잭션으로 한다. SQLite 에서는 메시지마다 열던 쓰기 트랜잭션이
+배치당 하나로 줄어든다.
+
+순번은 ChatRoom.allocate_seq 로 방마다 여러 개를 한 번에 예약해 두고 메모리에서 나눠준다.
+- 예약 크기는 그 방의 직전 저장 주기 메시지 수 (조용한 방은 1개, 최대 MAX_MESSAGES 개)
+- 한 저장 주기 동안 메시지가 없던 방의 남은 예약 번호는 돌려준다
+  (ChatRoom.release_seq). 그 사이 다른 daphne 프로세스가 같은 방에서 번호를
+  예약했으면 돌려줄 수 없어 빈 번호로 남는다.
+- 여러 프로세스가 같은 방에 동시에 메시지를 보내면 각자 예약한 번호를 쓰므로
+  순번이 받은 순서와 조금 어긋날 수 있다 (클라이언트는 순번 순서로 보여줌).
+- ChatRoom.last_seq 는 저장된 메시지의 마지막 순번만 가리키므로 예약만 된 번호는
+  안 읽은 수에 포함되지 않는다.
+
+내구성:
+- 저장 전(최대 MAX_MESSAGES 개 또는 MAX_DELAY_MS)에 프로세스가 죽으면 이미 전달된
+  메시지라도 저장되지 않는다. 새로고침하면 사라지고 그 순번은 빈 번호로 남는다.
+- 소켓이 끊길 때마다 버퍼를 비우므로 정상 종료 시에는 유실되지 않는다.
+- 저장이 실패한 배치는 로그만 남기고 버린다 (재시도하면 같은 오류가 반복됨).
+- 채팅 목록의 마지막 메시지와 보낸 사람의 읽음 위치는 배치가 저장될 때 반영된다.
+- 재접속 시 replay_since 는 이 프로세스의 버퍼를 비우고 MAX_DELAY_MS 만큼 기다려
+  다른 프로세스의 버퍼도 저장된 뒤에 조회한다. 그 프로세스의 저장이 더 늦어지면
+  그 사이 메시지는 새로고침해야 보인다.
+"""
+import asyncio
+import logging
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import router, transaction
+
+from .models import ChatRoom, Message
+
+logger = logging.getLogger(__name__)
+
+
+class MessageBuffer:
+    def __init__(self, max_messages, max_delay_ms):
+        self.max_messages = max_messages
+        self.max_delay = max_delay_ms / 1000
+        self.pending = []
+        # 방마다 예약해 둔 순번 [다음에 줄 번호, 예약한 마지막 번호]
+        self.blocks = {}
+        # 방마다 이번 / 직전 저장 주기에 받은 메시지 수 (예약 크기)
+        self.counts = {}
+        self.rates = {}
+        self._timer = None
+        self._lock = None
+        self._reserve_locks = {}
+
+    async def next_seq(self, chat_room_id):
+        lock = self._reserve_locks.setdefault(chat_room_id, asyncio.Lock())
+        async with lock:
+            count = self.counts.get(chat_room_id, 0) + 1
+            self.counts[chat_room_id] = count
+            block = self.blocks.get(chat_room_id)
+            if block is None or block[0] > block[1]:
+                size = min(
+                    self.max_messages, max(count, self.rates.get(chat_room_id, 1))
+                )
+                last = await database_sync_to_async(ChatRoom.allocate_seq)(
+                    chat_room_id, size
+                )
+                block = self.blocks[chat_room_id] = [last - size + 1, last]
+            seq = block[0]
+            block[0] += 1
+            return seq
+
+    async def add(self, message):
+        """message 에 순번을 배정하고 저장은 나중에 (broadcast 는 바로 가능)"""
+        message.seq = await self.next_seq(message.chat_room_id)
+        self.pending.append(message)
+        if len(self.pending) >= self.max_messages:
+            # 보낸 사람이 저장을 기다리지 않도록 따로 실행
+            asyncio.get_running_loop().create_task(self.flush())
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        # 예약이 남아 있는 동안은 주기마다 저장하면서 한가해진 방의 예약을 돌려줌
+        while True:
+            await asyncio.sleep(self.max_delay)
+            await self.flush()
+            if not self.blocks:
+                return
+
+    def _save(self, messages, released):
+        with transaction.atomic(using=router.db_for_write(Message)):
+            if messages:
+                Message.bulk_create_in_rooms(messages)
+            for chat_room_id, (next_seq, reserved) in released.items():
+                if next_seq <= reserved:
+                    ChatRoom.release_seq(chat_room_id, reserved, next_seq - 1)
+
+    async def flush(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # 배치끼리 순서가 섞이지 않도록 한 번에 하나씩 저장
+        async with self._lock:
+            batch, self.pending = self.pending, []
+            # 이번 주기에 메시지가 없던 방의 예약만 돌려줌
+            # (계속 쓰이는 방은 주기마다 새로 예약하지 않도록 유지)
+            released = {
+                chat_room_id: self.blocks.pop(chat_room_id)
+                for chat_room_id in list(self.blocks)
+                if not self.counts.get(chat_room_id)
+            }
+            self.rates, self.counts = self.counts, {}
+            if not batch and not released:
+                return
+            try:
+                await database_sync_to_async(self._save)(batch, released)
+            except Exception:
+                logger.exception("채팅 메시지 %d개 저장 실패", len(batch))
+
+
+message_buffer = MessageBuffer(
+    settings.CHAT_WRITE_BEHIND_MAX_MESSAGES, settings.CHAT_WRITE_BEHIND_MAX_DELAY_MS
+)
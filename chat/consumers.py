@@ -1,86 +1,286 @@
+import asyncio
 import json
+from urllib.parse import parse_qs
 
 from channels.db import database_sync_to_async
+from channels.exceptions import ChannelFull
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
-from .models import ChatRoom, Message, Notification
+from .buffer import message_buffer
+from .events import group_send_many, notification_group_name, room_group_name
+from .models import ArchivedSegment, ChatRoom, Message, MessageAttachment
+from .presence import presence_registry, typing_coalescer
+
+# 재접속 시 한 번에 다시 보내주는 최대 메시지 수 (넘으면 새로고침 요청)
+REPLAY_LIMIT = 200
+
+
+def message_payload(event):
+    return {
+        "id": event["id"],
+        "seq": event["seq"],
+        "message": event["message"],
+        "sender": event["sender"],
+        "formatted_timestamp": event["formatted_timestamp"],
+        "sender_image_url": event["sender_image_url"],
+        "attachment": event["attachment"],
+    }
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
-        self.room_name = self.scope["url_route"]["kwargs"]["room_name"]
-        self.room_group_name = "chat_%s" % self.room_name
-        # 한글이라 깨지는 문제 발생 해결
-        self.room_group_name = "aa"
-        # name = [ord(char) for char in self.room_name]
-        # b = ''
-        # for a in name:
-        #     b += str(a)
-
-        # self.room_group_name = f'chat{b}'
+        self.room_id = int(self.scope["url_route"]["kwargs"]["room_id"])
+        user = self.scope["user"]
+        # 방과 참여자는 연결할 때 한 번만 조회하고, 참여자가 아니면 거절
+        room = await self.get_room()
+        if room is None or user.id not in room[1]:
+            await self.close()
+            return
+        self.room_name, self.participant_ids = room
+        self.room_group_name = room_group_name(self.room_id)
 
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
         await self.accept()
 
+        # ?since=<seq> 로 재접속하면 놓친 메시지부터 보내고 실시간 전송을 이어감
+        # (group 에 먼저 들어가므로 빠지는 메시지는 없고, 중복은 클라이언트가 seq 로 거름)
+        since = parse_qs(self.scope["query_string"].decode()).get("since")
+        if since and since[0].isdigit():
+            await self.replay_since(int(since[0]))
+
+        # 현재 접속 상태를 보내고, sync 로 다른 참여자들에게 상태를 다시 알려달라고 요청
+        presence_registry.connect(self.room_group_name, user.id)
+        for presence in presence_registry.snapshot(self.room_group_name):
+            await self.send(text_data=json.dumps({"presence": presence}))
+        self.presence_status = "online"
+        await self.broadcast_presence(sync=True, min_interval=0)
+
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        if hasattr(self, "room_group_name"):
+            user = self.scope["user"]
+            if presence_registry.disconnect(self.room_group_name, user.id):
+                self.presence_status = "offline"
+                await self.broadcast_presence(min_interval=0)
+            await self.channel_layer.group_discard(
+                self.room_group_name, self.channel_name
+            )
+        if settings.CHAT_WRITE_BEHIND:
+            await message_buffer.flush()
 
     async def receive(self, text_data):
         text_data_json = json.loads(text_data)
-        message = text_data_json["message"]
-        sender_image_url, formatted_timestamp = await self.save_message(message)
+        event_type = text_data_json.get("type")
+        if event_type == "heartbeat":
+            status = text_data_json.get("status")
+            self.presence_status = status if status in ("online", "away") else "online"
+            await self.broadcast_presence()
+            return
+        if event_type == "replay":
+            # 클라이언트가 중간에 빠진 순번을 발견하면 그 뒤부터 다시 요청
+            since = text_data_json.get("since")
+            if isinstance(since, int) and since >= 0:
+                await self.replay_since(since)
+            return
+        if event_type == "typing":
+            user = self.scope["user"]
+            await typing_coalescer.add(
+                self.channel_layer, self.room_group_name, user.id, user.first_name
+            )
+            return
 
+        message = text_data_json.get("message", "")
+        # 이미지는 HTTP 로 먼저 올리고 id 만 받음 (websocket 프레임을 작게 유지)
+        attachment_id = text_data_json.get("attachment_id")
+        if not message and not attachment_id:
+            return
+        if settings.CHAT_WRITE_BEHIND:
+            # 순번만 받고 바로 전달, 저장은 버퍼가 나중에 한 번에
+            await self.buffer_message(message, attachment_id)
+            return
+        new_message, recipient_ids = await self.save_message(message, attachment_id)
+        if new_message is None:
+            return
+        await self.deliver(new_message, recipient_ids)
+
+    async def deliver(self, new_message, recipient_ids):
         await self.channel_layer.group_send(
             self.room_group_name,
+            {"type": "chat_message", **new_message},
+        )
+        # 채팅 목록의 안 읽은 수를 polling 없이 갱신 (받는 사람 전체에 layer 호출 한 번)
+        await group_send_many(
+            self.channel_layer,
+            [notification_group_name(user_id) for user_id in recipient_ids],
             {
-                "type": "chat_message",
-                "message": message,
-                "sender": self.scope["user"].first_name,
-                "sender_image_url": sender_image_url,
-                "formatted_timestamp": formatted_timestamp,
+                "type": "unread_update",
+                "room_id": new_message["chat_room_id"],
+                "room_name": self.room_name,
+                "unread_delta": 1,
+                "last_message": new_message["message"] or Message.ATTACHMENT_PREVIEW,
+                "last_message_timestamp": new_message["formatted_timestamp"],
             },
         )
 
     async def chat_message(self, event):
-        message = event["message"]
-        sender = event["sender"]
-        sender_image_url = event["sender_image_url"]
-        formatted_timestamp = event["formatted_timestamp"]
+        await self.send(text_data=json.dumps(message_payload(event)))
 
+    async def replay_since(self, since):
+        if settings.CHAT_WRITE_BEHIND:
+            # 아직 버퍼에 있는 메시지도 조회되도록 먼저 저장하고,
+            # 다른 프로세스의 버퍼가 저장될 때까지 한 주기 기다림
+            await message_buffer.flush()
+            await asyncio.sleep(message_buffer.max_delay)
+        messages = await self.get_messages_since(since)
+        if messages is None or len(messages) > REPLAY_LIMIT:
+            await self.send(text_data=json.dumps({"reload": True}))
+            return
+        for message in messages:
+            await self.send(text_data=json.dumps(message_payload(message)))
+        # 여기까지 비어 있는 순번은 저장되지 않은 메시지이므로 기다리지 않도록 알림
+        replayed = messages[-1]["seq"] if messages else since
+        await self.send(text_data=json.dumps({"replayed": replayed}))
+
+    def presence_event(self, sync=False):
+        user = self.scope["user"]
+        return {
+            "type": "presence",
+            "user_id": user.id,
+            "user": user.first_name,
+            "status": self.presence_status,
+            "ttl": presence_registry.ttl,
+            # sync 이면 받은 소켓들이 이 채널로만 자기 상태를 답장
+            "reply_to": self.channel_name if sync else None,
+        }
+
+    async def broadcast_presence(self, sync=False, min_interval=None):
+        user = self.scope["user"]
+        if not presence_registry.should_broadcast(
+            self.room_group_name, user.id, self.presence_status, min_interval
+        ):
+            return
+        await self.channel_layer.group_send(
+            self.room_group_name, self.presence_event(sync=sync)
+        )
+
+    async def presence(self, event):
+        presence_registry.update(self.room_group_name, event)
+        if event["reply_to"] and event["user_id"] != self.scope["user"].id:
+            # 새로 들어온 소켓에게만 내 상태를 알림 (방 전체에 다시 보내지 않음)
+            try:
+                await self.channel_layer.send(event["reply_to"], self.presence_event())
+            except ChannelFull:
+                pass
         await self.send(
             text_data=json.dumps(
                 {
-                    "message": message,
-                    "sender": sender,
-                    "formatted_timestamp": formatted_timestamp,
-                    "sender_image_url": sender_image_url,
+                    "presence": {
+                        "user_id": event["user_id"],
+                        "user": event["user"],
+                        "status": event["status"],
+                        "ttl": event["ttl"],
+                    }
                 }
             )
         )
 
+    async def typing(self, event):
+        await self.send(text_data=json.dumps({"typing": event["users"]}))
+
+    async def participants_changed(self, event):
+        self.participant_ids = set(event["participant_ids"])
+        if self.scope["user"].id not in self.participant_ids:
+            await self.close()
+
+    @database_sync_to_async
+    def get_room(self):
+        chat_room = ChatRoom.objects.filter(pk=self.room_id).first()
+        if chat_room is None:
+            return None
+        participant_ids = set(chat_room.memberships.values_list("user_id", flat=True))
+        return chat_room.name, participant_ids
+
     @database_sync_to_async
-    def save_message(self, message):
-        chat_room = ChatRoom.objects.get(name=self.room_name)
+    def get_messages_since(self, since):
+        # 놓친 메시지 중 일부가 이미 보관 파일로 옮겨졌으면 새로고침으로 처리
+        if ArchivedSegment.objects.filter(
+            chat_room_id=self.room_id, last_seq__gt=since
+        ).exists():
+            return None
+        messages = (
+            Message.objects.filter(chat_room_id=self.room_id, seq__gt=since)
+            .select_related("attachment")
+            .prefetch_related("sender")
+            .order_by("seq")
+        )
+        return [message.as_dict() for message in messages[: REPLAY_LIMIT + 1]]
+
+    def get_attachment(self, attachment_id):
+        # 이 방에 본인이 올린 첨부만 사용할 수 있음 (id 는 JSON 정수만 허용)
+        if not isinstance(attachment_id, int) or isinstance(attachment_id, bool):
+            return None
+        return MessageAttachment.objects.filter(
+            pk=attachment_id, chat_room_id=self.room_id, uploader=self.scope["user"]
+        ).first()
+
+    @database_sync_to_async
+    def save_message(self, message, attachment_id=None):
+        chat_room = ChatRoom(pk=self.room_id, name=self.room_name)
         sender = self.scope["user"]
-        new_message = Message(chat_room=chat_room, sender=sender, content=message)
-        new_message.save()
-        formatted_timestamp = new_message.formatted_timestamp()
-        sender_image_url = (
-            str(sender.image.url)
-            if sender.image
-            else "/static/img/accounts/no-image-icon-21.png"
+        recipient_ids = list(self.participant_ids - {sender.id})
+        attachment = self.get_attachment(attachment_id)
+        if not message and attachment is None:
+            return None, []
+        new_message = Message.create_in_room(
+            chat_room, sender, message, attachment=attachment
         )
-        participants = chat_room.participants.exclude(id=sender.id)
-        for participant in participants:
-            notification = Notification(
-                user=participant, chat_room=chat_room, message=new_message
-            )
-            notification.save()
-        return sender_image_url, formatted_timestamp
+        return new_message.as_dict(), recipient_ids
+
+    async def buffer_message(self, message, attachment_id=None):
+        sender = self.scope["user"]
+        recipient_ids = list(self.participant_ids - {sender.id})
+        attachment = await database_sync_to_async(self.get_attachment)(attachment_id)
+        if not message and attachment is None:
+            return
+        new_message = Message(
+            chat_room_id=self.room_id,
+            sender=sender,
+            content=message,
+            attachment=attachment,
+            timestamp=timezone.now(),
+        )
+        await message_buffer.add(new_message)
+        await self.deliver(new_message.as_dict(), recipient_ids)
 
     @database_sync_to_async
     def get_or_create_room(self, user_ids):
         users = get_user_model().objects.filter(id__in=user_ids)
         chat_room = ChatRoom.get_or_create_chat_room(users)
         return chat_room
+
+
+class NotificationConsumer(AsyncWebsocketConsumer):
+    async def connect(self):
+        user = self.scope["user"]
+        if not user.is_authenticated:
+            await self.close()
+            return
+        self.group_name = notification_group_name(user.id)
+
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if hasattr(self, "group_name"):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def unread_update(self, event):
+        await self.send(text_data=json.dumps(event))
+
+    async def new_room(self, event):
+        await self.send(text_data=json.dumps(event))
+
+    async def room_removed(self, event):
+        await self.send(text_data=json.dumps(event))
@@ -0,0 +1,32 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+
+def room_group_name(room_id):
+    # 방 이름은 겹칠 수 있으므로 pk 로 구분
+    return "chat_%s" % room_id
+
+
+def notification_group_name(user_id):
+    return "chat_user_%s" % user_id
+
+
+async def group_send_many(channel_layer, groups, event):
+    # SQLiteChannelLayer 는 모든 group 을 한 번에 쓰고, 그 외 layer 는 group 마다 전송
+    send_many = getattr(channel_layer, "group_send_many", None)
+    if send_many is not None:
+        await send_many(groups, event)
+        return
+    for group in groups:
+        await channel_layer.group_send(group, event)
+
+
+def notify_users(user_ids, event):
+    # view 등 동기 코드에서 사용자별 알림 소켓으로 이벤트 전송
+    groups = [notification_group_name(user_id) for user_id in user_ids]
+    async_to_sync(group_send_many)(get_channel_layer(), groups, event)
+
+
+def send_to_room(room_id, event):
+    channel_layer = get_channel_layer()
+    async_to_sync(channel_layer.group_send)(room_group_name(room_id), event)
@@ -0,0 +1,17 @@
+from django import forms
+
+from .models import MessageAttachment
+
+MAX_ATTACHMENT_SIZE = 10 * 1024 * 1024
+
+
+class MessageAttachmentForm(forms.ModelForm):
+    class Meta:
+        model = MessageAttachment
+        fields = ("image",)
+
+    def clean_image(self):
+        image = self.cleaned_data["image"]
+        if image.size > MAX_ATTACHMENT_SIZE:
+            raise forms.ValidationError("10MB 이하의 이미지만 올릴 수 있습니다.")
+        return image
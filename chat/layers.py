@@ -0,0 +1,292 @@
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import string
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channel_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    process TEXT NOT NULL,
+    body TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS channel_messages_process ON channel_messages (process, id);
+CREATE INDEX IF NOT EXISTS channel_messages_channel ON channel_messages (channel);
+CREATE TABLE IF NOT EXISTS channel_groups (
+    group_name TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (group_name, channel)
+);
+"""
+
+
+class SQLiteChannelLayer(BaseChannelLayer):
+    """
+    같은 호스트의 여러 daphne 프로세스가 하나의 SQLite 파일을 브로커로 공유하는
+    channel layer.
+
+    프로세스마다 고유한 prefix 를 가진 채널 이름을 발급하고, 프로세스당 하나의
+    poller 가 자기 prefix 로 온 메시지를 한 번에 가져와 소켓별 큐에 나눠준다.
+    메시지는 JSON 으로 저장하므로 dict/list/str/int 등 기본 타입만 보낼 수 있다.
+    """
+
+    extensions = ["groups", "flush"]
+
+    def __init__(
+        self,
+        path="channels.sqlite3",
+        expiry=60,
+        group_expiry=86400,
+        capacity=100,
+        channel_capacity=None,
+        poll_interval=0.05,
+        batch_size=100,
+        **kwargs,
+    ):
+        super().__init__(
+            expiry=expiry,
+            capacity=capacity,
+            channel_capacity=channel_capacity,
+            **kwargs,
+        )
+        self.channel_capacity = self.compile_capacities(self.channel_capacity)
+        self.path = str(path)
+        self.group_expiry = group_expiry
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.client_prefix = "".join(
+            random.choice(string.ascii_letters) for _ in range(12)
+        )
+        self.receive_buffer = {}
+        self._poller = None
+        self._local = threading.local()
+        self._last_cleanup = 0
+
+    # DB helpers (항상 thread pool 에서 실행)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    async def _run(self, func, *args):
+        return await sync_to_async(func, thread_sensitive=False)(*args)
+
+    def _insert(self, channels, body):
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = []
+            for channel in channels:
+                queued = conn.execute(
+                    "SELECT COUNT(*) FROM channel_messages"
+                    " WHERE channel = ? AND expires > ?",
+                    (channel, now),
+                ).fetchone()[0]
+                if queued >= self.get_capacity(channel):
+                    continue
+                rows.append(
+                    (channel, self.non_local_name(channel), body, now + self.expiry)
+                )
+            conn.executemany(
+                "INSERT INTO channel_messages (channel, process, body, expires)"
+                " VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return len(rows)
+
+    def _fetch(self, column, value, limit):
+        conn = self._connection()
+        now = time.time()
+        # 가져갈 메시지가 없으면 쓰기 잠금 없이 읽기만 하고 끝냄
+        # (idle poller 가 group_send 의 INSERT 와 잠금을 다투지 않도록)
+        pending = conn.execute(
+            "SELECT 1 FROM channel_messages"
+            f" WHERE {column} = ? AND expires > ? LIMIT 1",
+            (value, now),
+        ).fetchone()
+        cleanup = now - self._last_cleanup > self.expiry
+        if not pending and not cleanup:
+            return []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT id, channel, body FROM channel_messages"
+                f" WHERE {column} = ? AND expires > ? ORDER BY id LIMIT ?",
+                (value, now, limit),
+            ).fetchall()
+            if rows:
+                conn.execute(
+                    f"DELETE FROM channel_messages WHERE {column} = ? AND id <= ?",
+                    (value, rows[-1][0]),
+                )
+            if cleanup:
+                self._last_cleanup = now
+                conn.execute("DELETE FROM channel_messages WHERE expires < ?", (now,))
+                conn.execute("DELETE FROM channel_groups WHERE expires < ?", (now,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return [(channel, json.loads(body)) for _, channel, body in rows]
+
+    def _group_add(self, group, channel):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO channel_groups (group_name, channel, expires)"
+            " VALUES (?, ?, ?)",
+            (group, channel, time.time() + self.group_expiry),
+        )
+
+    def _group_discard(self, group, channel):
+        self._connection().execute(
+            "DELETE FROM channel_groups WHERE group_name = ? AND channel = ?",
+            (group, channel),
+        )
+
+    def _group_channels(self, groups):
+        placeholders = ", ".join("?" * len(groups))
+        rows = self._connection().execute(
+            "SELECT DISTINCT channel FROM channel_groups"
+            f" WHERE group_name IN ({placeholders}) AND expires > ?",
+            (*groups, time.time()),
+        )
+        return [channel for (channel,) in rows]
+
+    def _flush(self):
+        conn = self._connection()
+        conn.execute("DELETE FROM channel_messages")
+        conn.execute("DELETE FROM channel_groups")
+
+    # Channel layer API
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), "message is not a dict"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        sent = await self._run(self._insert, [channel], json.dumps(message))
+        if not sent:
+            raise ChannelFull(channel)
+
+    async def receive(self, channel):
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        if "!" not in channel:
+            # 일반 채널은 소비자가 여러 프로세스에 있을 수 있어 직접 가져간다
+            while True:
+                rows = await self._run(self._fetch, "channel", channel, 1)
+                if rows:
+                    return rows[0][1]
+                await asyncio.sleep(self.poll_interval)
+
+        queue = self.receive_buffer.get(channel)
+        if queue is None:
+            # DB 에서 가져온 메시지도 채널 용량만큼만 메모리에 쌓음
+            queue = self.receive_buffer[channel] = asyncio.Queue(
+                maxsize=self.get_capacity(channel)
+            )
+        self._ensure_poller()
+        try:
+            return await queue.get()
+        except asyncio.CancelledError:
+            # 소켓이 닫히면 더 이상 받을 곳이 없으므로 버퍼를 정리
+            self.receive_buffer.pop(channel, None)
+            raise
+
+    def _ensure_poller(self):
+        loop = asyncio.get_running_loop()
+        if (
+            self._poller is None
+            or self._poller.done()
+            or self._poller.get_loop() is not loop
+        ):
+            self._poller = loop.create_task(self._poll())
+
+    async def _poll(self):
+        process = self._local_channel_prefix()
+        while self.receive_buffer:
+            try:
+                rows = await self._run(self._fetch, "process", process, self.batch_size)
+            except Exception:
+                # 잠금 timeout 등으로 한 번 실패해도 poller 는 계속 돈다
+                logger.exception("channel layer 메시지 조회 실패")
+                await asyncio.sleep(self.poll_interval)
+                continue
+            for channel, message in rows:
+                queue = self.receive_buffer.get(channel)
+                if queue is None:
+                    continue
+                try:
+                    queue.put_nowait(message)
+                except asyncio.QueueFull:
+                    # 소켓이 못 따라오면 버림 (가득 찬 채널에 group_send 할 때와 동일)
+                    logger.warning("channel %s 가 가득 차 메시지를 버림", channel)
+            if len(rows) < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    def _local_channel_prefix(self):
+        return "specific.%s!" % self.client_prefix
+
+    async def new_channel(self, prefix="specific"):
+        local = "".join(random.choice(string.ascii_letters) for _ in range(12))
+        return "%s%s" % (self._local_channel_prefix(), local)
+
+    # Flush extension
+
+    async def flush(self):
+        self.receive_buffer = {}
+        await self._run(self._flush)
+
+    async def close(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            self._poller = None
+
+    # Groups extension
+
+    async def group_add(self, group, channel):
+        assert self.valid_group_name(group), "Group name not valid"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        await self._run(self._group_add, group, channel)
+
+    async def group_discard(self, group, channel):
+        assert self.valid_channel_name(channel), "Invalid channel name"
+        assert self.valid_group_name(group), "Invalid group name"
+        await self._run(self._group_discard, group, channel)
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), "Message is not a dict"
+        assert self.valid_group_name(group), "Invalid group name"
+        await self.group_send_many([group], message)
+
+    async def group_send_many(self, groups, message):
+        """여러 group 에 같은 메시지를 조회 한 번, 쓰기 트랜잭션 한 번으로 보냄"""
+        assert isinstance(message, dict), "Message is not a dict"
+        groups = list(groups)
+        for group in groups:
+            assert self.valid_group_name(group), "Invalid group name"
+        if not groups:
+            return
+        channels = await self._run(self._group_channels, groups)
+        if channels:
+            # 가득 찬 채널은 건너뛴다 (InMemoryChannelLayer 와 동일)
+            await self._run(self._insert, channels, json.dumps(message))
@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from chat.archive import archive_room
+from chat.models import ChatRoom
+
+
+class Command(BaseCommand):
+    help = "보관 기간이 지난 채팅 메시지를 방별/월별 압축 파일로 옮기고 메시지 테이블에서 삭제합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=settings.CHAT_ARCHIVE_AFTER_DAYS
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        total = 0
+        for chat_room in ChatRoom.objects.only("id", "last_message_id").iterator():
+            archived = archive_room(chat_room, cutoff, options["batch_size"])
+            if archived:
+                self.stdout.write(f"{chat_room.pk}번 방: {archived}개")
+            total += archived
+        self.stdout.write(f"메시지 {total}개를 보관했습니다.")
@@ -0,0 +1,257 @@
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import (
+    override_settings,
+    setup_databases,
+    teardown_databases,
+)
+
+from chat.models import ChatRoom, ChatRoomParticipant, Message
+
+
+class WriteCounter:
+    """모든 DB 연결(스레드별)에서 실행된 INSERT/UPDATE/DELETE 수를 센다."""
+
+    def __init__(self):
+        self.count = 0
+        self.active = False
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.active and sql.lstrip()[:6].upper() in ("INSERT", "UPDATE", "DELETE"):
+            with self.lock:
+                self.count += 1
+        return execute(sql, params, many, context)
+
+    def attach(self, sender, connection, **kwargs):
+        connection.execute_wrappers.append(self)
+
+
+class Command(BaseCommand):
+    help = (
+        "planethelper.asgi 를 프로세스 안에서 띄우고, 테스트 DB 에서 여러 방에 나뉜 "
+        "로그인 사용자들의 채팅 WebSocket 부하(전달 지연, 처리량, DB 쓰기, 연결당 메모리)를 측정합니다."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=100)
+        parser.add_argument("--rooms", type=int, default=10)
+        parser.add_argument("--rate", type=float, default=50, help="전체 초당 전송 메시지 수")
+        parser.add_argument("--duration", type=float, default=10, help="전송 시간(초)")
+        parser.add_argument(
+            "--drain", type=float, default=10, help="전송 후 전달을 기다리는 최대 시간(초)"
+        )
+        parser.add_argument("--write-behind", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["clients"] < options["rooms"]:
+            options["rooms"] = options["clients"]
+
+        # 기본 DB 와 채팅 DB 모두 테스트 DB 로 교체
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with tempfile.TemporaryDirectory() as tmp, override_settings(
+                CHANNEL_LAYERS={
+                    "default": {
+                        "BACKEND": settings.CHANNEL_LAYERS["default"]["BACKEND"],
+                        "CONFIG": {"path": os.path.join(tmp, "channels.sqlite3")},
+                    }
+                },
+                CHAT_WRITE_BEHIND=options["write_behind"],
+            ):
+                cookies, rooms = self.seed(options["clients"], options["rooms"])
+                result = asyncio.run(self.run_load(cookies, rooms, options))
+        finally:
+            teardown_databases(old_config, verbosity=0)
+        self.report(result, options)
+
+    def seed(self, client_count, room_count):
+        User = get_user_model()
+        User.objects.bulk_create(
+            [
+                User(username=f"bench{i}", first_name=f"bench{i}", email=f"{i}@bench")
+                for i in range(client_count)
+            ]
+        )
+        users = list(User.objects.order_by("id"))
+
+        # 사용자를 방마다 고르게 나눔
+        members = [users[i::room_count] for i in range(room_count)]
+        ChatRoom.objects.bulk_create(
+            [
+                ChatRoom(
+                    name=f"bench-room-{i}",
+                    participants_key=ChatRoom.make_participants_key(
+                        [user.id for user in room_users]
+                    ),
+                )
+                for i, room_users in enumerate(members)
+            ]
+        )
+        room_ids = dict(ChatRoom.objects.values_list("name", "id"))
+        ChatRoomParticipant.objects.bulk_create(
+            [
+                ChatRoomParticipant(chat_room_id=room_ids[f"bench-room-{i}"], user=user)
+                for i, room_users in enumerate(members)
+                for user in room_users
+            ]
+        )
+
+        cookies = []
+        rooms = []
+        for i, room_users in enumerate(members):
+            for user in room_users:
+                client = Client()
+                client.force_login(user)
+                cookies.append(client.cookies[settings.SESSION_COOKIE_NAME].value)
+                rooms.append(room_ids[f"bench-room-{i}"])
+        return cookies, rooms
+
+    async def run_load(self, cookies, rooms, options):
+        from planethelper.asgi import application
+
+        room_sizes = {room: rooms.count(room) for room in set(rooms)}
+        sent_at = {}
+        latencies = []
+        state = {"delivered": 0, "last_delivery": 0}
+        all_delivered = asyncio.Event()
+
+        # thread pool 의 DB 연결은 연결 단계에서 만들어지므로 미리 등록
+        writes = WriteCounter()
+        connection_created.connect(writes.attach)
+
+        # 연결 단계: 연결당 메모리 측정
+        tracemalloc.start()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        communicators = []
+        for cookie, room in zip(cookies, rooms):
+            communicator = WebsocketCommunicator(
+                application,
+                f"/ws/chat/{room}/",
+                headers=[
+                    (b"origin", b"http://localhost"),
+                    (b"cookie", f"{settings.SESSION_COOKIE_NAME}={cookie}".encode()),
+                ],
+            )
+            connected, _ = await communicator.connect(timeout=10)
+            if not connected:
+                raise RuntimeError(f"{room} 연결 실패")
+            communicators.append(communicator)
+        memory_per_connection = (
+            tracemalloc.get_traced_memory()[0] - memory_before
+        ) / len(communicators)
+        tracemalloc.stop()
+
+        expected = 0
+
+        async def receive_loop(communicator):
+            while True:
+                data = json.loads(await communicator.receive_from(timeout=3600))
+                started = sent_at.get(data.get("message"))
+                if started is None:
+                    continue
+                now = time.perf_counter()
+                latencies.append((now - started) * 1000)
+                state["delivered"] += 1
+                state["last_delivery"] = now
+                if state["delivered"] >= expected:
+                    all_delivered.set()
+
+        receivers = [
+            asyncio.ensure_future(receive_loop(communicator))
+            for communicator in communicators
+        ]
+
+        # 전송 단계: 전체 --rate 로 클라이언트를 돌아가며 전송
+        message_count_before = await self.message_count()
+        writes.active = True
+        total = int(options["rate"] * options["duration"])
+        expected = sum(room_sizes[rooms[i % len(rooms)]] for i in range(total))
+        start = time.perf_counter()
+        for i in range(total):
+            delay = start + i / options["rate"] - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            content = f"bench {i}"
+            sent_at[content] = time.perf_counter()
+            await communicators[i % len(communicators)].send_to(
+                text_data=json.dumps({"message": content})
+            )
+        send_elapsed = time.perf_counter() - start
+
+        try:
+            await asyncio.wait_for(all_delivered.wait(), options["drain"])
+        except asyncio.TimeoutError:
+            pass
+        elapsed = (state["last_delivery"] or time.perf_counter()) - start
+
+        for receiver in receivers:
+            receiver.cancel()
+        await asyncio.gather(*receivers, return_exceptions=True)
+        for communicator in communicators:
+            await communicator.disconnect()
+        writes.active = False
+        connection_created.disconnect(writes.attach)
+        stored = await self.message_count() - message_count_before
+
+        return {
+            "sent": total,
+            "send_elapsed": send_elapsed,
+            "expected": expected,
+            "delivered": state["delivered"],
+            "elapsed": elapsed,
+            "latencies": sorted(latencies),
+            "writes": writes.count,
+            "stored": stored,
+            "memory_per_connection": memory_per_connection,
+        }
+
+    async def message_count(self):
+        return await database_sync_to_async(Message.objects.count)()
+
+    def report(self, result, options):
+        latencies = result["latencies"]
+
+        def percentile(p):
+            if not latencies:
+                return float("nan")
+            return latencies[max(int(len(latencies) * p) - 1, 0)]
+
+        elapsed = result["elapsed"] or float("nan")
+        self.stdout.write(
+            f"clients={options['clients']} rooms={options['rooms']} "
+            f"rate={options['rate']}/s duration={options['duration']}s "
+            f"write_behind={options['write_behind']}"
+        )
+        self.stdout.write(
+            f"sent            {result['sent']} ({result['sent'] / result['send_elapsed']:.1f} msg/s)"
+        )
+        self.stdout.write(
+            f"delivered       {result['delivered']}/{result['expected']}"
+            f" ({result['delivered'] / elapsed:.1f} msg/s)"
+        )
+        self.stdout.write(
+            f"latency(ms)     p50 {statistics.median(latencies) if latencies else float('nan'):.2f}"
+            f"  p95 {percentile(0.95):.2f}  p99 {percentile(0.99):.2f}"
+        )
+        self.stdout.write(
+            f"db writes       {result['writes']} ({result['writes'] / elapsed:.1f}/s),"
+            f" messages stored {result['stored']}"
+        )
+        self.stdout.write(
+            f"memory/conn     {result['memory_per_connection'] / 1024:.1f} KiB"
+        )
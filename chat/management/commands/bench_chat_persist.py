@@ -0,0 +1,70 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_databases, teardown_databases
+
+from chat.models import ChatRoom, Message
+
+
+class Command(BaseCommand):
+    help = "테스트 DB 에서 채팅 메시지 저장 지연시간을 방 인원수, 메시지 테이블 크기별로 측정합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--room-sizes", default="2,10,50")
+        parser.add_argument("--table-sizes", default="0,10000,100000")
+        parser.add_argument("--messages", type=int, default=200)
+
+    def handle(self, *args, **options):
+        room_sizes = [int(size) for size in options["room_sizes"].split(",")]
+        table_sizes = [int(size) for size in options["table_sizes"].split(",")]
+
+        # 기본 DB 와 채팅 DB 모두 테스트 DB 로 교체
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            self.stdout.write("room_size       messages  p50(ms)  p95(ms)")
+            for table_size in table_sizes:
+                for room_size in room_sizes:
+                    p50, p95 = self.measure(room_size, table_size, options["messages"])
+                    self.stdout.write(
+                        f"{room_size:>9}  {table_size:>13}  {p50:>7.2f}  {p95:>7.2f}"
+                    )
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+    def measure(self, room_size, table_size, count):
+        User = get_user_model()
+        Message.objects.all().delete()
+        ChatRoom.objects.all().delete()
+        User.objects.all().delete()
+
+        User.objects.bulk_create(
+            [
+                User(username=f"bench{i}", first_name=f"bench{i}", email=f"{i}@bench")
+                for i in range(room_size)
+            ]
+        )
+        users = list(User.objects.order_by("id"))
+        chat_room = ChatRoom.get_or_create_chat_room(users)
+        sender = users[0]
+
+        # 기존 메시지 테이블 크기 재현
+        Message.objects.bulk_create(
+            [
+                Message(chat_room=chat_room, sender=sender, content="", seq=seq)
+                for seq in range(1, table_size + 1)
+            ],
+            batch_size=5000,
+        )
+        ChatRoom.objects.filter(pk=chat_room.pk).update(
+            last_seq=table_size, reserved_seq=table_size
+        )
+
+        timings = []
+        for i in range(count):
+            start = time.perf_counter()
+            Message.create_in_room(chat_room, sender, f"message {i}")
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
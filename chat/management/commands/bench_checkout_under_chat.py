@@ -0,0 +1,156 @@
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.test import Client
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from django.urls import reverse
+
+from carts.models import Order
+from chat.models import ChatRoom, Message
+from stores.models import Product, Store
+
+
+class Command(BaseCommand):
+    help = (
+        "파일 기반 테스트 DB 에서 채팅 메시지를 계속 저장하는 동안 결제(order_page + approval) "
+        "지연시간을 측정합니다. 채팅이 기본 DB 를 같이 쓰는 경우(shared)와 "
+        "채팅 DB 를 나눈 경우(separate)를 비교합니다."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--checkouts", type=int, default=100)
+        parser.add_argument("--chat-writers", type=int, default=4)
+        parser.add_argument("--layouts", default="shared,separate")
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            "layout      chat load  checkouts  p50(ms)  p95(ms)  p99(ms)  errors  chat msg/s"
+        )
+        for layout in options["layouts"].split(","):
+            # shared: 라우터 없이 채팅 테이블도 기본 DB 에 둠 (DB 를 나누기 전 구성)
+            if layout == "shared":
+                settings = {"DATABASE_ROUTERS": []}
+                aliases = {DEFAULT_DB_ALIAS}
+            else:
+                settings = {}
+                aliases = set(connections)
+            with tempfile.TemporaryDirectory() as tmp:
+                for alias in aliases:
+                    connections[alias].settings_dict["TEST"]["NAME"] = os.path.join(
+                        tmp, f"{alias}.sqlite3"
+                    )
+                with override_settings(**settings):
+                    old_config = setup_databases(
+                        verbosity=0, interactive=False, aliases=aliases
+                    )
+                    try:
+                        self.run_layout(layout, options)
+                    finally:
+                        teardown_databases(old_config, verbosity=0)
+
+    def run_layout(self, layout, options):
+        client, product = self.seed()
+        chat_room = ChatRoom.objects.get()
+        sender = chat_room.memberships.first().user
+
+        for writers in (0, options["chat_writers"]):
+            stop = threading.Event()
+            sent = [0] * writers
+            threads = [
+                threading.Thread(
+                    target=self.write_chat, args=(chat_room, sender, stop, sent, i)
+                )
+                for i in range(writers)
+            ]
+            for thread in threads:
+                thread.start()
+            start = time.perf_counter()
+            timings, errors = self.measure_checkouts(
+                client, product, options["checkouts"]
+            )
+            elapsed = time.perf_counter() - start
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+            timings.sort()
+            p50 = statistics.median(timings) if timings else float("nan")
+            p95 = timings[int(len(timings) * 0.95) - 1] if timings else float("nan")
+            p99 = timings[int(len(timings) * 0.99) - 1] if timings else float("nan")
+            self.stdout.write(
+                f"{layout:<10}  {writers:>9}  {len(timings):>9}  {p50:>7.2f}  "
+                f"{p95:>7.2f}  {p99:>7.2f}  {errors:>6}  {sum(sent) / elapsed:>10.1f}"
+            )
+
+    def seed(self):
+        User = get_user_model()
+        seller = User.objects.create_user(
+            "bench_seller", "seller@bench", "pw", first_name="bench_seller"
+        )
+        buyer = User.objects.create_user(
+            "bench_buyer", "buyer@bench", "pw", first_name="bench_buyer"
+        )
+        store = Store.objects.create(user=seller, name="bench")
+        product = Product.objects.create(
+            store=store, name="bench", price=10000, category="기타"
+        )
+        ChatRoom.get_or_create_chat_room([seller, buyer])
+
+        client = Client(HTTP_HOST="localhost")
+        client.force_login(buyer)
+        return client, product
+
+    def measure_checkouts(self, client, product, count):
+        timings = []
+        errors = 0
+        for _ in range(count):
+            start = time.perf_counter()
+            try:
+                client.post(
+                    reverse("carts:order_page"),
+                    {"item_check": [product.pk], "input_quantity": [1]},
+                )
+                order = Order.objects.latest("pk")
+                client.post(
+                    reverse("carts:approval"),
+                    json.dumps(
+                        {
+                            "orderId": order.pk,
+                            "pg": "bench",
+                            "orderPostcode": "",
+                            "orderAddress": "",
+                            "orderPhone": "",
+                            "orderEmail": "",
+                            "orderMsg": "",
+                            "receiver": "",
+                            "totalAmount": product.price,
+                            "usePoints": 0,
+                            "finalAmount": product.price,
+                        }
+                    ),
+                    content_type="application/json",
+                )
+            except OperationalError:
+                # database is locked
+                errors += 1
+                continue
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings, errors
+
+    def write_chat(self, chat_room, sender, stop, sent, index):
+        try:
+            while not stop.is_set():
+                try:
+                    Message.create_in_room(chat_room, sender, "bench")
+                except OperationalError:
+                    continue
+                sent[index] += 1
+        finally:
+            connections.close_all()
@@ -0,0 +1,146 @@
+"""
+채팅 DB 를 나누기 전 기본 DB(db.sqlite3)에 있던 채팅 데이터를 채팅 DB 로 옮긴다.
+
+기존 서버를 올릴 때는 다음 순서로 한 번만 실행한다.
+
+1. db.sqlite3 를 백업한다.
+2. python manage.py migrate
+   (chat 앱은 ChatRouter 때문에 기본 DB 에 적용되지 않으므로, 기본 DB 의
+   chat_* 테이블은 0001_initial 스키마 그대로 남는다)
+3. python manage.py migrate --database=chat
+4. python manage.py copy_chat_data
+5. 채팅 화면을 확인한 뒤 필요하면 기본 DB 의 chat_* 테이블을 직접 지운다.
+
+원본 테이블은 현재 모델과 컬럼이 다르므로 ORM 대신 0001 스키마의 컬럼만 SQL 로
+읽는다. 그 뒤에 생긴 값(seq, last_seq, last_message, last_read_seq,
+participants_key)은 0004~0008 migration 의 backfill 과 같은 규칙으로 다시 계산한다.
+"""
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.utils.dateparse import parse_datetime
+
+from chat.models import ChatRoom, ChatRoomParticipant, Message
+
+
+class Command(BaseCommand):
+    help = (
+        "채팅 DB 를 나누기 전 기본 DB 에 저장된 채팅 데이터를 채팅 DB 로 복사합니다. "
+        "migrate, migrate --database=chat 이후 한 번만 실행합니다."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        source = DEFAULT_DB_ALIAS
+        target = router.db_for_write(Message)
+        batch_size = options["batch_size"]
+        if target == source:
+            raise CommandError("채팅 앱이 기본 DB 를 사용하고 있습니다.")
+        if ChatRoom.objects.using(target).exists():
+            raise CommandError("채팅 DB 가 비어 있지 않습니다.")
+
+        connection = connections[source]
+        with connection.cursor() as cursor:
+            tables = set(connection.introspection.table_names(cursor))
+        if "chat_chatroom" not in tables:
+            raise CommandError("기본 DB 에 옮길 채팅 테이블이 없습니다.")
+
+        with transaction.atomic(using=target), connection.cursor() as cursor:
+            cursor.execute("SELECT id, name FROM chat_chatroom ORDER BY id")
+            chat_rooms = [
+                ChatRoom(pk=chat_room_id, name=name)
+                for chat_room_id, name in cursor.fetchall()
+            ]
+            ChatRoom.objects.using(target).bulk_create(chat_rooms, batch_size)
+
+            cursor.execute(
+                "SELECT chatroom_id, user_id FROM chat_chatroom_participants"
+                " ORDER BY id"
+            )
+            memberships = [
+                ChatRoomParticipant(chat_room_id=chat_room_id, user_id=user_id)
+                for chat_room_id, user_id in cursor.fetchall()
+            ]
+
+            # 방마다 id 순서대로 seq 를 1 부터 매긴다 (0006 과 같은 규칙)
+            last_seqs = defaultdict(int)
+            last_messages = {}
+            message_count = 0
+            cursor.execute(
+                "SELECT id, chat_room_id, sender_id, content, timestamp"
+                " FROM chat_message ORDER BY id"
+            )
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                messages = []
+                for message_id, chat_room_id, sender_id, content, timestamp in rows:
+                    if isinstance(timestamp, str):
+                        timestamp = parse_datetime(timestamp)
+                    last_seqs[chat_room_id] += 1
+                    last_messages[chat_room_id] = (message_id, timestamp)
+                    messages.append(
+                        Message(
+                            pk=message_id,
+                            chat_room_id=chat_room_id,
+                            sender_id=sender_id,
+                            content=content,
+                            timestamp=timestamp,
+                            seq=last_seqs[chat_room_id],
+                        )
+                    )
+                Message.objects.using(target).bulk_create(messages)
+                message_count += len(messages)
+
+            # 읽지 않은 알림 수만큼 읽음 위치를 뒤로 (0004, 0007 과 같은 규칙)
+            unread = defaultdict(int)
+            if "chat_notification" in tables:
+                cursor.execute(
+                    "SELECT user_id, chat_room_id, COUNT(*) FROM chat_notification"
+                    " WHERE NOT is_read GROUP BY user_id, chat_room_id"
+                )
+                for user_id, chat_room_id, count in cursor.fetchall():
+                    unread[user_id, chat_room_id] = count
+            for membership in memberships:
+                key = (membership.user_id, membership.chat_room_id)
+                membership.last_read_seq = max(
+                    last_seqs[membership.chat_room_id] - unread[key], 0
+                )
+            ChatRoomParticipant.objects.using(target).bulk_create(
+                memberships, batch_size
+            )
+
+            user_ids = defaultdict(list)
+            for membership in memberships:
+                user_ids[membership.chat_room_id].append(membership.user_id)
+            seen = set()
+            for chat_room in chat_rooms:
+                chat_room.last_seq = chat_room.reserved_seq = last_seqs[chat_room.pk]
+                last_message = last_messages.get(chat_room.pk, (None, None))
+                chat_room.last_message_id, chat_room.last_message_at = last_message
+                key = ChatRoom.make_participants_key(user_ids[chat_room.pk])
+                # 같은 구성원의 방이 여러 개면 먼저 만들어진 방만 key 를 가진다
+                if key in seen:
+                    key = None
+                seen.add(key)
+                chat_room.participants_key = key
+            ChatRoom.objects.using(target).bulk_update(
+                chat_rooms,
+                [
+                    "last_seq",
+                    "reserved_seq",
+                    "last_message",
+                    "last_message_at",
+                    "participants_key",
+                ],
+                batch_size,
+            )
+
+        self.stdout.write(
+            f"채팅방 {len(chat_rooms)}개, 참여자 {len(memberships)}명, "
+            f"메시지 {message_count}개를 복사했습니다."
+        )
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from chat.models import MessageAttachment
+
+
+class Command(BaseCommand):
+    help = "올린 뒤 메시지로 보내지 않은 채팅 첨부 이미지를 파일과 함께 삭제합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours", type=int, default=settings.CHAT_ATTACHMENT_UNUSED_HOURS
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options["hours"])
+        unused = MessageAttachment.objects.filter(attached=False, created_at__lt=cutoff)
+        deleted = 0
+        # post_delete signal 로 원본과 썸네일 파일도 삭제
+        for attachment in unused.iterator():
+            attachment.delete()
+            deleted += 1
+        self.stdout.write(f"첨부 이미지 {deleted}개를 삭제했습니다.")
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.18 on 2026-10-20 00:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_alter_notification_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['chat_room', 'id'], name='chat_message_room_id_idx'),
+        ),
+    ]
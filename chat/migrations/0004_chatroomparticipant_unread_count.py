@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def backfill_counters(apps, schema_editor):
+    ChatRoom = apps.get_model("chat", "ChatRoom")
+    ChatRoomParticipant = apps.get_model("chat", "ChatRoomParticipant")
+    Message = apps.get_model("chat", "Message")
+    Notification = apps.get_model("chat", "Notification")
+
+    for chat_room in ChatRoom.objects.all():
+        last_message = Message.objects.filter(chat_room=chat_room).order_by("-id").first()
+        if last_message:
+            chat_room.last_message = last_message
+            chat_room.last_message_at = last_message.timestamp
+            chat_room.save(update_fields=["last_message", "last_message_at"])
+
+    unread = (
+        Notification.objects.filter(is_read=False)
+        .values("user_id", "chat_room_id")
+        .annotate(count=Count("id"))
+    )
+    for row in unread:
+        ChatRoomParticipant.objects.filter(
+            user_id=row["user_id"], chat_room_id=row["chat_room_id"]
+        ).update(unread_count=row["count"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('chat', '0003_message_chat_message_room_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.message'),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        # 자동 생성된 M2M 테이블을 through 모델로 전환 (테이블은 그대로 사용)
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ChatRoomParticipant',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('chat_room', models.ForeignKey(db_column='chatroom_id', on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='chat.chatroom')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_memberships', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'chat_chatroom_participants',
+                        'unique_together': {('chat_room', 'user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='chatroom',
+                    name='participants',
+                    field=models.ManyToManyField(related_name='chat_rooms', through='chat.ChatRoomParticipant', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='chatroomparticipant',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.18 on 2026-10-20 00:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_chatroomparticipant_unread_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chatroom',
+            name='name',
+            field=models.CharField(blank=True, db_index=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.2.18 on 2026-10-20 00:14
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def backfill_seq(apps, schema_editor):
+    ChatRoom = apps.get_model("chat", "ChatRoom")
+    Message = apps.get_model("chat", "Message")
+
+    for chat_room in ChatRoom.objects.all():
+        seq = 0
+        for message in Message.objects.filter(chat_room=chat_room).order_by("id"):
+            seq += 1
+            message.seq = seq
+            message.save(update_fields=["seq"])
+        chat_room.last_seq = seq
+        chat_room.save(update_fields=["last_seq"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_alter_chatroom_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_seq',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='seq',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.RunPython(backfill_seq, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='message',
+            constraint=models.UniqueConstraint(fields=('chat_room', 'seq'), name='chat_message_room_seq_uniq'),
+        ),
+    ]
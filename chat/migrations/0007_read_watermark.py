@@ -0,0 +1,40 @@
+# Generated by Django 3.2.18 on 2026-10-20 00:16
+
+from django.db import migrations, models
+
+
+def backfill_last_read_seq(apps, schema_editor):
+    ChatRoomParticipant = apps.get_model("chat", "ChatRoomParticipant")
+
+    for membership in ChatRoomParticipant.objects.select_related("chat_room"):
+        membership.last_read_seq = max(
+            membership.chat_room.last_seq - membership.unread_count, 0
+        )
+        membership.save(update_fields=["last_read_seq"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0006_message_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroomparticipant',
+            name='last_read_seq',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_last_read_seq, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='chatroomparticipant',
+            name='unread_count',
+        ),
+        migrations.RemoveField(
+            model_name='message',
+            name='is_read',
+        ),
+        migrations.DeleteModel(
+            name='Notification',
+        ),
+    ]
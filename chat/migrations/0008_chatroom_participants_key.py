@@ -0,0 +1,45 @@
+# Generated by Django 3.2.18 on 2026-10-20 00:17
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_participants_key(apps, schema_editor):
+    ChatRoom = apps.get_model("chat", "ChatRoom")
+    ChatRoomParticipant = apps.get_model("chat", "ChatRoomParticipant")
+
+    user_ids = {}
+    for chat_room_id, user_id in ChatRoomParticipant.objects.values_list(
+        "chat_room_id", "user_id"
+    ):
+        user_ids.setdefault(chat_room_id, []).append(user_id)
+
+    seen = set()
+    for chat_room in ChatRoom.objects.order_by("id"):
+        joined = ",".join(
+            str(user_id) for user_id in sorted(set(user_ids.get(chat_room.pk, [])))
+        )
+        key = hashlib.sha256(joined.encode("utf-8")).hexdigest()
+        # 같은 구성원의 방이 이미 있으면 먼저 만들어진 방만 key 를 가진다
+        if key in seen:
+            continue
+        seen.add(key)
+        chat_room.participants_key = key
+        chat_room.save(update_fields=["participants_key"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0007_read_watermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='participants_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_participants_key, migrations.RunPython.noop),
+    ]
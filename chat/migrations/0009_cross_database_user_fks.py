@@ -0,0 +1,26 @@
+# Generated by Django 3.2.18 on 2026-10-20 00:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('chat', '0008_chatroom_participants_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chatroomparticipant',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='chat_memberships', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='sender',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
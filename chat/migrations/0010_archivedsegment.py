@@ -0,0 +1,29 @@
+# Generated by Django 3.2.18 on 2026-10-20 00:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0009_cross_database_user_fks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('first_id', models.PositiveBigIntegerField()),
+                ('last_id', models.PositiveBigIntegerField()),
+                ('last_seq', models.PositiveBigIntegerField()),
+                ('message_count', models.PositiveIntegerField(default=0)),
+                ('chat_room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_segments', to='chat.chatroom')),
+            ],
+            options={
+                'unique_together': {('chat_room', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.18 on 2026-10-20 00:30
+
+import chat.models
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('chat', '0010_archivedsegment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageAttachment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.ImageField(upload_to=chat.models.MessageAttachment.attachment_path)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('chat_room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attachments', to='chat.chatroom')),
+                ('uploader', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='attachment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.messageattachment'),
+        ),
+    ]
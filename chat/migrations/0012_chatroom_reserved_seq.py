@@ -0,0 +1,25 @@
+# Generated by Django 3.2.18 on 2026-10-20 01:20
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_reserved_seq(apps, schema_editor):
+    ChatRoom = apps.get_model("chat", "ChatRoom")
+    ChatRoom.objects.update(reserved_seq=F("last_seq"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0011_messageattachment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='reserved_seq',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_reserved_seq, migrations.RunPython.noop),
+    ]
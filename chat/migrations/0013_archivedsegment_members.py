@@ -0,0 +1,18 @@
+# Generated by Django 3.2.18 on 2026-10-20 01:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0012_chatroom_reserved_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedsegment',
+            name='members',
+            field=models.JSONField(default=list, editable=False),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.18 on 2026-10-20 01:32
+
+from django.db import migrations, models
+
+
+def backfill_attached(apps, schema_editor):
+    # 이미 보관된 메시지의 첨부는 구분할 수 없으므로 기존 첨부는 모두 남겨 둠
+    MessageAttachment = apps.get_model("chat", "MessageAttachment")
+    MessageAttachment.objects.update(attached=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0013_archivedsegment_members'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='messageattachment',
+            name='attached',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(backfill_attached, migrations.RunPython.noop),
+    ]
@@ -1,46 +1,310 @@
+import hashlib
+import os
+from collections import defaultdict
+from functools import partial
+
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import IntegrityError, models, router, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+from django.db.models.signals import m2m_changed, post_delete
+from django.dispatch import receiver
 from django.utils import timezone
+from imagekit.models import ImageSpecField
+from imagekit.processors import ResizeToFit
+
+from .events import notify_users, send_to_room
+from .thumbnails import DeferredStrategy
 
 
 class ChatRoom(models.Model):
-    participants = models.ManyToManyField(get_user_model(), related_name="chat_rooms")
-    name = models.CharField(max_length=255, blank=True)
+    participants = models.ManyToManyField(
+        get_user_model(), related_name="chat_rooms", through="ChatRoomParticipant"
+    )
+    name = models.CharField(max_length=255, blank=True, db_index=True)
+    # 정렬된 참여자 id 의 해시. 같은 구성원의 방을 이름과 상관없이 찾기 위해 사용
+    participants_key = models.CharField(
+        max_length=64, unique=True, null=True, blank=True, editable=False
+    )
+    # 채팅 목록 정렬/표시용으로 마지막 메시지를 따로 저장
+    last_message = models.ForeignKey(
+        "Message", on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    last_message_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # 방마다 저장된 메시지에 붙은 순번의 마지막 값 (안 읽은 수 계산에 사용)
+    last_seq = models.PositiveBigIntegerField(default=0)
+    # 순번 발급용 카운터. write-behind 버퍼가 미리 예약해 둔 번호까지 포함
+    reserved_seq = models.PositiveBigIntegerField(default=0)
+
+    @staticmethod
+    def make_participants_key(user_ids):
+        joined = ",".join(str(user_id) for user_id in sorted(set(user_ids)))
+        return hashlib.sha256(joined.encode("utf-8")).hexdigest()
 
     @classmethod
     def get_or_create_chat_room(cls, users):
         unique_users = set(users)
+        user_ids = [user.id for user in unique_users]
+        participants_key = cls.make_participants_key(user_ids)
+
+        # 이름이 바뀌어도 같은 구성원이면 같은 방 (unique index 조회 한 번)
+        chat_room = cls.objects.filter(participants_key=participants_key).first()
+        if chat_room:
+            return chat_room
+
         if len(unique_users) == 1:
             room_name = "나(" + list(unique_users)[0].first_name + ")"
         else:
             room_name = ",".join(sorted([user.first_name for user in users]))
 
-        chat_room = cls.objects.filter(name=room_name).first()
-        if chat_room:
-            return chat_room
-
-        chat_room = cls.objects.create(name=room_name)
-        chat_room.participants.set(unique_users)
+        using = router.db_for_write(cls)
+        with transaction.atomic(using=using):
+            chat_room, created = cls.objects.get_or_create(
+                participants_key=participants_key, defaults={"name": room_name}
+            )
+            if not created:
+                return chat_room
+            ChatRoomParticipant.objects.bulk_create(
+                [
+                    ChatRoomParticipant(chat_room=chat_room, user_id=user_id)
+                    for user_id in user_ids
+                ]
+            )
+        event = {"type": "new_room", "room_id": chat_room.pk, "room_name": room_name}
+        transaction.on_commit(lambda: notify_users(user_ids, event), using=using)
         return chat_room
 
+    @classmethod
+    def allocate_seq(cls, chat_room_id, count=1):
+        # UPDATE 한 번으로 방의 다음 순번 count 개를 예약하고 마지막 번호를 반환
+        # (여러 프로세스에서도 중복 없음)
+        with transaction.atomic(using=router.db_for_write(cls)):
+            cls.objects.filter(pk=chat_room_id).update(
+                reserved_seq=F("reserved_seq") + count
+            )
+            rows = cls.objects.filter(pk=chat_room_id)
+            return rows.values_list("reserved_seq", flat=True).get()
+
+    @classmethod
+    def release_seq(cls, chat_room_id, reserved, used):
+        # 예약한 뒤 다른 곳에서 더 예약하지 않았을 때만 쓰지 않은 번호를 돌려줌
+        return cls.objects.filter(pk=chat_room_id, reserved_seq=reserved).update(
+            reserved_seq=used
+        )
+
+    @classmethod
+    def participants_updated(cls, chat_room_ids):
+        """
+        구성원이 바뀐 방의 participants_key 를 다시 계산하고, 연결된 ChatConsumer 들이
+        캐시한 참여자 목록을 갱신하도록 방 group 에 알림
+        """
+        using = router.db_for_write(cls)
+        for chat_room_id in set(chat_room_ids or []):
+            participant_ids = list(
+                ChatRoomParticipant.objects.filter(chat_room_id=chat_room_id)
+                .order_by("user_id")
+                .values_list("user_id", flat=True)
+            )
+            # 같은 구성원의 방이 이미 있으면 key 를 비움
+            participants_key = cls.make_participants_key(participant_ids)
+            try:
+                with transaction.atomic(using=using):
+                    cls.objects.filter(pk=chat_room_id).update(
+                        participants_key=participants_key
+                    )
+            except IntegrityError:
+                cls.objects.filter(pk=chat_room_id).update(participants_key=None)
+            event = {"type": "participants_changed", "participant_ids": participant_ids}
+            transaction.on_commit(
+                partial(send_to_room, chat_room_id, event), using=using
+            )
+
     def __str__(self):
         return self.name
 
 
+class ChatRoomParticipant(models.Model):
+    # 기존 자동 생성 M2M 테이블을 그대로 사용
+    chat_room = models.ForeignKey(
+        ChatRoom,
+        on_delete=models.CASCADE,
+        related_name="memberships",
+        db_column="chatroom_id",
+    )
+    # 사용자는 다른 DB 에 있으므로 FK 제약 없이 저장 (삭제는 아래 signal 에서 처리)
+    user = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.DO_NOTHING,
+        related_name="chat_memberships",
+        db_constraint=False,
+    )
+    # 이 참여자가 읽은 마지막 메시지 순번 (안 읽은 수 = 방의 last_seq - last_read_seq)
+    last_read_seq = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        db_table = "chat_chatroom_participants"
+        unique_together = ("chat_room", "user")
+
+
+class MessageAttachment(models.Model):
+    """HTTP 로 먼저 올리고, 메시지에는 id 로만 연결하는 첨부 이미지"""
+
+    chat_room = models.ForeignKey(
+        ChatRoom, on_delete=models.CASCADE, related_name="attachments"
+    )
+    uploader = models.ForeignKey(
+        get_user_model(), on_delete=models.DO_NOTHING, db_constraint=False
+    )
+
+    def attachment_path(instance, filename):
+        return f"chat/{instance.chat_room_id}/{filename}"
+
+    image = models.ImageField(upload_to=attachment_path)
+    # 썸네일은 업로드 후 chat/thumbnails.py 의 thread pool 에서 생성
+    thumbnail_small = ImageSpecField(
+        source="image",
+        processors=[ResizeToFit(240, 240, upscale=False)],
+        format="JPEG",
+        options={"quality": 80},
+        cachefile_strategy=DeferredStrategy,
+    )
+    thumbnail_medium = ImageSpecField(
+        source="image",
+        processors=[ResizeToFit(720, 720, upscale=False)],
+        format="JPEG",
+        options={"quality": 85},
+        cachefile_strategy=DeferredStrategy,
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    # 메시지에 붙은 적이 있는지 (올리고 보내지 않은 첨부 정리용, prune_chat_attachments)
+    # 보관된 메시지는 Message 테이블에 없으므로 join 대신 따로 기록
+    attached = models.BooleanField(default=False)
+
+    def thumbnails(self):
+        return [self.thumbnail_small, self.thumbnail_medium]
+
+    def as_dict(self):
+        return {
+            "id": self.id,
+            "url": self.image.url,
+            "small_url": self.thumbnail_small.url,
+            "medium_url": self.thumbnail_medium.url,
+        }
+
+
 class Message(models.Model):
     chat_room = models.ForeignKey(
         ChatRoom, on_delete=models.CASCADE, related_name="messages"
     )
-    sender = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
+    sender = models.ForeignKey(
+        get_user_model(), on_delete=models.DO_NOTHING, db_constraint=False
+    )
     content = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
-    is_read = models.BooleanField(default=False)
+    attachment = models.ForeignKey(
+        MessageAttachment,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    # write-behind 모드에서는 broadcast 시점의 시간을 그대로 저장
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
+    seq = models.PositiveBigIntegerField(default=0)
 
-    def mark_as_read(self):
-        if not self.is_read:
-            self.is_read = True
-            self.save()
+    class Meta:
+        indexes = [
+            models.Index(fields=["chat_room", "id"], name="chat_message_room_id_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["chat_room", "seq"], name="chat_message_room_seq_uniq"
+            ),
+        ]
+
+    # 내용 없이 사진만 보낸 메시지의 채팅 목록 표시
+    ATTACHMENT_PREVIEW = "사진"
+
+    @classmethod
+    def create_in_room(cls, chat_room, sender, content, attachment=None):
+        with transaction.atomic(using=router.db_for_write(cls)):
+            message = cls.objects.create(
+                chat_room=chat_room,
+                sender=sender,
+                content=content,
+                attachment=attachment,
+                seq=ChatRoom.allocate_seq(chat_room.pk),
+            )
+            if attachment is not None:
+                MessageAttachment.objects.filter(pk=attachment.pk).update(attached=True)
+            ChatRoom.objects.filter(pk=chat_room.pk, last_seq__lt=message.seq).update(
+                last_seq=message.seq,
+                last_message=message,
+                last_message_at=message.timestamp,
+            )
+            # 보낸 사람은 자기 메시지까지 읽은 것으로 처리
+            ChatRoomParticipant.objects.filter(chat_room=chat_room, user=sender).update(
+                last_read_seq=Greatest("last_read_seq", message.seq)
+            )
+        return message
+
+    @classmethod
+    def bulk_create_in_rooms(cls, messages):
+        """
+        write-behind 버퍼용: 순번(seq)이 이미 배정된 message 들을 한 트랜잭션으로 저장
+        (전체 INSERT 1번 + 방마다 UPDATE 2번, 첨부가 있으면 UPDATE 1번 더)
+        """
+        messages_by_room = defaultdict(list)
+        for message in messages:
+            messages_by_room[message.chat_room_id].append(message)
+
+        with transaction.atomic(using=router.db_for_write(cls)):
+            cls.objects.bulk_create(messages)
+            attachment_ids = [m.attachment_id for m in messages if m.attachment_id]
+            if attachment_ids:
+                MessageAttachment.objects.filter(pk__in=attachment_ids).update(
+                    attached=True
+                )
+
+            for chat_room_id, room_messages in messages_by_room.items():
+                # SQLite 는 bulk_create 후 id 를 돌려주지 않으므로 (방, seq) 로 다시 조회
+                saved_ids = dict(
+                    cls.objects.filter(
+                        chat_room_id=chat_room_id,
+                        seq__in=[message.seq for message in room_messages],
+                    ).values_list("seq", "id")
+                )
+                read_seqs = {}
+                for message in room_messages:
+                    message.id = saved_ids[message.seq]
+                    read_seqs[message.sender_id] = max(
+                        read_seqs.get(message.sender_id, 0), message.seq
+                    )
+
+                # 다른 프로세스가 더 뒤 번호를 먼저 저장했으면 마지막 메시지는 그대로 둠
+                last_message = max(room_messages, key=lambda message: message.seq)
+                ChatRoom.objects.filter(
+                    pk=chat_room_id, last_seq__lt=last_message.seq
+                ).update(
+                    last_seq=last_message.seq,
+                    last_message_id=last_message.id,
+                    last_message_at=last_message.timestamp,
+                )
+                # 보낸 사람마다 자기 마지막 메시지까지 읽은 것으로 처리 (UPDATE 한 번)
+                ChatRoomParticipant.objects.filter(
+                    chat_room_id=chat_room_id, user_id__in=read_seqs
+                ).update(
+                    last_read_seq=Greatest(
+                        "last_read_seq",
+                        Case(
+                            *[
+                                When(user_id=user_id, then=Value(seq))
+                                for user_id, seq in read_seqs.items()
+                            ],
+                            output_field=models.PositiveBigIntegerField(),
+                        ),
+                    )
+                )
 
     def formatted_timestamp(self):
         # self.timestamp에 대해 시간대 정보를 추가합니다.
@@ -57,41 +321,95 @@ class Message(models.Model):
         am_pm = "오전" if local_timestamp.strftime("%p") == "AM" else "오후"
         return f"{am_pm} {local_timestamp.strftime('%I:%M')}"
 
+    def preview(self):
+        return self.content or self.ATTACHMENT_PREVIEW
+
+    def sender_image_url(self):
+        if self.sender.image:
+            return str(self.sender.image.url)
+        return "/static/img/accounts/no-image-icon-21.png"
+
+    def as_dict(self):
+        # websocket chat_message 이벤트와 메시지 API 가 같은 형식을 사용
+        return {
+            "id": self.id,
+            "chat_room_id": self.chat_room_id,
+            "seq": self.seq,
+            "message": self.content,
+            "sender": self.sender.first_name,
+            "sender_image_url": self.sender_image_url(),
+            "formatted_timestamp": self.formatted_timestamp(),
+            "attachment": self.attachment.as_dict() if self.attachment_id else None,
+        }
+
+
+class ArchivedSegment(models.Model):
+    """보관 기간이 지난 메시지를 방별/월별로 압축해 둔 파일 (chat/archive.py)"""
 
-class Notification(models.Model):
-    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
     chat_room = models.ForeignKey(
-        ChatRoom, on_delete=models.CASCADE, related_name="notifications"
+        ChatRoom, on_delete=models.CASCADE, related_name="archived_segments"
     )
-    message = models.ForeignKey(Message, on_delete=models.CASCADE)
-    timestamp = models.DateTimeField(auto_now_add=True)
-    is_read = models.BooleanField(default=False)
+    # 해당 월의 1일
+    month = models.DateField()
+    first_id = models.PositiveBigIntegerField()
+    last_id = models.PositiveBigIntegerField()
+    last_seq = models.PositiveBigIntegerField()
+    message_count = models.PositiveIntegerField(default=0)
+    # 배치마다 덧붙인 gzip member 의 [시작 byte, 길이, first_id, last_id]
+    # (페이지를 읽을 때 파일 전체 대신 필요한 member 만 풀기 위해 사용)
+    members = models.JSONField(default=list, editable=False)
 
-    def mark_as_read(self):
-        if not self.is_read:
-            self.is_read = True
-            self.save()
+    class Meta:
+        unique_together = ("chat_room", "month")
 
-    def formatted_timestamp(self):
-        # self.timestamp에 대해 시간대 정보를 추가합니다.
-        if (
-            self.timestamp.tzinfo is None
-            or self.timestamp.tzinfo.utcoffset(self.timestamp) is None
-        ):
-            local_timestamp = timezone.make_aware(
-                self.timestamp, timezone.get_default_timezone()
+    def file_path(self):
+        return os.path.join(
+            settings.CHAT_ARCHIVE_ROOT,
+            str(self.chat_room_id),
+            self.month.strftime("%Y-%m") + ".jsonl.gz",
+        )
+
+
+@receiver(m2m_changed, sender=ChatRoom.participants.through)
+def participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            ChatRoom.participants_updated([instance.pk])
+    elif action == "pre_clear":
+        # user.chat_rooms.clear() 는 pk_set 이 없으므로 지우기 전에 방을 기억해 둠
+        instance._cleared_chat_room_ids = list(
+            ChatRoomParticipant.objects.filter(user_id=instance.pk).values_list(
+                "chat_room_id", flat=True
             )
-        else:
-            local_timestamp = self.timestamp
+        )
+    elif action == "post_clear":
+        ChatRoom.participants_updated(instance.__dict__.pop("_cleared_chat_room_ids"))
+    elif action in ("post_add", "post_remove"):
+        ChatRoom.participants_updated(pk_set)
 
-        am_pm = "오전" if local_timestamp.strftime("%p") == "AM" else "오후"
-        return f"{am_pm} {local_timestamp.strftime('%I:%M')}"
 
-    @classmethod
-    def delete_old_notifications(cls):
-        one_week_ago = timezone.now() - timezone.timedelta(days=7)
-        cls.objects.filter(timestamp__lt=one_week_ago).delete()
+@receiver(post_delete, sender=get_user_model())
+def delete_user_chat_data(sender, instance, **kwargs):
+    # 사용자와 채팅은 DB 가 달라 CASCADE 가 동작하지 않으므로 직접 정리
+    memberships = ChatRoomParticipant.objects.filter(user_id=instance.pk)
+    chat_room_ids = list(memberships.values_list("chat_room_id", flat=True))
+    Message.objects.filter(sender_id=instance.pk).delete()
+    memberships.delete()
+    ChatRoom.participants_updated(chat_room_ids)
+
+
+@receiver(post_delete, sender=ArchivedSegment)
+def delete_segment_file(sender, instance, **kwargs):
+    # 방이 삭제되면 보관 파일도 함께 삭제
+    try:
+        os.remove(instance.file_path())
+    except FileNotFoundError:
+        pass
+
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self.delete_old_notifications()
+@receiver(post_delete, sender=MessageAttachment)
+def delete_attachment_files(sender, instance, **kwargs):
+    for thumbnail in instance.thumbnails():
+        if thumbnail.storage.exists(thumbnail.name):
+            thumbnail.storage.delete(thumbnail.name)
+    instance.image.delete(save=False)
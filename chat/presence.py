@@ -0,0 +1,119 @@
+"""
+채팅방 접속 상태(online/away)와 입력 중 표시.
+
+DB 는 쓰지 않고 channel layer 의 방 group 으로만 주고받는다.
+
+- 클라이언트는 CHAT_PRESENCE_HEARTBEAT 초마다 heartbeat 를 보내고, 서버는 상태가
+  바뀌었거나 TTL 의 절반이 지났을 때만 방에 presence 이벤트를 보낸다.
+- 프로세스마다 PresenceRegistry 가 받은 presence 이벤트를 만료 시각과 함께 기억해
+  두었다가, 새로 연결된 소켓에 현재 상태를 한 번에 보내준다. CHAT_PRESENCE_TTL 안에
+  갱신되지 않은 사용자는 offline 으로 본다.
+- 입력 중 이벤트는 방마다 모았다가 CHAT_TYPING_INTERVAL_MS 에 한 번만 보낸다.
+"""
+import asyncio
+import time
+
+from django.conf import settings
+
+
+class PresenceRegistry:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        # group -> {user_id: presence 이벤트 + expires}
+        self.rooms = {}
+        # (group, user_id) -> 이 프로세스에 연결된 소켓 수
+        self.connections = {}
+        # (group, user_id) -> (마지막으로 보낸 상태, 보낸 시각)
+        self.last_broadcast = {}
+
+    def connect(self, group, user_id):
+        key = (group, user_id)
+        self.connections[key] = self.connections.get(key, 0) + 1
+
+    def disconnect(self, group, user_id):
+        """이 프로세스에서 해당 사용자의 마지막 소켓이었으면 True"""
+        key = (group, user_id)
+        count = self.connections.get(key, 0) - 1
+        if count > 0:
+            self.connections[key] = count
+            return False
+        self.connections.pop(key, None)
+        self.last_broadcast.pop(key, None)
+        return True
+
+    def should_broadcast(self, group, user_id, status, min_interval=None):
+        if min_interval is None:
+            min_interval = self.ttl / 2
+        key = (group, user_id)
+        now = time.monotonic()
+        last = self.last_broadcast.get(key)
+        if last is not None and last[0] == status and now - last[1] < min_interval:
+            return False
+        self.last_broadcast[key] = (status, now)
+        return True
+
+    def update(self, group, event):
+        users = self.rooms.setdefault(group, {})
+        if event["status"] == "offline":
+            users.pop(event["user_id"], None)
+        else:
+            users[event["user_id"]] = {
+                "user_id": event["user_id"],
+                "user": event["user"],
+                "status": event["status"],
+                "expires": time.monotonic() + event["ttl"],
+            }
+        if not users:
+            self.rooms.pop(group, None)
+
+    def snapshot(self, group):
+        now = time.monotonic()
+        users = self.rooms.get(group, {})
+        for user_id in [
+            user_id for user_id, entry in users.items() if entry["expires"] <= now
+        ]:
+            del users[user_id]
+        return [
+            {
+                "user_id": entry["user_id"],
+                "user": entry["user"],
+                "status": entry["status"],
+                "ttl": entry["expires"] - now,
+            }
+            for entry in users.values()
+        ]
+
+
+class TypingCoalescer:
+    def __init__(self, interval_ms):
+        self.interval = interval_ms / 1000
+        # group -> {user_id: first_name}
+        self.pending = {}
+
+    async def add(self, channel_layer, group, user_id, name):
+        users = self.pending.get(group)
+        if users is None:
+            users = self.pending[group] = {}
+            asyncio.get_running_loop().create_task(
+                self._flush_later(channel_layer, group)
+            )
+        users[user_id] = name
+
+    async def _flush_later(self, channel_layer, group):
+        await asyncio.sleep(self.interval)
+        users = self.pending.pop(group, {})
+        if users:
+            await channel_layer.group_send(
+                group,
+                {
+                    "type": "typing",
+                    "users": [
+                        {"user_id": user_id, "user": name}
+                        for user_id, name in users.items()
+                    ],
+                },
+            )
+
+
+presence_registry = PresenceRegistry(settings.CHAT_PRESENCE_TTL)
+typing_coalescer = TypingCoalescer(settings.CHAT_TYPING_INTERVAL_MS)
@@ -0,0 +1,46 @@
+from django.db import DEFAULT_DB_ALIAS
+
+CHAT_DATABASE = "chat"
+
+
+class ChatRouter:
+    """
+    채팅 앱 모델은 별도의 DB(settings.DATABASES["chat"])에 저장한다.
+
+    SQLite 는 DB 파일 단위로 쓰기가 직렬화되므로, 가장 자주 쓰는 채팅 메시지가
+    장바구니/주문/게시글 쓰기를 막지 않도록 파일을 나눈다. sender, user 등 사용자를
+    가리키는 FK 는 DB 를 넘나들기 때문에 db_constraint=False 로 두고, 사용자 삭제 시
+    채팅 데이터 정리는 chat.models 의 post_delete signal 에서 처리한다.
+    """
+
+    app_labels = {"chat"}
+
+    def _db_for_model(self, model, **hints):
+        if model._meta.app_label in self.app_labels:
+            return CHAT_DATABASE
+        instance = hints.get("instance")
+        if instance is not None and instance._meta.app_label in self.app_labels:
+            # 메시지의 sender 처럼 채팅 모델에서 다른 앱 모델을 참조할 때
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._db_for_model(model, **hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for_model(model, **hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if (
+            obj1._meta.app_label in self.app_labels
+            or obj2._meta.app_label in self.app_labels
+        ):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label in self.app_labels:
+            return db == CHAT_DATABASE
+        if db == CHAT_DATABASE:
+            return False
+        return None
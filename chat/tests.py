@@ -1,3 +1,711 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import os
+import tempfile
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from channels.db import database_sync_to_async
+from channels.exceptions import ChannelFull
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import router
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .archive import archive_room, read_archived_messages
+from .buffer import MessageBuffer
+from .layers import SQLiteChannelLayer
+from .models import ChatRoom, ChatRoomParticipant, Message, MessageAttachment
+from .presence import PresenceRegistry, TypingCoalescer
+from .routing import websocket_urlpatterns
+from .views import MESSAGE_PAGE_SIZE, get_message_page
+
+
+def create_users(*names):
+    User = get_user_model()
+    return [
+        User.objects.create_user(name, f"{name}@example.com", "pw", first_name=name)
+        for name in names
+    ]
+
+
+class ParticipantsChangedTests(TestCase):
+    databases = {"default", "chat"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice, cls.bob, cls.carol = create_users("alice", "bob", "carol")
+
+    def setUp(self):
+        self.chat_room = ChatRoom.get_or_create_chat_room([self.alice, self.bob])
+        send_to_room = mock.patch("chat.models.send_to_room")
+        self.send_to_room = send_to_room.start()
+        self.addCleanup(send_to_room.stop)
+
+    def participants_key(self):
+        self.chat_room.refresh_from_db()
+        return self.chat_room.participants_key
+
+    def assert_notified(self, *users):
+        self.send_to_room.assert_called_once_with(
+            self.chat_room.pk,
+            {
+                "type": "participants_changed",
+                "participant_ids": sorted(user.pk for user in users),
+            },
+        )
+
+    def test_add_updates_key_and_notifies_room(self):
+        with self.captureOnCommitCallbacks(using="chat", execute=True):
+            self.chat_room.participants.add(self.carol)
+
+        self.assertEqual(
+            self.participants_key(),
+            ChatRoom.make_participants_key([self.alice.pk, self.bob.pk, self.carol.pk]),
+        )
+        self.assert_notified(self.alice, self.bob, self.carol)
+
+    def test_key_is_cleared_when_another_room_has_same_members(self):
+        ChatRoom.get_or_create_chat_room([self.alice])
+
+        self.chat_room.participants.remove(self.bob)
+
+        self.assertIsNone(self.participants_key())
+
+    def test_reverse_clear_updates_rooms_of_user(self):
+        with self.captureOnCommitCallbacks(using="chat", execute=True):
+            self.bob.chat_rooms.clear()
+
+        self.assertEqual(
+            self.participants_key(), ChatRoom.make_participants_key([self.alice.pk])
+        )
+        self.assert_notified(self.alice)
+
+    def test_deleted_user_leaves_rooms(self):
+        with self.captureOnCommitCallbacks(using="chat", execute=True):
+            self.bob.delete()
+
+        self.assertFalse(ChatRoomParticipant.objects.filter(user_id=self.bob.pk))
+        self.assertEqual(
+            self.participants_key(), ChatRoom.make_participants_key([self.alice.pk])
+        )
+        self.assert_notified(self.alice)
+
+
+class SQLiteChannelLayerTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.layer = SQLiteChannelLayer(
+            path=os.path.join(directory.name, "channels.sqlite3"),
+            capacity=2,
+            poll_interval=0.01,
+        )
+
+    async def receive(self, channel):
+        return await asyncio.wait_for(self.layer.receive(channel), 1)
+
+    async def test_group_send_many_delivers_once_per_channel(self):
+        first = await self.layer.new_channel()
+        second = await self.layer.new_channel()
+        await self.layer.group_add("room", first)
+        await self.layer.group_add("user", first)
+        await self.layer.group_add("user", second)
+        # consumer 처럼 받을 준비를 먼저 해 둠 (poller 는 받는 채널에만 나눠줌)
+        received = [
+            asyncio.ensure_future(self.receive(channel)) for channel in (first, second)
+        ]
+
+        await self.layer.group_send_many(["room", "user"], {"type": "hello"})
+
+        self.assertEqual(await asyncio.gather(*received), [{"type": "hello"}] * 2)
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(self.layer.receive(first), 0.1)
+        await self.layer.close()
+
+    async def test_full_channel_rejects_send(self):
+        channel = await self.layer.new_channel()
+        await self.layer.send(channel, {"n": 1})
+        await self.layer.send(channel, {"n": 2})
+
+        with self.assertRaises(ChannelFull):
+            await self.layer.send(channel, {"n": 3})
+
+    async def test_poller_survives_fetch_error(self):
+        channel = await self.layer.new_channel()
+        fetch = self.layer._fetch
+        calls = []
+
+        def flaky_fetch(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                raise RuntimeError("database is locked")
+            return fetch(*args)
+
+        await self.layer.send(channel, {"type": "hello"})
+        with mock.patch.object(self.layer, "_fetch", flaky_fetch), self.assertLogs(
+            "chat.layers", "ERROR"
+        ):
+            self.assertEqual(await self.receive(channel), {"type": "hello"})
+        await self.layer.close()
+
+
+class RoomMessagesTests(TestCase):
+    databases = {"default", "chat"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice, cls.bob, cls.carol = create_users("alice", "bob", "carol")
+        cls.chat_room = ChatRoom.get_or_create_chat_room([cls.alice, cls.bob])
+        cls.messages = [
+            Message.create_in_room(cls.chat_room, cls.alice, str(i))
+            for i in range(MESSAGE_PAGE_SIZE + 5)
+        ]
+
+    def get(self, **params):
+        url = reverse("chat:room_messages", args=[self.chat_room.pk])
+        return self.client.get(url, params)
+
+    def test_non_member_is_forbidden(self):
+        self.client.force_login(self.carol)
+
+        self.assertEqual(self.get().status_code, 403)
+
+    def test_pages_backwards_with_before(self):
+        self.client.force_login(self.bob)
+
+        first = self.get().json()
+        oldest = first["messages"][0]["id"]
+        second = self.get(before=oldest).json()
+
+        self.assertTrue(first["has_more"])
+        self.assertFalse(second["has_more"])
+        contents = [m["message"] for m in second["messages"] + first["messages"]]
+        self.assertEqual(contents, [message.content for message in self.messages])
+
+    def test_malformed_before_is_rejected(self):
+        self.client.force_login(self.bob)
+
+        self.assertEqual(self.get(before="abc").status_code, 400)
+
+
+class InboxTests(TestCase):
+    databases = {"default", "chat"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice, cls.bob, cls.carol = create_users("alice", "bob", "carol")
+        cls.pair = ChatRoom.get_or_create_chat_room([cls.alice, cls.bob])
+        cls.group = ChatRoom.get_or_create_chat_room([cls.alice, cls.bob, cls.carol])
+
+    def unread(self):
+        self.client.force_login(self.bob)
+        return self.client.get(reverse("chat:unread_notifications")).json()
+
+    def test_unread_counts_and_last_message(self):
+        Message.create_in_room(self.pair, self.alice, "첫 메시지")
+        Message.create_in_room(self.pair, self.alice, "두 번째")
+        Message.create_in_room(self.group, self.carol, "")
+
+        data = self.unread()
+
+        rooms = {
+            room["room_id"]: (room["unread_notifications"], room["last_message"])
+            for room in data["data"]
+        }
+        self.assertEqual(
+            rooms,
+            {
+                self.pair.pk: (2, "두 번째"),
+                self.group.pk: (1, Message.ATTACHMENT_PREVIEW),
+            },
+        )
+        self.assertEqual(data["total_unread"], 3)
+
+    def test_own_messages_are_read(self):
+        Message.create_in_room(self.pair, self.alice, "보냄")
+        Message.create_in_room(self.pair, self.bob, "답장")
+
+        self.assertEqual(self.unread()["total_unread"], 0)
+
+    def test_unchanged_inbox_is_not_modified(self):
+        self.client.force_login(self.bob)
+        url = reverse("chat:unread_notifications")
+        etag = self.client.get(url)["ETag"]
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Message.create_in_room(self.pair, self.alice, "새 메시지")
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_new_room_is_pushed_to_participants(self):
+        with mock.patch("chat.models.notify_users") as notify_users:
+            with self.captureOnCommitCallbacks(using="chat", execute=True):
+                chat_room = ChatRoom.get_or_create_chat_room([self.bob, self.carol])
+
+        user_ids, event = notify_users.call_args[0]
+        self.assertEqual(sorted(user_ids), [self.bob.pk, self.carol.pk])
+        self.assertEqual(event["type"], "new_room")
+        self.assertEqual(event["room_id"], chat_room.pk)
+
+
+@override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+)
+class ChatConsumerTests(TestCase):
+    databases = {"default", "chat"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice, cls.bob, cls.carol = create_users("alice", "bob", "carol")
+        cls.chat_room = ChatRoom.get_or_create_chat_room([cls.alice, cls.bob])
+
+    def communicator(self, user, query=""):
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns), f"/ws/chat/{self.chat_room.pk}/{query}"
+        )
+        communicator.scope["user"] = user
+        return communicator
+
+    async def receive_messages(self, communicator):
+        # 접속 상태 이벤트는 건너뜀
+        while True:
+            data = await communicator.receive_json_from()
+            if "presence" not in data:
+                return data
+
+    async def test_non_member_is_rejected(self):
+        communicator = self.communicator(self.carol)
+
+        connected, _ = await communicator.connect()
+
+        self.assertFalse(connected)
+
+    async def test_member_receives_sent_message(self):
+        communicator = self.communicator(self.alice)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        await communicator.send_json_to({"message": "안녕"})
+
+        data = await self.receive_messages(communicator)
+        self.assertEqual((data["message"], data["sender"]), ("안녕", "alice"))
+        await communicator.disconnect()
+
+    async def test_reconnect_replays_missed_messages(self):
+        await database_sync_to_async(self.create_messages)(3)
+        communicator = self.communicator(self.bob, "?since=1")
+        await communicator.connect()
+
+        replayed = [await self.receive_messages(communicator) for _ in range(3)]
+
+        self.assertEqual(
+            [data.get("seq", data) for data in replayed], [2, 3, {"replayed": 3}]
+        )
+        # 클라이언트가 빠진 순번을 다시 요청할 때도 같은 방식
+        await communicator.send_json_to({"type": "replay", "since": 2})
+        self.assertEqual((await self.receive_messages(communicator))["seq"], 3)
+        self.assertEqual(await self.receive_messages(communicator), {"replayed": 3})
+        await communicator.disconnect()
+
+    async def test_attachment_id_must_be_integer(self):
+        attachment = await database_sync_to_async(MessageAttachment.objects.create)(
+            chat_room=self.chat_room, uploader=self.alice, image="chat/photo.png"
+        )
+        communicator = self.communicator(self.alice)
+        await communicator.connect()
+
+        await communicator.send_json_to({"attachment_id": str(attachment.pk)})
+        await communicator.send_json_to({"attachment_id": attachment.pk})
+
+        # 문자열 id 는 무시되므로 정수 id 로 보낸 메시지만 순번 1 로 저장됨
+        data = await self.receive_messages(communicator)
+        self.assertEqual(data["attachment"]["id"], attachment.pk)
+        self.assertEqual(data["seq"], 1)
+        await communicator.disconnect()
+
+    def create_messages(self, count):
+        for i in range(count):
+            Message.create_in_room(self.chat_room, self.alice, str(i))
+
+
+class WriteBehindTests(TestCase):
+    databases = {"default", "chat"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice, cls.bob = create_users("alice", "bob")
+        cls.chat_room = ChatRoom.get_or_create_chat_room([cls.alice, cls.bob])
+
+    def reserved(self, sender, count):
+        last = ChatRoom.allocate_seq(self.chat_room.pk, count)
+        return [
+            Message(chat_room=self.chat_room, sender=sender, content=str(seq), seq=seq)
+            for seq in range(last - count + 1, last + 1)
+        ]
+
+    def test_bulk_create_moves_last_message_and_read_seqs(self):
+        messages = self.reserved(self.alice, 2) + self.reserved(self.bob, 1)
+
+        Message.bulk_create_in_rooms(messages)
+
+        self.chat_room.refresh_from_db()
+        self.assertEqual(self.chat_room.last_seq, 3)
+        self.assertEqual(self.chat_room.last_message_id, messages[-1].id)
+        read_seqs = dict(
+            self.chat_room.memberships.values_list("user", "last_read_seq")
+        )
+        self.assertEqual(read_seqs, {self.alice.pk: 2, self.bob.pk: 3})
+
+    def test_older_batch_does_not_move_last_message_back(self):
+        older = self.reserved(self.alice, 1)
+        newer = self.reserved(self.bob, 1)
+        Message.bulk_create_in_rooms(newer)
+
+        Message.bulk_create_in_rooms(older)
+
+        self.chat_room.refresh_from_db()
+        self.assertEqual(self.chat_room.last_seq, 2)
+        self.assertEqual(self.chat_room.last_message_id, newer[0].id)
+
+    async def test_buffer_assigns_contiguous_seqs_and_releases_idle_blocks(self):
+        buffer = MessageBuffer(max_messages=10, max_delay_ms=10)
+        # 직전 주기에 3개를 받았으면 3개씩 예약
+        buffer.rates[self.chat_room.pk] = 3
+        for content in ["하나", "둘"]:
+            await buffer.add(
+                Message(chat_room=self.chat_room, sender=self.alice, content=content)
+            )
+
+        await buffer.flush()
+        # 메시지가 없던 주기가 지나면 남은 예약 번호를 돌려줌
+        await buffer.flush()
+
+        saved, chat_room = await database_sync_to_async(self.saved_state)()
+        self.assertEqual(saved, [(1, "하나"), (2, "둘")])
+        self.assertEqual((chat_room.last_seq, chat_room.reserved_seq), (2, 2))
+
+    def saved_state(self):
+        saved = list(
+            self.chat_room.messages.order_by("seq").values_list("seq", "content")
+        )
+        return saved, ChatRoom.objects.get(pk=self.chat_room.pk)
+
+
+class MessageSeqTests(TestCase):
+    databases = {"default", "chat"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice, cls.bob = create_users("alice", "bob")
+        cls.chat_room = ChatRoom.get_or_create_chat_room([cls.alice, cls.bob])
+        cls.other_room = ChatRoom.get_or_create_chat_room([cls.alice])
+
+    def test_seqs_are_contiguous_per_room(self):
+        for sender in [self.alice, self.bob, self.alice]:
+            Message.create_in_room(self.chat_room, sender, "내용")
+        Message.create_in_room(self.other_room, self.alice, "내용")
+
+        self.assertEqual(
+            list(self.chat_room.messages.order_by("id").values_list("seq", flat=True)),
+            [1, 2, 3],
+        )
+        self.assertEqual(
+            list(self.other_room.messages.values_list("seq", flat=True)), [1]
+        )
+
+    def test_create_moves_last_message_and_sender_watermark(self):
+        Message.create_in_room(self.chat_room, self.alice, "하나")
+        message = Message.create_in_room(self.chat_room, self.bob, "둘")
+
+        self.chat_room.refresh_from_db()
+        self.assertEqual(self.chat_room.last_seq, 2)
+        self.assertEqual(self.chat_room.last_message, message)
+        read_seqs = dict(
+            self.chat_room.memberships.values_list("user", "last_read_seq")
+        )
+        self.assertEqual(read_seqs, {self.alice.pk: 1, self.bob.pk: 2})
+
+
+class ReadWatermarkTests(TestCase):
+    databases = {"default", "chat"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice, cls.bob, cls.carol = create_users("alice", "bob", "carol")
+        cls.chat_room = ChatRoom.get_or_create_chat_room([cls.alice, cls.bob])
+        for i in range(3):
+            Message.create_in_room(cls.chat_room, cls.alice, str(i))
+
+    def read_seq(self, user):
+        return self.chat_room.memberships.get(user=user).last_read_seq
+
+    def test_opening_room_marks_messages_read(self):
+        self.client.force_login(self.bob)
+
+        response = self.client.get(reverse("chat:room", args=[self.chat_room.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.read_seq(self.bob), 3)
+
+    def test_non_member_is_redirected_without_joining(self):
+        self.client.force_login(self.carol)
+
+        response = self.client.get(reverse("chat:room", args=[self.chat_room.pk]))
+
+        self.assertRedirects(
+            response, reverse("chat:inbox"), fetch_redirect_response=False
+        )
+        self.assertFalse(self.chat_room.memberships.filter(user=self.carol).exists())
+
+
+class GetOrCreateChatRoomTests(TestCase):
+    databases = {"default", "chat"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice, cls.bob, cls.carol = create_users("alice", "bob", "carol")
+
+    def test_same_members_get_same_room(self):
+        chat_room = ChatRoom.get_or_create_chat_room([self.alice, self.bob])
+        ChatRoom.objects.filter(pk=chat_room.pk).update(name="바뀐 이름")
+
+        # 순서나 중복과 상관없이 unique index 조회 한 번으로 찾음
+        with self.assertNumQueries(1, using="chat"):
+            found = ChatRoom.get_or_create_chat_room([self.bob, self.alice, self.bob])
+
+        self.assertEqual(found, chat_room)
+        self.assertEqual(ChatRoom.objects.count(), 1)
+
+    def test_different_members_get_new_room(self):
+        pair = ChatRoom.get_or_create_chat_room([self.alice, self.bob])
+        group = ChatRoom.get_or_create_chat_room([self.alice, self.bob, self.carol])
+
+        self.assertNotEqual(pair, group)
+        self.assertEqual(group.name, "alice,bob,carol")
+        self.assertEqual(
+            set(group.memberships.values_list("user_id", flat=True)),
+            {self.alice.pk, self.bob.pk, self.carol.pk},
+        )
+
+
+class PresenceTests(SimpleTestCase):
+    def event(self, user_id, status, ttl=30):
+        return {"user_id": user_id, "user": str(user_id), "status": status, "ttl": ttl}
+
+    def test_heartbeat_is_broadcast_only_on_change_or_after_half_ttl(self):
+        registry = PresenceRegistry(ttl=30)
+
+        self.assertTrue(registry.should_broadcast("room", 1, "online"))
+        self.assertFalse(registry.should_broadcast("room", 1, "online"))
+        self.assertTrue(registry.should_broadcast("room", 1, "away"))
+        self.assertTrue(registry.should_broadcast("room", 1, "away", min_interval=0))
+
+    def test_snapshot_drops_offline_and_expired_users(self):
+        registry = PresenceRegistry(ttl=30)
+        registry.update("room", self.event(1, "online"))
+        registry.update("room", self.event(2, "away"))
+        registry.update("room", self.event(3, "online", ttl=0))
+        registry.update("room", self.event(2, "offline"))
+
+        self.assertEqual(
+            [
+                (entry["user_id"], entry["status"])
+                for entry in registry.snapshot("room")
+            ],
+            [(1, "online")],
+        )
+
+    def test_last_socket_disconnect(self):
+        registry = PresenceRegistry(ttl=30)
+        registry.connect("room", 1)
+        registry.connect("room", 1)
+
+        self.assertFalse(registry.disconnect("room", 1))
+        self.assertTrue(registry.disconnect("room", 1))
+
+    async def test_typing_is_sent_once_per_interval(self):
+        channel_layer = mock.AsyncMock()
+        coalescer = TypingCoalescer(interval_ms=10)
+
+        await coalescer.add(channel_layer, "room", 1, "alice")
+        await coalescer.add(channel_layer, "room", 2, "bob")
+        await coalescer.add(channel_layer, "room", 1, "alice")
+        await asyncio.sleep(0.05)
+
+        channel_layer.group_send.assert_awaited_once_with(
+            "room",
+            {
+                "type": "typing",
+                "users": [
+                    {"user_id": 1, "user": "alice"},
+                    {"user_id": 2, "user": "bob"},
+                ],
+            },
+        )
+
+
+class DeleteChatTests(TestCase):
+    databases = {"default", "chat"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice, cls.bob, cls.carol = create_users("alice", "bob", "carol")
+
+    def setUp(self):
+        self.chat_room = ChatRoom.get_or_create_chat_room([self.alice, self.bob])
+        Message.create_in_room(self.chat_room, self.alice, "내용")
+
+    def delete(self, user):
+        self.client.force_login(user)
+        with mock.patch("chat.views.notify_users") as notify_users:
+            self.client.get(reverse("chat:delete_chat", args=[self.chat_room.pk]))
+        return notify_users
+
+    def test_non_member_cannot_delete(self):
+        notify_users = self.delete(self.carol)
+
+        self.assertTrue(ChatRoom.objects.filter(pk=self.chat_room.pk).exists())
+        notify_users.assert_not_called()
+
+    def test_member_deletes_room_and_notifies_participants(self):
+        notify_users = self.delete(self.bob)
+
+        self.assertFalse(ChatRoom.objects.filter(pk=self.chat_room.pk).exists())
+        self.assertFalse(Message.objects.exists())
+        user_ids, event = notify_users.call_args[0]
+        self.assertEqual(sorted(user_ids), [self.alice.pk, self.bob.pk])
+        self.assertEqual(event["type"], "room_removed")
+
+    def test_chat_models_use_chat_database(self):
+        self.assertEqual(router.db_for_write(Message), "chat")
+        self.assertEqual(router.db_for_read(ChatRoom), "chat")
+        self.assertEqual(router.db_for_write(get_user_model()), "default")
+
+
+class ArchiveTests(TestCase):
+    databases = {"default", "chat"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice, cls.bob = create_users("alice", "bob")
+        cls.chat_room = ChatRoom.get_or_create_chat_room([cls.alice, cls.bob])
+        cls.messages = [
+            Message.create_in_room(cls.chat_room, cls.alice, str(i)) for i in range(40)
+        ]
+        # 앞의 35개는 보관 기간이 지난 메시지 (1월과 2월에 나눠서)
+        old = [message.pk for message in cls.messages[:35]]
+        Message.objects.filter(pk__in=old[:20]).update(timestamp=datetime(2024, 1, 5))
+        Message.objects.filter(pk__in=old[20:]).update(timestamp=datetime(2024, 2, 5))
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        archive_root = override_settings(CHAT_ARCHIVE_ROOT=directory.name)
+        archive_root.enable()
+        self.addCleanup(archive_root.disable)
+        self.chat_room.refresh_from_db()
+        self.archived = archive_room(self.chat_room, datetime(2024, 3, 1), batch_size=8)
+
+    def test_message_page_reads_through_to_archive(self):
+        pages = []
+        before = None
+        while True:
+            page, has_more = get_message_page(self.chat_room, before)
+            pages.insert(0, [message.content for message in page])
+            if not has_more:
+                break
+            before = page[0].id
+
+        self.assertEqual(self.archived, 35)
+        self.assertEqual(Message.objects.count(), 5)
+        self.assertEqual(sum(pages, []), [message.content for message in self.messages])
+
+    def test_reads_only_needed_members(self):
+        segments = self.chat_room.archived_segments.order_by("month")
+        # 8개씩 배치: 1월 1~8, 9~16, 17~20 / 2월 21~24, 25~32, 33~35
+        self.assertEqual([len(segment.members) for segment in segments], [3, 3])
+        before = self.messages[30].pk
+
+        with mock.patch("chat.archive.gzip.decompress", wraps=gzip.decompress) as read:
+            page = read_archived_messages(self.chat_room, before, limit=5)
+
+        self.assertEqual(
+            [message.content for message in page], ["29", "28", "27", "26", "25"]
+        )
+        # 25~32 member 하나만 풀면 됨
+        self.assertEqual(read.call_count, 1)
+
+    def test_segments_without_members_are_read_whole(self):
+        self.chat_room.archived_segments.update(members=[])
+
+        page = read_archived_messages(self.chat_room, limit=40)
+
+        self.assertEqual(
+            [message.content for message in page][::-1],
+            [message.content for message in self.messages[:35]],
+        )
+
+
+class AttachmentTests(TestCase):
+    databases = {"default", "chat"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice, cls.bob, cls.carol = create_users("alice", "bob", "carol")
+        cls.chat_room = ChatRoom.get_or_create_chat_room([cls.alice, cls.bob])
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media_root = override_settings(MEDIA_ROOT=directory.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def image(self):
+        data = io.BytesIO()
+        Image.new("RGB", (10, 10)).save(data, "PNG")
+        return SimpleUploadedFile("photo.png", data.getvalue(), "image/png")
+
+    def upload(self, user, image):
+        self.client.force_login(user)
+        url = reverse("chat:upload_attachment", args=[self.chat_room.pk])
+        return self.client.post(url, {"image": image})
+
+    def test_member_uploads_image(self):
+        response = self.upload(self.alice, self.image())
+
+        self.assertEqual(response.status_code, 201)
+        attachment = MessageAttachment.objects.get(pk=response.json()["id"])
+        self.assertEqual(attachment.uploader_id, self.alice.pk)
+        self.assertFalse(attachment.attached)
+
+    def test_non_member_cannot_upload(self):
+        response = self.upload(self.carol, self.image())
+
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(MessageAttachment.objects.exists())
+
+    def test_non_image_is_rejected(self):
+        text = SimpleUploadedFile("note.txt", b"hello", "text/plain")
+
+        self.assertEqual(self.upload(self.alice, text).status_code, 400)
+
+    def test_prune_deletes_only_old_unsent_attachments(self):
+        for _ in range(3):
+            self.upload(self.alice, self.image())
+        sent, old, recent = MessageAttachment.objects.order_by("id")
+        Message.create_in_room(self.chat_room, self.alice, "", attachment=sent)
+        MessageAttachment.objects.filter(pk__in=[sent.pk, old.pk]).update(
+            created_at=datetime.now() - timedelta(days=2)
+        )
+
+        call_command("prune_chat_attachments", stdout=io.StringIO())
+
+        self.assertEqual(list(MessageAttachment.objects.order_by("id")), [sent, recent])
+        self.assertFalse(old.image.storage.exists(old.image.name))
@@ -0,0 +1,32 @@
+"""
+채팅 첨부 이미지 썸네일 생성.
+
+업로드 요청이나 consumer 에서 Pillow 를 돌리지 않도록 썸네일은 URL 을 조회할 때
+만들지 않고(DeferredStrategy), 업로드가 commit 된 뒤 이 모듈의 thread pool 에서
+만든다. 생성 전에 요청된 썸네일은 클라이언트가 원본 이미지로 대신 보여준다.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chat-thumbnails")
+
+
+class DeferredStrategy:
+    """URL 조회나 원본 저장 시 썸네일을 만들지 않는 imagekit cachefile strategy"""
+
+    def should_verify_existence(self, file):
+        return False
+
+
+def _generate(attachment):
+    for thumbnail in attachment.thumbnails():
+        try:
+            thumbnail.generate()
+        except Exception:
+            logger.exception("채팅 첨부 %s 썸네일 생성 실패", attachment.pk)
+
+
+def generate_thumbnails(attachment):
+    executor.submit(_generate, attachment)
@@ -1,41 +1,94 @@
-from datetime import datetime, timedelta
+import hashlib
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.db import router, transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import Greatest
 from django.http import JsonResponse
-from django.shortcuts import redirect, render
-from django.utils import timezone
+from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
+
+from .archive import read_archived_messages
+from .events import notify_users
+from .forms import MessageAttachmentForm
+from .models import ChatRoom, ChatRoomParticipant, MessageAttachment
+from .thumbnails import generate_thumbnails
+
+INBOX_PAGE_SIZE = 20
+MESSAGE_PAGE_SIZE = 30
+
+
+def get_message_page(chat_room, before=None):
+    # 사용자는 다른 DB 에 있으므로 join 대신 한 번 더 조회
+    messages = (
+        chat_room.messages.select_related("attachment")
+        .prefetch_related("sender")
+        .order_by("-id")
+    )
+    if before:
+        messages = messages.filter(id__lt=before)
+    page = list(messages[: MESSAGE_PAGE_SIZE + 1])
+    if len(page) <= MESSAGE_PAGE_SIZE:
+        # DB 에 남은 메시지를 다 읽었으면 보관 파일에서 이어서 읽음
+        oldest = page[-1].id if page else before
+        page += read_archived_messages(
+            chat_room, oldest, MESSAGE_PAGE_SIZE + 1 - len(page)
+        )
+    has_more = len(page) > MESSAGE_PAGE_SIZE
+    # 화면에는 오래된 메시지부터 보여줌
+    return page[:MESSAGE_PAGE_SIZE][::-1], has_more
+
+
+def get_inbox_page(user, page_number):
+    # 방 목록, 안 읽은 수, 마지막 메시지를 한 번의 쿼리로 조회
+    chat_rooms = (
+        ChatRoom.objects.filter(memberships__user=user)
+        .annotate(unread_count=F("last_seq") - F("memberships__last_read_seq"))
+        .select_related("last_message")
+        .order_by(F("last_message_at").desc(nulls_last=True), "-id")
+    )
+    paginator = Paginator(chat_rooms, INBOX_PAGE_SIZE)
+    return paginator.get_page(page_number)
+
+
+def get_unread_total(user):
+    # 모든 방의 안 읽은 수 합계 (페이지와 상관없이 전역 배지에 사용)
+    total = ChatRoomParticipant.objects.filter(user=user).aggregate(
+        total=Sum(F("chat_room__last_seq") - F("last_read_seq"))
+    )["total"]
+    return total or 0
+
 
-from .models import ChatRoom
+def inbox_etag(request):
+    # 채팅 목록이 바뀌지 않았으면 polling 요청에 304 로 응답
+    state = ChatRoomParticipant.objects.filter(user=request.user).aggregate(
+        rooms=Count("id"),
+        last_seq=Sum("chat_room__last_seq"),
+        last_read_seq=Sum("last_read_seq"),
+        last_message_at=Max("chat_room__last_message_at"),
+    )
+    key = "%s:%s:%s:%s:%s" % (
+        request.GET.get("page"),
+        state["rooms"],
+        state["last_seq"],
+        state["last_read_seq"],
+        state["last_message_at"],
+    )
+    return hashlib.md5(key.encode("utf-8")).hexdigest()
 
 
 @login_required
 def inbox(request):
     if not request.user.is_authenticated:
         return redirect("accounts:login")
-    chat_rooms = request.user.chat_rooms.all()
-    chat_rooms_with_last_message = []
+    page_obj = get_inbox_page(request.user, request.GET.get("page"))
     all_users = request.user.get_followings_and_followers()
-    current_datetime = timezone.now()
-
-    for chat_room in chat_rooms:
-        unread_notifications = chat_room.notifications.filter(
-            user=request.user, is_read=False
-        ).count()
-        last_message = chat_room.messages.order_by("-timestamp").first()
-        chat_rooms_with_last_message.append(
-            (chat_room, last_message, unread_notifications)
-        )
-
-    chat_rooms_with_last_message.sort(
-        key=lambda x: x[1].timestamp
-        if x[1]
-        else current_datetime - timedelta(days=365),
-        reverse=True,
-    )
 
     context = {
-        "chat_rooms": chat_rooms_with_last_message,
+        "page_obj": page_obj,
         "all_users": all_users,
         "user_username": request.user.first_name,
     }
@@ -44,19 +97,17 @@ def inbox(request):
 
 
 @login_required
+@cache_control(no_cache=True)
+@condition(etag_func=inbox_etag)
 def unread_notifications(request):
-    user = request.user
-    chat_rooms = user.chat_rooms.all()
+    page_obj = get_inbox_page(request.user, request.GET.get("page"))
     chat_rooms_data = []
 
-    for chat_room in chat_rooms:
-        unread_notifications = chat_room.notifications.filter(
-            user=user, is_read=False
-        ).count()
-        last_message = chat_room.messages.order_by("-timestamp").first()
+    for chat_room in page_obj:
+        last_message = chat_room.last_message
 
         if last_message:
-            last_message_content = last_message.content
+            last_message_content = last_message.preview()
             last_message_timestamp = last_message.formatted_timestamp()
         else:
             last_message_content = "메세지없음"
@@ -66,21 +117,27 @@ def unread_notifications(request):
             {
                 "room_id": chat_room.pk,
                 "room_name": chat_room.name,
-                "unread_notifications": unread_notifications,
+                "unread_notifications": chat_room.unread_count,
                 "last_message": last_message_content,
                 "last_message_timestamp": last_message_timestamp,
             }
         )
 
-    response_data = {"data": chat_rooms_data}
+    response_data = {
+        "data": chat_rooms_data,
+        "total_unread": get_unread_total(request.user),
+    }
 
     return JsonResponse(response_data)
 
 
 @login_required
+@cache_control(no_cache=True)
+@condition(etag_func=inbox_etag)
 def get_new_chat_rooms(request):
+    page_obj = get_inbox_page(request.user, request.GET.get("page"))
     response_data = {"chat_rooms": []}
-    for chat_room in request.user.chat_rooms.all():
+    for chat_room in page_obj:
         response_data["chat_rooms"].append({"name": chat_room.name, "pk": chat_room.pk})
     return JsonResponse(response_data)
 
@@ -89,7 +146,7 @@ def get_new_chat_rooms(request):
 def start_chat(request, user_id):
     target_user = get_user_model().objects.get(id=user_id)
     chat_room = ChatRoom.get_or_create_chat_room([request.user, target_user])
-    return redirect("chat:room", room_name=chat_room.name)
+    return redirect("chat:room", room_id=chat_room.pk)
 
 
 @login_required
@@ -100,30 +157,82 @@ def start_group_chat(request):
             selected_users = get_user_model().objects.filter(id__in=selected_user_ids)
             selected_users = list(selected_users) + [request.user]
             chat_room = ChatRoom.get_or_create_chat_room(selected_users)
-            return redirect("chat:room", room_name=chat_room.name)
+            return redirect("chat:room", room_id=chat_room.pk)
     return redirect("chat:inbox")
 
 
 @login_required
-def room(request, room_name):
-    chat_room = ChatRoom.objects.get(name=room_name)
-    messages = chat_room.messages.all()
+def room(request, room_id):
+    chat_room = get_object_or_404(ChatRoom, pk=room_id)
     user = request.user
-    unread_notifications = chat_room.notifications.filter(user=user, is_read=False)
-    for notification in unread_notifications:
-        notification.mark_as_read()
+    # 방을 열면 읽음 위치를 마지막 메시지로 한 번에 이동 (참여자가 아니면 바뀌는 행이 없음)
+    joined = ChatRoomParticipant.objects.filter(chat_room=chat_room, user=user).update(
+        last_read_seq=Greatest("last_read_seq", chat_room.last_seq)
+    )
+    if not joined:
+        return redirect("chat:inbox")
+    messages, has_more = get_message_page(chat_room)
 
     context = {
-        "room_name": room_name,
+        "room_name": chat_room.name,
         "chat_room": chat_room,
         "messages": messages,
+        "has_more": has_more,
+        "last_seq": messages[-1].seq if messages else 0,
         "user": user,
     }
     return render(request, "chat/room.html", context)
 
 
 @login_required
-def delete_chat(request, room_name):
-    chat_room = ChatRoom.objects.get(name=room_name)
+def room_messages(request, room_id):
+    chat_room = get_object_or_404(ChatRoom, pk=room_id)
+    if not chat_room.memberships.filter(user=request.user).exists():
+        return JsonResponse({"message": "권한이 없습니다."}, status=403)
+    before = request.GET.get("before")
+    if before and not before.isdigit():
+        return JsonResponse({"message": "잘못된 요청입니다."}, status=400)
+    messages, has_more = get_message_page(chat_room, before)
+    return JsonResponse(
+        {
+            "messages": [message.as_dict() for message in messages],
+            "has_more": has_more,
+        }
+    )
+
+
+@login_required
+@require_POST
+def upload_attachment(request, room_id):
+    # 이미지는 HTTP 로 올리고, websocket 메시지에는 attachment_id 만 보냄
+    chat_room = get_object_or_404(ChatRoom, pk=room_id)
+    if not chat_room.memberships.filter(user=request.user).exists():
+        return JsonResponse({"message": "권한이 없습니다."}, status=403)
+    form = MessageAttachmentForm(request.POST, request.FILES)
+    if not form.is_valid():
+        return JsonResponse({"message": form.errors["image"][0]}, status=400)
+    attachment = form.save(commit=False)
+    attachment.chat_room = chat_room
+    attachment.uploader = request.user
+    attachment.save()
+    transaction.on_commit(
+        lambda: generate_thumbnails(attachment),
+        using=router.db_for_write(MessageAttachment),
+    )
+    return JsonResponse(attachment.as_dict(), status=201)
+
+
+@login_required
+def delete_chat(request, room_id):
+    chat_room = get_object_or_404(ChatRoom, pk=room_id)
+    user_ids = list(chat_room.memberships.values_list("user_id", flat=True))
+    if request.user.id not in user_ids:
+        return redirect("chat:inbox")
+    event = {
+        "type": "room_removed",
+        "room_id": chat_room.pk,
+        "room_name": chat_room.name,
+    }
     chat_room.delete()
+    notify_users(user_ids, event)
     return redirect("chat:inbox")
@@ -103,6 +103,9 @@ TEMPLATES = [
                 "django.contrib.messages.context_processors.messages",
                 "carts.context_processors.cart_counter",
             ],
+            "libraries": {
+                "renditions": "utils.templatetags.renditions",
+            },
         },
     },
 ]
@@ -110,12 +113,42 @@ TEMPLATES = [
 WSGI_APPLICATION = "planethelper.wsgi.application"
 ASGI_APPLICATION = "planethelper.asgi.application"
 
+# 여러 daphne 프로세스가 같은 호스트에서 SQLite 파일을 브로커로 공유
+# (프로세스 하나로만 띄울 때는 channels.layers.InMemoryChannelLayer 도 가능)
 CHANNEL_LAYERS = {
     "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer",
+        "BACKEND": "chat.layers.SQLiteChannelLayer",
+        "CONFIG": {
+            "path": os.getenv("CHANNEL_LAYER_DB", BASE_DIR / "channels.sqlite3"),
+        },
     },
 }
 
+# 채팅 메시지를 바로 broadcast 하고 저장은 모아서 한 트랜잭션으로 (내구성은 chat/buffer.py 참고)
+CHAT_WRITE_BEHIND = os.getenv("CHAT_WRITE_BEHIND") == "1"
+CHAT_WRITE_BEHIND_MAX_MESSAGES = 50
+CHAT_WRITE_BEHIND_MAX_DELAY_MS = 50
+
+# 접속 상태/입력 중 표시 (DB 를 쓰지 않음, chat/presence.py 참고)
+CHAT_PRESENCE_HEARTBEAT = 25
+CHAT_PRESENCE_TTL = 60
+CHAT_TYPING_INTERVAL_MS = 500
+
+# 오래된 채팅 메시지를 압축 파일로 옮김 (python manage.py archive_chat_messages)
+CHAT_ARCHIVE_ROOT = os.getenv("CHAT_ARCHIVE_ROOT", BASE_DIR / "chat_archive")
+CHAT_ARCHIVE_AFTER_DAYS = 90
+
+# 올리고 메시지로 보내지 않은 첨부 이미지는 이 시간이 지나면 삭제
+# (python manage.py prune_chat_attachments)
+CHAT_ATTACHMENT_UNUSED_HOURS = 24
+
+# 에코 뉴스는 캐시에서 보여주고 백그라운드에서 갱신 (utils/news.py 참고)
+# 테스트/오프라인에서는 NEWS_PROVIDER=stub
+NEWS_PROVIDER = os.getenv("NEWS_PROVIDER", "naver")
+NEWS_CACHE_TTL = 600
+NEWS_CACHE_PATH = os.getenv("NEWS_CACHE_PATH", BASE_DIR / "news_cache.json")
+NEWS_TIMEOUT = 3
+
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
@@ -124,9 +157,17 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
-    }
+    },
+    # 채팅 쓰기가 다른 앱의 쓰기를 막지 않도록 별도 파일 사용 (chat/routers.py)
+    # python manage.py migrate --database=chat
+    "chat": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.getenv("CHAT_DB", BASE_DIR / "chat.sqlite3"),
+    },
 }
 
+DATABASE_ROUTERS = ["chat.routers.ChatRouter"]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
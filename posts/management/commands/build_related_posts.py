@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import RelatedPost
+
+
+class Command(BaseCommand):
+    help = "모든 글의 비슷한 글(태그 코사인 유사도 top-K)을 다시 계산합니다. 태그가 바뀔 때는 자동으로 일부만 갱신됩니다."
+
+    def handle(self, *args, **options):
+        count = RelatedPost.rebuild()
+        self.stdout.write(f"글 {count}개의 비슷한 글을 계산했습니다.")
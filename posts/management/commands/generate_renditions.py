@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from utils.renditions import RENDITION_FIELDS, all_renditions
+
+
+class Command(BaseCommand):
+    help = "이미 올라와 있는 이미지 중 크기별 사본(small/medium/large, JPEG/WebP)이 없는 것을 만듭니다."
+
+    def handle(self, *args, **options):
+        total = 0
+        for model, field_name in RENDITION_FIELDS:
+            generated = 0
+            objects = (
+                model.objects.exclude(**{field_name: ""})
+                .exclude(**{f"{field_name}__isnull": True})
+                .only("pk", field_name)
+            )
+            for obj in objects.iterator():
+                file = getattr(obj, field_name)
+                if not file.storage.exists(file.name):
+                    continue
+                for spec in all_renditions(file):
+                    if not spec.storage.exists(spec.name):
+                        spec.generate(force=True)
+                        generated += 1
+            if generated:
+                self.stdout.write(f"{model._meta.label}.{field_name}: {generated}개")
+            total += generated
+        self.stdout.write(f"이미지 사본 {total}개를 만들었습니다.")
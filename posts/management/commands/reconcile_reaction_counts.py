@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from utils.reactions import COUNT_FIELDS, counted_reactions, reconcile
+
+
+class Command(BaseCommand):
+    help = "좋아요/싫어요 개수 컬럼을 실제 반응 수와 비교해 어긋난 행을 고칩니다."
+
+    def handle(self, *args, **options):
+        total = 0
+        for model, field in counted_reactions():
+            fixed = reconcile(model, field)
+            if fixed:
+                self.stdout.write(
+                    f"{model._meta.label}.{COUNT_FIELDS[field]}: {fixed}개"
+                )
+            total += fixed
+        self.stdout.write(f"개수 {total}개를 고쳤습니다.")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from utils.news import DEFAULT_KEYWORD, refresh_news
+
+
+class Command(BaseCommand):
+    help = "에코 뉴스 캐시를 지금 갱신합니다. cron 으로 NEWS_CACHE_TTL 보다 자주 실행하면 요청 중 갱신이 일어나지 않습니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keyword", default=DEFAULT_KEYWORD)
+
+    def handle(self, *args, **options):
+        result = refresh_news(options["keyword"])
+        self.stdout.write(f"뉴스 {len(result['items'])}개를 저장했습니다.")
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.18 on 2026-10-20 00:32
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_like_count(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.annotate(likes=Count('like_users')).filter(likes__gt=0)
+    for post in posts.only('id'):
+        Post.objects.filter(pk=post.pk).update(like_count=post.likes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['created_at', 'id'], name='posts_post_created_id_idx'),
+        ),
+        migrations.RunPython(fill_like_count, migrations.RunPython.noop),
+    ]
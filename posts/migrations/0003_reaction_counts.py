@@ -0,0 +1,37 @@
+# Generated by Django 3.2.18 on 2026-10-20 00:36
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_reaction_counts(apps, schema_editor):
+    Review = apps.get_model('posts', 'Review')
+    rows = Review.objects.annotate(
+        likes=Count('like_users', distinct=True),
+        dislikes=Count('dislike_users', distinct=True),
+    ).filter(Q(likes__gt=0) | Q(dislikes__gt=0))
+    for row in rows.only('id'):
+        Review.objects.filter(pk=row.pk).update(
+            like_count=row.likes, dislike_count=row.dislikes
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0002_post_like_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='dislike_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_reaction_counts, migrations.RunPython.noop),
+    ]
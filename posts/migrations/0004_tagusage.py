@@ -0,0 +1,46 @@
+# Generated by Django 3.2.18 on 2026-10-20 00:39
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_tag_usage(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    TaggedItem = apps.get_model('taggit', 'TaggedItem')
+    TagUsage = apps.get_model('posts', 'TagUsage')
+    post_type = ContentType.objects.filter(app_label='posts', model='post').first()
+    if post_type is None:
+        return
+    counts = (
+        TaggedItem.objects.filter(content_type=post_type)
+        .values('tag_id')
+        .annotate(count=Count('pk'))
+    )
+    TagUsage.objects.bulk_create(
+        TagUsage(tag_id=row['tag_id'], post_count=row['count']) for row in counts
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taggit', '0005_auto_20220424_2025'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('posts', '0003_reaction_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagUsage',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='usage', serialize=False, to='taggit.tag')),
+                ('post_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='tagusage',
+            index=models.Index(fields=['-post_count'], name='posts_tagusage_count_idx'),
+        ),
+        migrations.RunPython(fill_tag_usage, migrations.RunPython.noop),
+    ]
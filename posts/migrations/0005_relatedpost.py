@@ -0,0 +1,28 @@
+# Generated by Django 3.2.18 on 2026-10-20 00:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_tagusage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedPost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='posts.post')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.post')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='relatedpost',
+            constraint=models.UniqueConstraint(fields=('post', 'rank'), name='posts_relatedpost_rank_uniq'),
+        ),
+    ]
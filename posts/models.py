@@ -1,11 +1,30 @@
+import logging
 import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 from ckeditor_uploader.fields import RichTextUploadingField
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import IntegrityError, connections, models, router, transaction
+from django.db.models import Count, Q
+from django.db.models.signals import m2m_changed, post_delete
+from django.dispatch import receiver
 from imagekit.models import ProcessedImageField
 from taggit.managers import TaggableManager
+from taggit.models import Tag, TaggedItem
+
+from utils.renditions import add_renditions
+
+from .related import top_k_similar
+
+logger = logging.getLogger(__name__)
+
+# 비슷한 글 갱신은 한 번에 하나씩 (같은 글의 rank 를 동시에 다시 쓰지 않도록)
+executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="related-posts")
 
 
 class Post(models.Model):
@@ -18,10 +37,80 @@ class Post(models.Model):
     tags = TaggableManager(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # 목록에서 게시글마다 COUNT 하지 않도록 추천 수를 따로 저장 (utils.reactions)
+    like_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # 목록의 (created_at, id) keyset 페이지네이션용
+            models.Index(fields=["created_at", "id"], name="posts_post_created_id_idx"),
+        ]
 
     def __str__(self):
         return self.title
 
+    def set_tags(self, names):
+        """
+        태그를 names 로 바꾼다. 기존 태그와 비교해 추가/삭제된 것만 반영하고,
+        없는 Tag 는 한 번에 만든다. 빈 이름(끝의 쉼표 등)은 무시한다.
+        """
+        wanted = {}
+        for name in names:
+            name = name.strip()
+            # TAGGIT_CASE_INSENSITIVE: 대소문자만 다른 태그는 같은 태그
+            if name and name.lower() not in wanted:
+                wanted[name.lower()] = name
+
+        with transaction.atomic():
+            current = {tag.name.lower(): tag for tag in self.tags.all()}
+            removed = [tag.pk for key, tag in current.items() if key not in wanted]
+            added = [name for key, name in wanted.items() if key not in current]
+
+            tags = []
+            if added:
+                lookup = Q()
+                for name in added:
+                    lookup |= Q(name__iexact=name)
+                tags = list(Tag.objects.filter(lookup))
+                existing = {tag.name.lower() for tag in tags}
+                missing = []
+                for name in added:
+                    if name.lower() not in existing:
+                        tag = Tag(name=name)
+                        tag.slug = tag.slugify(name)
+                        missing.append(tag)
+                if missing:
+                    try:
+                        with transaction.atomic():
+                            Tag.objects.bulk_create(missing)
+                    except IntegrityError:
+                        # slug 가 겹치면 taggit 이 번호를 붙여 하나씩 저장
+                        for tag in missing:
+                            tag.slug = ""
+                            tag.save()
+                    tags = list(Tag.objects.filter(lookup))
+
+            post_type = ContentType.objects.get_for_model(Post)
+            if removed:
+                TaggedItem.objects.filter(
+                    content_type=post_type, object_id=self.pk, tag_id__in=removed
+                ).delete()
+            if tags:
+                TaggedItem.objects.bulk_create(
+                    TaggedItem(content_type=post_type, object_id=self.pk, tag=tag)
+                    for tag in tags
+                )
+                # TagUsage / RelatedPost 갱신 (taggit 의 add 와 같은 signal)
+                m2m_changed.send(
+                    sender=TaggedItem,
+                    instance=self,
+                    action="post_add",
+                    reverse=False,
+                    model=Tag,
+                    pk_set={tag.pk for tag in tags},
+                    using=router.db_for_write(TaggedItem),
+                )
+
     def delete(self, *args, **kargs):
         images = self.postimage_set.all()
         for image in images:
@@ -61,6 +150,9 @@ class PostImage(models.Model):
         super(PostImage, self).delete(*args, **kargs)
 
 
+add_renditions(PostImage, "image")
+
+
 class Review(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="reviews")
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -74,6 +166,8 @@ class Review(models.Model):
     dislike_users = models.ManyToManyField(
         settings.AUTH_USER_MODEL, related_name="dislike_reviews"
     )
+    like_count = models.PositiveIntegerField(default=0)
+    dislike_count = models.PositiveIntegerField(default=0)
 
 
 class ReviewImage(models.Model):
@@ -103,8 +197,208 @@ class ReviewImage(models.Model):
         super(ReviewImage, self).save(*args, **kwargs)
 
 
+add_renditions(ReviewImage, "image")
+
+
 class Zero(models.Model):
     name = models.CharField(max_length=100)
     address = models.CharField(max_length=100)
     region = models.CharField(max_length=100)
     phone_number = models.CharField(max_length=100, blank=True)
+
+
+class TagUsage(models.Model):
+    """태그별 게시글 수 (태그 목록에서 집계하지 않도록 태그가 바뀔 때 다시 셈)"""
+
+    tag = models.OneToOneField(
+        Tag, on_delete=models.CASCADE, primary_key=True, related_name="usage"
+    )
+    post_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-post_count"], name="posts_tagusage_count_idx"),
+        ]
+
+    @classmethod
+    def refresh(cls, tag_ids):
+        tag_ids = set(tag_ids)
+        if not tag_ids:
+            return
+        counts = dict(
+            TaggedItem.objects.filter(
+                content_type=ContentType.objects.get_for_model(Post),
+                tag_id__in=tag_ids,
+            )
+            .values("tag_id")
+            .annotate(count=Count("pk"))
+            .values_list("tag_id", "count")
+        )
+        for tag_id in tag_ids:
+            count = counts.get(tag_id, 0)
+            updated = cls.objects.filter(tag_id=tag_id).update(post_count=count)
+            if not updated and count:
+                cls.objects.create(tag_id=tag_id, post_count=count)
+
+
+class RelatedPost(models.Model):
+    """태그가 비슷한 글 top-K (posts/related.py 로 미리 계산)"""
+
+    TOP_K = 5
+
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="related_entries"
+    )
+    related = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["post", "rank"], name="posts_relatedpost_rank_uniq"
+            ),
+        ]
+
+    # commit 된 뒤 다시 계산할 글 (thread pool 이 한 번에 가져가므로 중복은 한 번만 계산)
+    _queued = set()
+    _queued_lock = threading.Lock()
+
+    @classmethod
+    def _tag_pairs(cls, **filters):
+        pairs = TaggedItem.objects.filter(
+            content_type=ContentType.objects.get_for_model(Post), **filters
+        ).values_list("object_id", "tag_id")
+        return [pair[0] for pair in pairs], [pair[1] for pair in pairs]
+
+    @classmethod
+    def _save(cls, similar):
+        with transaction.atomic():
+            cls.objects.filter(post_id__in=similar).delete()
+            cls.objects.bulk_create(
+                cls(post_id=post_id, related_id=related_id, score=score, rank=rank)
+                for post_id, entries in similar.items()
+                for rank, (related_id, score) in enumerate(entries)
+            )
+
+    @classmethod
+    def rebuild(cls):
+        """모든 글의 비슷한 글을 다시 계산"""
+        post_ids, tag_ids = cls._tag_pairs()
+        targets = list(Post.objects.values_list("pk", flat=True))
+        cls._save(top_k_similar(post_ids, tag_ids, targets, cls.TOP_K))
+        return len(targets)
+
+    @classmethod
+    def _compute(cls, targets, k=TOP_K):
+        """targets 와 태그가 하나라도 겹치는 글만으로 만든 부분 행렬에서 계산"""
+        _, tag_ids = cls._tag_pairs(object_id__in=targets)
+        candidates = set(
+            TaggedItem.objects.filter(
+                content_type=ContentType.objects.get_for_model(Post),
+                tag_id__in=set(tag_ids),
+            ).values_list("object_id", flat=True)
+        )
+        post_ids, tag_ids = cls._tag_pairs(object_id__in=candidates | set(targets))
+        return top_k_similar(post_ids, tag_ids, targets, k)
+
+    @classmethod
+    def refresh(cls, post_ids):
+        """
+        태그가 바뀐 글과, 그 글 때문에 목록이 달라지는 이웃 글만 다시 계산.
+
+        유사도는 대칭이고 바뀐 글이 끼지 않은 점수는 그대로이므로, 이웃의 목록은
+        바뀐 글이 원래 목록에 있었거나 새 점수가 저장된 K 번째 점수를 넘을 때만
+        달라진다. 앞의 경우만 이웃을 다시 계산하고, 뒤의 경우는 저장된 목록에 끼워 넣는다.
+        """
+        targets = set(Post.objects.filter(pk__in=post_ids).values_list("pk", flat=True))
+        if not targets:
+            return
+        # 이웃 판단에 쓰도록 겹치는 모든 글의 점수를 구함
+        scores = cls._compute(targets, k=None)
+        cls._save({target: entries[: cls.TOP_K] for target, entries in scores.items()})
+
+        new_scores = defaultdict(list)
+        for target, entries in scores.items():
+            for post_id, score in entries:
+                if post_id not in targets:
+                    new_scores[post_id].append((target, score))
+        neighbours = set(new_scores) | set(
+            cls.objects.filter(related_id__in=targets)
+            .exclude(post_id__in=targets)
+            .values_list("post_id", flat=True)
+        )
+        if not neighbours:
+            return
+        stored = defaultdict(list)
+        for post_id, related_id, score in (
+            cls.objects.filter(post_id__in=neighbours)
+            .order_by("rank")
+            .values_list("post_id", "related_id", "score")
+        ):
+            stored[post_id].append((related_id, score))
+
+        changed = {}
+        recompute = set()
+        for post_id in neighbours:
+            entries = stored[post_id]
+            if any(related_id in targets for related_id, _ in entries):
+                recompute.add(post_id)
+                continue
+            # 점수가 같으면 최근 글이 앞 (top_k_similar 와 같은 순서)
+            merged = sorted(
+                entries + new_scores[post_id], key=lambda entry: (-entry[1], -entry[0])
+            )[: cls.TOP_K]
+            if merged != entries:
+                changed[post_id] = merged
+        if recompute:
+            recompute = set(
+                Post.objects.filter(pk__in=recompute).values_list("pk", flat=True)
+            )
+            for post_id, entries in cls._compute(recompute).items():
+                if entries != stored[post_id]:
+                    changed[post_id] = entries
+        cls._save(changed)
+
+    @classmethod
+    def schedule_refresh(cls, post_id):
+        # 글 id 를 callback 에 담아 두므로 rollback 되면 함께 버려지고,
+        # 다른 요청의 commit 이 아직 보이지 않는 글을 가져가지 않는다
+        transaction.on_commit(partial(cls._enqueue, post_id))
+
+    @classmethod
+    def _enqueue(cls, post_id):
+        with cls._queued_lock:
+            # 이미 대기 중인 작업이 있으면 그 작업이 함께 계산
+            submit = not cls._queued
+            cls._queued.add(post_id)
+        if submit:
+            # 글 저장 요청이 이웃 글 계산을 기다리지 않도록 thread pool 에서 실행
+            executor.submit(cls._refresh_queued)
+
+    @classmethod
+    def _refresh_queued(cls):
+        with cls._queued_lock:
+            post_ids = set(cls._queued)
+            cls._queued.clear()
+        try:
+            cls.refresh(post_ids)
+        except Exception:
+            logger.exception("비슷한 글 갱신 실패 (%s)", sorted(post_ids))
+        finally:
+            connections.close_all()
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def post_tags_added(sender, instance, action, pk_set, **kwargs):
+    # 제거(remove/clear/게시글 삭제)는 TaggedItem post_delete 에서 처리
+    if action == "post_add" and isinstance(instance, Post):
+        TagUsage.refresh(pk_set)
+        RelatedPost.schedule_refresh(instance.pk)
+
+
+@receiver(post_delete, sender=TaggedItem)
+def post_tag_removed(sender, instance, **kwargs):
+    if instance.content_type_id == ContentType.objects.get_for_model(Post).pk:
+        TagUsage.refresh([instance.tag_id])
+        RelatedPost.schedule_refresh(instance.object_id)
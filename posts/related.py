@@ -0,0 +1,46 @@
+"""
+태그가 겹치는 정도로 비슷한 글을 찾는다.
+
+글×태그 0/1 행렬을 (글, 태그) 좌표로만 들고, 글 i 와 q 의 코사인 유사도
+|T_i ∩ T_q| / sqrt(|T_i| |T_q|) 를 i 의 태그에 달린 글들만 세어서 구한다.
+결과는 RelatedPost 에 미리 저장하고 상세 페이지는 저장된 값만 읽는다.
+"""
+import numpy as np
+
+
+def top_k_similar(pair_posts, pair_tags, targets, k):
+    """
+    (글 id, 태그 id) 좌표 배열로 만든 희소 행렬에서 targets 각 글과
+    유사도가 높은 글 k 개를 {target: [(글 id, 점수), ...]} 로 반환.
+    점수가 같으면 최근 글(id 가 큰 글)이 앞에 온다.
+    """
+    result = {target: [] for target in targets}
+    if len(pair_posts) == 0:
+        return result
+    posts, post_index = np.unique(np.asarray(pair_posts), return_inverse=True)
+    tags, tag_index = np.unique(np.asarray(pair_tags), return_inverse=True)
+
+    # 글 -> 태그 (CSR), 태그 -> 글 (CSC)
+    degree = np.bincount(post_index, minlength=len(posts))
+    post_ptr = np.concatenate(([0], np.cumsum(degree)))
+    row_tags = tag_index[np.argsort(post_index, kind="stable")]
+    tag_ptr = np.concatenate(([0], np.cumsum(np.bincount(tag_index))))
+    col_posts = post_index[np.argsort(tag_index, kind="stable")]
+
+    for target in targets:
+        i = np.searchsorted(posts, target)
+        if i >= len(posts) or posts[i] != target:
+            continue
+        row = row_tags[post_ptr[i] : post_ptr[i + 1]]
+        neighbours = np.concatenate(
+            [col_posts[tag_ptr[t] : tag_ptr[t + 1]] for t in row]
+        )
+        overlap = np.bincount(neighbours, minlength=len(posts))
+        overlap[i] = 0
+        candidates = np.flatnonzero(overlap)
+        scores = overlap[candidates] / np.sqrt(degree[i] * degree[candidates])
+        order = np.lexsort((-posts[candidates], -scores))[:k]
+        result[target] = list(
+            zip(posts[candidates[order]].tolist(), scores[order].tolist())
+        )
+    return result
@@ -1,3 +1,587 @@
-from django.test import TestCase
+import base64
+import io
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.template import Context, Template
+from django.urls import reverse
+from PIL import Image
+from taggit.models import Tag
+
+from utils import news, renditions
+from utils.pagination import (
+    adjacent_objects,
+    decode_cursor,
+    encode_cursor,
+    keyset_page,
+)
+from utils.reactions import reacted_ids, reconcile, toggle_reaction
+from utils.renditions import all_renditions
+
+from . import models
+from .models import Post, RelatedPost, Review, ReviewImage, TagUsage
+
+
+class SetTagsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("writer", password="pw")
+
+    def create_post(self, tags=()):
+        post = Post.objects.create(user=self.user, title="제목", content="내용")
+        if tags:
+            post.set_tags(tags)
+        return post
+
+    def tag_names(self, post):
+        return sorted(post.tags.values_list("name", flat=True))
+
+    def test_dedupes_case_insensitively_and_drops_empty_names(self):
+        post = self.create_post([" Eco", "eco", "ECO ", "", "  ", "zero"])
+
+        self.assertEqual(self.tag_names(post), ["Eco", "zero"])
+
+    def test_reuses_existing_tag_with_different_case(self):
+        Tag.objects.create(name="Eco")
+        post = self.create_post(["eco"])
+
+        self.assertEqual(self.tag_names(post), ["Eco"])
+        self.assertEqual(Tag.objects.count(), 1)
+
+    def test_replaces_only_changed_tags(self):
+        post = self.create_post(["eco", "zero"])
+        kept = post.tags.through.objects.get(tag__name="eco")
+
+        post.set_tags(["ECO", "plastic"])
+
+        self.assertEqual(self.tag_names(post), ["eco", "plastic"])
+        self.assertTrue(post.tags.through.objects.filter(pk=kept.pk).exists())
+
+    def test_falls_back_to_numbered_slug_on_collision(self):
+        Tag.objects.create(name="eco", slug="eco")
+        post = self.create_post(["eco!"])
+
+        tag = Tag.objects.get(name="eco!")
+        self.assertNotEqual(tag.slug, "eco")
+        self.assertTrue(tag.slug.startswith("eco"))
+        self.assertEqual(self.tag_names(post), ["eco!"])
+
+    def test_unchanged_tags_only_read_current_tags(self):
+        post = self.create_post(["eco", "zero"])
+
+        # 테스트 트랜잭션 안이라 BEGIN 대신 SAVEPOINT/RELEASE, 그 외에는 현재 태그 조회 한 번
+        with self.assertNumQueries(3):
+            post.set_tags(["zero", " ECO"])
+
+    def test_updates_tag_usage(self):
+        first = self.create_post(["eco", "zero"])
+        self.create_post(["eco"])
+
+        first.set_tags(["zero"])
+
+        counts = dict(TagUsage.objects.values_list("tag__name", "post_count"))
+        self.assertEqual(counts, {"eco": 1, "zero": 1})
+
+    def test_refreshes_related_posts_after_commit(self):
+        first = self.create_post()
+        second = self.create_post()
+
+        # 비슷한 글 갱신은 thread pool 대신 바로 실행
+        with mock.patch.object(
+            models.executor, "submit", lambda func, *args: func(*args)
+        ), self.captureOnCommitCallbacks(execute=True):
+            first.set_tags(["eco", "zero"])
+            second.set_tags(["eco"])
+
+        self.assertEqual(
+            list(first.related_entries.values_list("related_id", "rank")),
+            [(second.pk, 0)],
+        )
+        self.assertEqual(
+            list(second.related_entries.values_list("related_id", "rank")),
+            [(first.pk, 0)],
+        )
+
+    def test_rolled_back_tag_change_is_not_refreshed(self):
+        post = self.create_post()
+        run_now = mock.patch.object(
+            models.executor, "submit", lambda func, *args: func(*args)
+        )
+
+        with run_now, mock.patch.object(RelatedPost, "refresh") as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(IntegrityError), transaction.atomic():
+                    post.set_tags(["eco"])
+                    raise IntegrityError
+                post.set_tags(["zero"])
+
+        # commit 된 글만 한 번 다시 계산
+        refresh.assert_called_once_with({post.pk})
+
+
+class KeysetPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user("writer", password="pw")
+        cls.posts = [
+            Post.objects.create(user=user, title=str(i), content="내용") for i in range(7)
+        ]
+        # 앞의 다섯 개는 작성 시간이 같음
+        same = datetime(2024, 1, 1, 12, 0)
+        Post.objects.filter(pk__in=[post.pk for post in cls.posts[:5]]).update(
+            created_at=same
+        )
+        for i, post in enumerate(cls.posts[5:], 1):
+            Post.objects.filter(pk=post.pk).update(created_at=same + timedelta(hours=i))
+
+    def collect(self, per_page):
+        pages = []
+        cursor = None
+        while True:
+            objects, cursor = keyset_page(Post.objects.all(), cursor, per_page)
+            pages.append([post.pk for post in objects])
+            if cursor is None:
+                return pages
+
+    def test_pages_through_equal_timestamps_without_gaps_or_repeats(self):
+        pages = self.collect(per_page=2)
+
+        newest_first = [post.pk for post in reversed(self.posts)]
+        self.assertEqual(sum(pages, []), newest_first)
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+
+    def test_last_full_page_has_no_next_cursor(self):
+        objects, cursor = keyset_page(Post.objects.all(), None, 7)
+
+        self.assertEqual(len(objects), 7)
+        self.assertIsNone(cursor)
+
+    def test_cursor_round_trip(self):
+        post = Post.objects.get(pk=self.posts[2].pk)
+
+        self.assertEqual(decode_cursor(encode_cursor(post)), (post.created_at, post.pk))
+
+    def test_malformed_cursor_returns_first_page(self):
+        first_page, _ = keyset_page(Post.objects.all(), None, 3)
+
+        def encode(value):
+            return base64.urlsafe_b64encode(value.encode()).decode()
+
+        for cursor in [
+            "not-a-cursor",
+            "한글",
+            "!!!",
+            encode("{"),
+            encode("5"),
+            encode('["2024-01-01T12:00:00"]'),
+            encode('["yesterday", 3]'),
+            encode('["2024-01-01T12:00:00", "three"]'),
+            encode("[null, 3]"),
+            encode('["2024-01-01T12:00:00", null]'),
+        ]:
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(decode_cursor(cursor))
+                objects, _ = keyset_page(Post.objects.all(), cursor, 3)
+                self.assertEqual(objects, first_page)
+
+
+class AdjacentObjectsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user("writer", password="pw")
+        # 오래된 순서: older, tied[0], tied[1], tied[2], newer
+        cls.older, *cls.tied, cls.newer = [
+            Post.objects.create(user=user, title=str(i), content="내용") for i in range(5)
+        ]
+        same = datetime(2024, 1, 1, 12, 0)
+        Post.objects.filter(pk=cls.older.pk).update(created_at=same - timedelta(days=1))
+        Post.objects.filter(pk__in=[post.pk for post in cls.tied]).update(
+            created_at=same
+        )
+        Post.objects.filter(pk=cls.newer.pk).update(created_at=same + timedelta(days=1))
+
+    def neighbours(self, post, field="created_at"):
+        post = Post.objects.get(pk=post.pk)
+        return adjacent_objects(post, Post.objects.only("id"), field)
+
+    def test_orders_equal_timestamps_by_id(self):
+        chain = [self.older, *self.tied, self.newer]
+        for i, post in enumerate(chain[1:-1], 1):
+            with self.subTest(post=post.title):
+                self.assertEqual(self.neighbours(post), (chain[i - 1], chain[i + 1]))
+
+    def test_first_and_last_have_one_neighbour(self):
+        self.assertEqual(self.neighbours(self.older), (None, self.tied[0]))
+        self.assertEqual(self.neighbours(self.newer), (self.tied[-1], None))
+
+    def test_uses_given_field(self):
+        # updated_at 으로는 작성 순서(id 순서)와 같음
+        previous, next = self.neighbours(self.tied[0], field="updated_at")
+
+        self.assertEqual((previous, next), (self.older, self.tied[1]))
+
+
+class ReviewUpdateFormTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.writer = User.objects.create_user(
+            "writer", "writer@example.com", "pw", first_name="글쓴이"
+        )
+        cls.other = User.objects.create_user(
+            "other", "other@example.com", "pw", first_name="다른사람"
+        )
+        cls.post = Post.objects.create(user=cls.writer, title="제목", content="내용")
+        cls.review = Review.objects.create(
+            post=cls.post, user=cls.writer, title="댓글", content="내용"
+        )
+
+    def url(self, post_pk, review_pk):
+        return reverse("posts:review_update_form", args=[post_pk, review_pk])
+
+    def test_unknown_review_is_404(self):
+        self.client.force_login(self.writer)
+
+        response = self.client.get(self.url(self.post.pk, self.review.pk + 100))
+        self.assertEqual(response.status_code, 404)
+        # 다른 글의 댓글 번호로 요청해도 404
+        response = self.client.get(self.url(self.post.pk + 100, self.review.pk))
+        self.assertEqual(response.status_code, 404)
+
+    def test_other_user_is_forbidden(self):
+        self.client.force_login(self.other)
+
+        response = self.client.get(self.url(self.post.pk, self.review.pk))
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_image_form_shows_current_image(self):
+        ReviewImage.objects.create(review=self.review, image="review/1/photo.jpg")
+        self.client.force_login(self.writer)
+
+        response = self.client.get(self.url(self.post.pk, self.review.pk))
+
+        self.assertEqual(
+            response.context["u_image_form"].instance.image.name, "review/1/photo.jpg"
+        )
+        self.assertContains(response, "photo.jpg")
+
+
+class ReactionCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.writer = User.objects.create_user(
+            "writer", "writer@example.com", "pw", first_name="글쓴이"
+        )
+        cls.reader = User.objects.create_user(
+            "reader", "reader@example.com", "pw", first_name="읽는이"
+        )
+        cls.post = Post.objects.create(user=cls.writer, title="제목", content="내용")
+        cls.review = Review.objects.create(
+            post=cls.post, user=cls.writer, title="댓글", content="내용"
+        )
+
+    def like_count(self):
+        self.post.refresh_from_db()
+        return self.post.like_count
+
+    def test_toggle_updates_counter(self):
+        self.assertEqual(
+            toggle_reaction(self.post, "like_users", self.writer), (True, 1)
+        )
+        self.assertEqual(
+            toggle_reaction(self.post, "like_users", self.reader), (True, 2)
+        )
+        self.assertEqual(
+            toggle_reaction(self.post, "like_users", self.writer), (False, 1)
+        )
+        self.assertEqual(list(self.post.like_users.all()), [self.reader])
+
+    def test_counter_does_not_go_below_zero(self):
+        self.post.like_users.add(self.reader)
+
+        # 관리자 화면 등에서 개수만 어긋난 경우
+        self.assertEqual(
+            toggle_reaction(self.post, "like_users", self.reader), (False, 0)
+        )
+
+    def test_review_like_and_dislike_views(self):
+        self.client.force_login(self.reader)
+        args = [self.post.pk, self.review.pk]
+
+        self.client.post(reverse("posts:review_likes", args=args))
+        response = self.client.post(reverse("posts:review_dislikes", args=args))
+
+        self.assertEqual(
+            response.json(),
+            {
+                "r_is_disliked": True,
+                "review_dislikes_count": 1,
+                "r_is_liked": True,
+                "review_likes_count": 1,
+            },
+        )
+
+    def test_reconcile_fixes_drifted_counts(self):
+        self.post.like_users.add(self.writer, self.reader)
+        Review.objects.filter(pk=self.review.pk).update(dislike_count=3)
+
+        self.assertEqual(reconcile(Post, "like_users"), 1)
+        self.assertEqual(self.like_count(), 2)
+        call_command("reconcile_reaction_counts", stdout=io.StringIO())
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.dislike_count, 0)
+        self.assertEqual(reconcile(Post, "like_users"), 0)
+
+
+class ReactedIdsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.writer = User.objects.create_user(
+            "writer", "writer@example.com", "pw", first_name="글쓴이"
+        )
+        cls.reader = User.objects.create_user(
+            "reader", "reader@example.com", "pw", first_name="읽는이"
+        )
+        cls.post = Post.objects.create(user=cls.writer, title="제목", content="내용")
+        cls.reviews = [
+            Review.objects.create(
+                post=cls.post, user=cls.writer, title=str(i), content="내용"
+            )
+            for i in range(3)
+        ]
+        cls.reviews[0].like_users.add(cls.reader)
+        cls.reviews[2].like_users.add(cls.reader, cls.writer)
+        cls.reviews[1].dislike_users.add(cls.reader)
+
+    def test_one_query_for_page(self):
+        with self.assertNumQueries(1):
+            ids = reacted_ids(self.reviews, "like_users", self.reader)
+
+        self.assertEqual(ids, {self.reviews[0].pk, self.reviews[2].pk})
+
+    def test_anonymous_and_empty_page_skip_query(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                reacted_ids(self.reviews, "like_users", AnonymousUser()), set()
+            )
+            self.assertEqual(reacted_ids([], "like_users", self.reader), set())
+
+    def test_detail_page_marks_reacted_reviews(self):
+        self.client.force_login(self.reader)
+
+        response = self.client.get(reverse("posts:detail", args=[self.post.pk]))
+
+        self.assertEqual(
+            response.context["liked_review_ids"],
+            {self.reviews[0].pk, self.reviews[2].pk},
+        )
+        self.assertEqual(response.context["disliked_review_ids"], {self.reviews[1].pk})
+
+
+class NewsCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        news_settings = override_settings(
+            NEWS_PROVIDER="stub",
+            NEWS_CACHE_PATH=os.path.join(directory.name, "news_cache.json"),
+        )
+        news_settings.enable()
+        self.addCleanup(news_settings.disable)
+        for state in (news._cache, news._refreshing, news._failed_at):
+            self.addCleanup(state.clear)
+        # 백그라운드 갱신은 예약만 기록하고 테스트에서 직접 실행
+        self.scheduled = []
+        submit = mock.patch.object(
+            news.executor, "submit", lambda func, *args: self.scheduled.append(args)
+        )
+        submit.start()
+        self.addCleanup(submit.stop)
+
+    def run_scheduled(self):
+        scheduled, self.scheduled = self.scheduled, []
+        for (keyword,) in scheduled:
+            news._refresh_in_background(keyword)
+
+    def test_first_request_returns_empty_and_schedules_one_refresh(self):
+        self.assertEqual(news.get_news(), news.EMPTY_RESULT)
+        self.assertEqual(news.get_news(), news.EMPTY_RESULT)
+        self.assertEqual(self.scheduled, [(news.DEFAULT_KEYWORD,)])
+
+        self.run_scheduled()
+
+        self.assertEqual(len(news.get_news()["items"]), 10)
+        self.assertEqual(self.scheduled, [])
+
+    def test_stale_result_is_served_while_refreshing(self):
+        news.refresh_news()
+        news._cache[news.DEFAULT_KEYWORD]["fetched_at"] -= 3600
+        stale = news.get_news()
+
+        self.assertEqual(len(stale["items"]), 10)
+        self.assertEqual(len(self.scheduled), 1)
+        self.run_scheduled()
+        entry = news._cache[news.DEFAULT_KEYWORD]
+        self.assertLess(time.time() - entry["fetched_at"], 60)
+
+    def test_saved_result_survives_restart(self):
+        news.refresh_news()
+        news._cache.clear()
+
+        self.assertEqual(len(news.get_news()["items"]), 10)
+        self.assertEqual(self.scheduled, [])
+
+    def test_failed_refresh_keeps_old_result_and_backs_off(self):
+        news.refresh_news()
+        news._cache[news.DEFAULT_KEYWORD]["fetched_at"] -= 3600
+        news.get_news()
+
+        with mock.patch.dict(news.PROVIDERS, stub=mock.Mock(side_effect=OSError)):
+            with self.assertLogs("utils.news", "ERROR"):
+                self.run_scheduled()
+
+        self.assertEqual(len(news.get_news()["items"]), 10)
+        # RETRY_AFTER 안에는 다시 예약하지 않음
+        self.assertEqual(self.scheduled, [])
+
+
+class TagUsageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("writer", password="pw")
+
+    def create_post(self, tags):
+        post = Post.objects.create(user=self.user, title="제목", content="내용")
+        post.set_tags(tags)
+        return post
+
+    def counts(self):
+        return dict(TagUsage.objects.values_list("tag__name", "post_count"))
+
+    def test_refresh_recounts_given_tags(self):
+        self.create_post(["eco", "zero"])
+        self.create_post(["eco"])
+        TagUsage.objects.update(post_count=7)
+        unused = Tag.objects.create(name="unused")
+
+        TagUsage.refresh(Tag.objects.values_list("pk", flat=True))
+
+        self.assertEqual(self.counts(), {"eco": 2, "zero": 1})
+        self.assertFalse(TagUsage.objects.filter(tag=unused).exists())
+
+    def test_deleting_post_decrements_counts(self):
+        self.create_post(["eco", "zero"])
+        self.create_post(["eco"]).delete()
+
+        self.assertEqual(self.counts(), {"eco": 1, "zero": 1})
+
+    def test_tags_page_lists_used_tags_by_count(self):
+        self.create_post(["eco", "zero"])
+        self.create_post(["eco"]).set_tags([])
+        self.create_post(["eco"])
+
+        response = self.client.get(reverse("posts:tags"))
+
+        usages = [(u.tag.name, u.post_count) for u in response.context["usages"]]
+        self.assertEqual(usages, [("eco", 2), ("zero", 1)])
+
+    def test_unknown_tag_is_404(self):
+        response = self.client.get(reverse("posts:tag_detail", args=["없는태그"]))
+
+        self.assertEqual(response.status_code, 404)
+
+
+class RenditionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user("writer", password="pw")
+        post = Post.objects.create(user=user, title="제목", content="내용")
+        cls.review = Review.objects.create(
+            post=post, user=user, title="댓글", content="내용"
+        )
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media_root = override_settings(MEDIA_ROOT=directory.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        # 사본 생성은 thread pool 대신 바로 실행
+        submit = mock.patch.object(
+            renditions.executor, "submit", lambda func, *args: func(*args)
+        )
+        submit.start()
+        self.addCleanup(submit.stop)
+
+    def image(self, name):
+        data = io.BytesIO()
+        Image.new("RGB", (800, 600)).save(data, "JPEG")
+        return SimpleUploadedFile(name, data.getvalue(), "image/jpeg")
+
+    def create_image(self, name="photo.jpg"):
+        with self.captureOnCommitCallbacks(execute=True):
+            review_image = ReviewImage.objects.create(
+                review=self.review, image=self.image(name)
+            )
+        return review_image, all_renditions(review_image.image)
+
+    def existing(self, specs):
+        return [spec for spec in specs if spec.storage.exists(spec.name)]
+
+    def render(self, file):
+        template = Template(
+            "{% load renditions %}"
+            '{% responsive_image file sizes="50vw" class="photo" alt="" %}'
+        )
+        return template.render(Context({"file": file}))
+
+    def test_responsive_image_has_webp_and_jpeg_srcsets(self):
+        review_image, _ = self.create_image()
+        file = review_image.image
+        html = self.render(file)
+
+        self.assertIn('<source type="image/webp" srcset="', html)
+        for width in (320, 640, 1280):
+            self.assertIn(f"{width}w", html)
+        self.assertIn(f'data-fallback="{file.url}"', html)
+        self.assertIn('loading="lazy"', html)
+        self.assertIn(f'src="{review_image.image_medium.url}"', html)
+
+    def test_empty_file_renders_nothing(self):
+        self.assertEqual(self.render(ReviewImage(review=self.review).image), "")
+
+    def test_delete_removes_renditions(self):
+        review_image, specs = self.create_image()
+        self.assertEqual(len(self.existing(specs)), 6)
+
+        review_image.delete()
+
+        self.assertEqual(self.existing(specs), [])
+
+    def test_replacing_source_removes_old_renditions_after_commit(self):
+        review_image, old_specs = self.create_image("old.jpg")
+
+        # 파일이 그대로면 지우지 않음
+        with self.captureOnCommitCallbacks(execute=True):
+            review_image.save()
+        self.assertEqual(len(self.existing(old_specs)), 6)
+
+        review_image.image = self.image("new.jpg")
+        with self.captureOnCommitCallbacks(execute=True):
+            review_image.save()
+
+        self.assertEqual(self.existing(old_specs), [])
+        new_specs = all_renditions(review_image.image)
+        self.assertEqual(len(self.existing(new_specs)), 6)
@@ -6,6 +6,8 @@ urlpatterns = [
     path('', views.main, name='main'),
     path('index', views.index, name='index'),
     path('news/', views.news, name='news'),
+    path('tags/', views.tags, name='tags'),
+    path('tags/<str:slug>/', views.tag_detail, name='tag_detail'),
     path('create/', views.create, name='create'),
     path('<int:post_pk>/update/', views.update, name='update'),
     path('<int:post_pk>/', views.detail, name='detail'),
@@ -13,6 +15,7 @@ urlpatterns = [
     path('<int:post_pk>/likes/', views.likes, name='likes'),
     path('<int:post_pk>/create/', views.review_create, name='review_create'),
     path('<int:post_pk>/<int:review_pk>/update/', views.review_update, name='review_update'),
+    path('<int:post_pk>/<int:review_pk>/update/form/', views.review_update_form, name='review_update_form'),
     path('<int:post_pk>/<int:review_pk>/likes/', views.review_likes, name='review_likes'),
     path('<int:post_pk>/<int:review_pk>/dislikes/', views.review_dislikes, name='review_dislikes'),
     path('<int:post_pk>/<int:review_pk>/delete/', views.review_delete, name='review_delete'),
@@ -6,12 +6,15 @@ from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from django.http import HttpResponse, JsonResponse
-from django.shortcuts import redirect, render
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
+from taggit.models import Tag
 
 from utils.map import get_latlng_from_address
-from utils.news import search_naver_news
+from utils.news import get_news
+from utils.pagination import adjacent_objects, keyset_page
+from utils.reactions import has_reacted, reacted_ids, toggle_reaction
 from utils.zero import import_zero_data
 
 from .forms import (
@@ -22,7 +25,7 @@ from .forms import (
     ReviewForm,
     ReviewImageForm,
 )
-from .models import Post, PostImage, Review, ReviewImage, Zero
+from .models import Post, PostImage, Review, ReviewImage, TagUsage, Zero
 
 # @receiver(post_save, sender=Post)
 # def add_points_on_post_creation(sender, instance, created, **kwargs):
@@ -40,22 +43,54 @@ def main(request):
     return render(request, "posts/main.html")
 
 
-def index(request):
-    posts = Post.objects.all().order_by("-created_at")
-    paginator = Paginator(posts, 10)
+def post_list(request, posts, context):
+    posts = posts.select_related("user")
+    # ?cursor= 로 들어오면 OFFSET/COUNT 없이 (created_at, id) 기준으로 다음 글을 읽음
+    if "cursor" in request.GET:
+        page_obj, next_cursor = keyset_page(posts, request.GET["cursor"], 10)
+        context.update(
+            {
+                "page_obj": page_obj,
+                "cursor_mode": True,
+                "next_cursor": next_cursor,
+            }
+        )
+        return render(request, "posts/index.html", context)
+
+    paginator = Paginator(posts.order_by("-created_at", "-id"), 10)
     page_number = request.GET.get("page")
     page_obj = paginator.get_page(page_number)
+    context["page_obj"] = page_obj
+    return render(request, "posts/index.html", context)
+
+
+def index(request):
+    return post_list(request, Post.objects.all(), {})
+
+
+def tags(request):
+    usages = (
+        TagUsage.objects.filter(post_count__gt=0)
+        .select_related("tag")
+        .order_by("-post_count")[: settings.TAGGIT_LIMIT]
+    )
     context = {
-        "page_obj": page_obj,
+        "usages": usages,
     }
-    return render(request, "posts/index.html", context)
+    return render(request, "posts/tags.html", context)
+
+
+def tag_detail(request, slug):
+    tag = get_object_or_404(Tag, slug=slug)
+    context = {
+        "tag": tag,
+    }
+    return post_list(request, Post.objects.filter(tags=tag), context)
 
 
 def news(request):
-    keyword = "친환경"
-    result = search_naver_news(keyword)
-    result_json = json.loads(result)
-    context = {"result": result_json}
+    # 외부 API 는 백그라운드에서만 부름 (utils/news.py)
+    context = {"result": get_news()}
     return render(request, "posts/news.html", context)
 
 
@@ -66,13 +101,12 @@ def create(request):
     if request.method == "POST":
         post_form = PostForm(request.POST, request.FILES)
         files = request.FILES.getlist("image")
-        tags = request.POST.get("tags").split(",")
+        tags = request.POST.get("tags", "").split(",")
         if post_form.is_valid():
             post = post_form.save(commit=False)
             post.user = request.user
             post.save()
-            for tag in tags:
-                post.tags.add(tag.strip())
+            post.set_tags(tags)
             for i in files:
                 PostImage.objects.create(image=i, post=post)
             return redirect("posts:detail", post.pk)
@@ -85,39 +119,37 @@ def create(request):
 
 @login_required
 def detail(request, post_pk):
-    post = Post.objects.get(pk=post_pk)
-    reviews = post.reviews.all()
+    post = (
+        Post.objects.select_related("user")
+        .prefetch_related("postimage_set", "tags")
+        .get(pk=post_pk)
+    )
+    # 수정 폼은 review_update_form 에서 필요할 때만 만든다
+    reviews = post.reviews.select_related("user").prefetch_related("reviewimage_set")
     image_form = ReviewImageForm()
     review_form = ReviewForm()
-    u_review_forms = []
 
-    # 이전글 버튼
-    previous_post = (
-        Post.objects.filter(created_at__lt=post.created_at)
-        .order_by("-created_at")
-        .first()
-    )
+    # 이전글/다음글 버튼
+    previous_post, next_post = adjacent_objects(post, Post.objects.only("id"))
     previous_post_url = (
         reverse("posts:detail", args=[previous_post.id]) if previous_post else ""
     )
-
-    for review in reviews:
-        u_review_form = (
-            review,
-            ReviewForm(instance=review),
-            ReviewImageForm(instance=review.reviewimage_set.first()),
-            DeleteReviewImageForm(review=review),
-        )
-        u_review_forms.append(u_review_form)
+    next_post_url = reverse("posts:detail", args=[next_post.id]) if next_post else ""
+    # 비슷한 글은 미리 계산된 값만 읽음 (RelatedPost)
+    related_posts = post.related_entries.select_related("related").order_by("rank")
 
     context = {
         "post": post,
         "reviews": reviews,
         "image_form": image_form,
         "review_form": review_form,
-        "u_review_forms": u_review_forms,
         "previous_post_url": previous_post_url,
-        "likes_count": post.like_users.count(),
+        "next_post_url": next_post_url,
+        "related_posts": related_posts,
+        "likes_count": post.like_count,
+        "is_liked": has_reacted(post, "like_users", request.user),
+        "liked_review_ids": reacted_ids(reviews, "like_users", request.user),
+        "disliked_review_ids": reacted_ids(reviews, "dislike_users", request.user),
     }
     return render(request, "posts/detail.html", context)
 
@@ -125,15 +157,10 @@ def detail(request, post_pk):
 @login_required
 def likes(request, post_pk):
     post = Post.objects.get(pk=post_pk)
-    if request.user in post.like_users.all():
-        post.like_users.remove(request.user)
-        is_liked = False
-    else:
-        post.like_users.add(request.user)
-        is_liked = True
+    is_liked, likes_count = toggle_reaction(post, "like_users", request.user)
     context = {
         "is_liked": is_liked,
-        "likes_count": post.like_users.count(),
+        "likes_count": likes_count,
     }
     return JsonResponse(context)
 
@@ -150,10 +177,7 @@ def update(request, post_pk):
             post = post_form.save(commit=False)
             post.user = request.user
             post.save()
-            post.tags.clear()
-            tags = request.POST.get("tags").split(",")
-            for tag in tags:
-                post.tags.add(tag.strip())
+            post.set_tags(request.POST.get("tags", "").split(","))
             for delete_id in delete_ids:
                 post.postimage_set.filter(pk=delete_id).delete()
             for i in files:
@@ -212,8 +236,8 @@ def review_create(request, post_pk):
 
 @login_required
 def review_update(request, post_pk, review_pk):
-    post = Post.objects.get(pk=post_pk)
-    review = Review.objects.get(pk=review_pk)
+    post = get_object_or_404(Post, pk=post_pk)
+    review = get_object_or_404(Review, pk=review_pk)
     u_review_form = ReviewForm(instance=review)
     u_image_form = ReviewImageForm()
     delete_form = DeleteReviewImageForm(review=review)
@@ -246,9 +270,25 @@ def review_update(request, post_pk, review_pk):
     return render(request, "posts/detail.html", context)
 
 
+@login_required
+def review_update_form(request, post_pk, review_pk):
+    review = get_object_or_404(Review, pk=review_pk, post_id=post_pk)
+    if request.user != review.user:
+        return HttpResponseForbidden()
+    context = {
+        "post_pk": post_pk,
+        "review": review,
+        "u_review_form": ReviewForm(instance=review),
+        # 기존 이미지가 있으면 그 이미지를 보여줌 (review_update 와 같은 방식)
+        "u_image_form": ReviewImageForm(instance=review.reviewimage_set.first()),
+        "delete_form": DeleteReviewImageForm(review=review),
+    }
+    return render(request, "posts/review_update_form.html", context)
+
+
 @login_required
 def review_delete(request, post_pk, review_pk):
-    review = Review.objects.get(pk=review_pk)
+    review = get_object_or_404(Review, pk=review_pk)
     if request.user == review.user:
         review.delete()
 
@@ -257,36 +297,28 @@ def review_delete(request, post_pk, review_pk):
 
 @login_required
 def review_likes(request, post_pk, review_pk):
-    review = Review.objects.get(pk=review_pk)
-    if request.user in review.like_users.all():
-        review.like_users.remove(request.user)
-        r_is_liked = False
-    else:
-        review.like_users.add(request.user)
-        r_is_liked = True
+    review = get_object_or_404(Review, pk=review_pk)
+    r_is_liked, review_likes_count = toggle_reaction(review, "like_users", request.user)
     context = {
         "r_is_liked": r_is_liked,
-        "review_likes_count": review.like_users.count(),
-        "r_is_disliked": request.user in review.dislike_users.all(),
-        "review_dislikes_count": review.dislike_users.count(),
+        "review_likes_count": review_likes_count,
+        "r_is_disliked": has_reacted(review, "dislike_users", request.user),
+        "review_dislikes_count": review.dislike_count,
     }
     return JsonResponse(context)
 
 
 @login_required
 def review_dislikes(request, post_pk, review_pk):
-    review = Review.objects.get(pk=review_pk)
-    if request.user in review.dislike_users.all():
-        review.dislike_users.remove(request.user)
-        r_is_disliked = False
-    else:
-        review.dislike_users.add(request.user)
-        r_is_disliked = True
+    review = get_object_or_404(Review, pk=review_pk)
+    r_is_disliked, review_dislikes_count = toggle_reaction(
+        review, "dislike_users", request.user
+    )
     context = {
         "r_is_disliked": r_is_disliked,
-        "review_dislikes_count": review.dislike_users.count(),
-        "r_is_liked": request.user in review.like_users.all(),
-        "review_likes_count": review.like_users.count(),
+        "review_dislikes_count": review_dislikes_count,
+        "r_is_liked": has_reacted(review, "like_users", request.user),
+        "review_likes_count": review.like_count,
     }
     return JsonResponse(context)
 
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.18 on 2026-10-20 00:36
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_like_count(apps, schema_editor):
+    S_Product = apps.get_model('secondhands', 'S_Product')
+    rows = S_Product.objects.annotate(likes=Count('like_users')).filter(likes__gt=0)
+    for row in rows.only('id'):
+        S_Product.objects.filter(pk=row.pk).update(like_count=row.likes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('secondhands', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='s_product',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_like_count, migrations.RunPython.noop),
+    ]
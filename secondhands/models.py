@@ -7,6 +7,8 @@ from django.db.models import Sum
 from imagekit.models import ProcessedImageField
 from imagekit.processors import ResizeToFill
 
+from utils.renditions import add_renditions
+
 # from ckeditor.fields import RichTextField
 
 
@@ -18,6 +20,7 @@ class S_Product(models.Model):
     like_users = models.ManyToManyField(
         settings.AUTH_USER_MODEL, related_name="like_s_products", blank=True
     )
+    like_count = models.PositiveIntegerField(default=0)
     city = models.CharField(max_length=10)
     address = models.CharField(max_length=100)
     road_address = models.CharField(max_length=100)
@@ -54,6 +57,9 @@ class S_ProductImage(models.Model):
         super(S_ProductImage, self).delete(*args, **kargs)
 
 
+add_renditions(S_ProductImage, "image")
+
+
 class S_Purchase(models.Model):
     customer = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="s_purchases"
@@ -7,6 +7,7 @@ from django.http import JsonResponse
 from django.shortcuts import redirect, render
 
 from utils.map import get_latlng_from_address
+from utils.reactions import has_reacted, toggle_reaction
 
 from .forms import S_DeleteImageForm, S_ProductForm, S_ProductImageForm
 from .models import S_Product, S_ProductImage, S_Purchase, S_Sales
@@ -187,6 +188,7 @@ def detail(request, product_pk):
         "u_longitude": u_longitude,
         "distance": distance,
         "d_address": d_address,
+        "is_liked": has_reacted(product, "like_users", request.user),
     }
     return render(request, "secondhands/detail.html", context)
 
@@ -194,15 +196,10 @@ def detail(request, product_pk):
 @login_required
 def likes(request, product_pk):
     product = S_Product.objects.get(pk=product_pk)
-    if request.user in product.like_users.all():
-        product.like_users.remove(request.user)
-        is_liked = False
-    else:
-        product.like_users.add(request.user)
-        is_liked = True
+    is_liked, likes_count = toggle_reaction(product, "like_users", request.user)
     context = {
         "is_liked": is_liked,
-        "likes_count": product.like_users.count(),
+        "likes_count": likes_count,
     }
     return JsonResponse(context)
 
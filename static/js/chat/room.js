@@ -1,6 +1,32 @@
 document.addEventListener('DOMContentLoaded', () => {
-  const roomName = JSON.parse(document.getElementById('room-name').textContent);
+  const roomId = JSON.parse(document.getElementById('room-id').textContent);
   const username = document.getElementById('username').value;
+  const chatRoom = document.getElementById('chat-room');
+  const messagesUrl = chatRoom.dataset.messagesUrl;
+  const uploadUrl = chatRoom.dataset.uploadUrl;
+  let hasMore = chatRoom.dataset.hasMore === 'true';
+  let isLoading = false;
+
+  // 빠짐없이 받은 마지막 메시지 순번. 재접속할 때 ?since= 로 보내서 놓친 메시지를 받음
+  // 서로 다른 사람의 메시지는 순번과 다른 순서로 도착할 수 있으므로, 중복은 받은 순번 집합으로
+  // 거르고, 중간이 비면 그 구간을 다시 요청함
+  let lastSeq = parseInt(chatRoom.dataset.lastSeq) || 0;
+  const seenSeqs = new Set(
+    Array.from(chatRoom.querySelectorAll('.message[data-seq]'), element => parseInt(element.dataset.seq))
+  );
+  let replayRequested = false;
+  let reconnectDelay = 1000;
+  let chatSocket = null;
+
+  // 접속 상태와 입력 중 표시 (settings.CHAT_PRESENCE_HEARTBEAT 와 맞춤)
+  const HEARTBEAT_INTERVAL = 25000;
+  const TYPING_SEND_INTERVAL = 1000;
+  const TYPING_DISPLAY_TIME = 3000;
+  const presenceElement = document.getElementById('presence');
+  const typingElement = document.getElementById('typing-indicator');
+  const presenceUsers = new Map();
+  const typingUsers = new Map();
+  let lastTypingSent = 0;
 
   let loc = window.location;
   let wsStart = 'ws://';
@@ -8,36 +34,168 @@ document.addEventListener('DOMContentLoaded', () => {
     wsStart = 'wss://';
   }
 
-  const chatSocket = new WebSocket(
-    wsStart + window.location.host + '/ws/chat/' + roomName + '/'
-  );
+  function connect() {
+    chatSocket = new WebSocket(
+      wsStart + window.location.host + '/ws/chat/' + roomId + '/?since=' + lastSeq
+    );
+
+    chatSocket.onopen = function (event) {
+      console.log('WebSocket connection established.');
+      reconnectDelay = 1000;
+      // 접속할 때 ?since= 로 다시 받으므로 이전 요청은 잊음
+      replayRequested = false;
+      sendHeartbeat();
+    };
+
+    chatSocket.onmessage = function (event) {
+      const message = JSON.parse(event.data);
+      if (message.reload) {
+        window.location.reload();
+        return;
+      }
+      if (message.presence) {
+        updatePresence(message.presence);
+        return;
+      }
+      if (message.typing) {
+        updateTyping(message.typing);
+        return;
+      }
+      if (message.replayed !== undefined) {
+        // 다시 받은 구간에 없는 순번은 더 기다리지 않음
+        replayRequested = false;
+        advanceLastSeq(message.replayed);
+        return;
+      }
+      // 재전송과 실시간 메시지가 겹칠 수 있으므로 이미 받은 순번은 무시
+      if (seenSeqs.has(message.seq)) {
+        return;
+      }
+      seenSeqs.add(message.seq);
+      typingUsers.delete(message.sender);
+      renderTyping();
+      displayMessage(toMessage(message));
+      if (message.seq > lastSeq + 1) {
+        requestReplay();
+      }
+      advanceLastSeq(lastSeq);
+    };
+
+
+    chatSocket.onclose = function (event) {
+      console.log('WebSocket connection closed.');
+      setTimeout(connect, reconnectDelay);
+      reconnectDelay = Math.min(reconnectDelay * 2, 30000);
+    };
 
-  chatSocket.onopen = function (event) {
-    console.log('WebSocket connection established.');
-  };
-
-  chatSocket.onmessage = function (event) {
-    const message = JSON.parse(event.data);
-    displayMessage({
-      sender: message.sender,
-      content: message.message,
-      formatted_timestamp: message.formatted_timestamp,
-      sender_image_url: message.sender_image_url
+    chatSocket.onerror = function (event) {
+      console.error('WebSocket error:', event);
+    };
+  }
+
+  connect();
+
+  function sendEvent(data) {
+    if (chatSocket && chatSocket.readyState === WebSocket.OPEN) {
+      chatSocket.send(JSON.stringify(data));
+    }
+  }
+
+  // seq 까지는 다 받은 것으로 보고, 그 뒤로 이어서 받은 순번까지 lastSeq 를 올림
+  function advanceLastSeq(seq) {
+    lastSeq = Math.max(lastSeq, seq);
+    while (seenSeqs.has(lastSeq + 1)) {
+      lastSeq += 1;
+    }
+  }
+
+  // lastSeq 다음부터 비어 있는 메시지를 다시 요청 (응답이 오기 전에는 한 번만)
+  function requestReplay() {
+    if (replayRequested) {
+      return;
+    }
+    replayRequested = true;
+    sendEvent({'type': 'replay', 'since': lastSeq});
+  }
+
+  function sendHeartbeat() {
+    sendEvent({
+      'type': 'heartbeat',
+      'status': document.hidden ? 'away' : 'online'
     });
-  };
+  }
 
+  setInterval(sendHeartbeat, HEARTBEAT_INTERVAL);
+  document.addEventListener('visibilitychange', sendHeartbeat);
 
-  chatSocket.onclose = function (event) {
-    console.log('WebSocket connection closed.');
-  };
+  function updatePresence(presence) {
+    if (presence.user === username) {
+      return;
+    }
+    if (presence.status === 'offline') {
+      presenceUsers.delete(presence.user);
+    } else {
+      presenceUsers.set(presence.user, {
+        status: presence.status,
+        expires: Date.now() + presence.ttl * 1000
+      });
+    }
+    renderPresence();
+  }
 
-  chatSocket.onerror = function (event) {
-    console.error('WebSocket error:', event);
-  };
+  function renderPresence() {
+    const now = Date.now();
+    presenceElement.innerHTML = '';
+    presenceUsers.forEach((presence, user) => {
+      // heartbeat 가 끊긴 사용자는 offline 으로 보고 지움
+      if (presence.expires <= now) {
+        presenceUsers.delete(user);
+        return;
+      }
+      const userElement = document.createElement('span');
+      userElement.classList.add('presence-user', presence.status);
+      userElement.textContent = user;
+      presenceElement.appendChild(userElement);
+    });
+  }
+
+  function updateTyping(users) {
+    users.forEach(user => {
+      if (user.user !== username) {
+        typingUsers.set(user.user, Date.now() + TYPING_DISPLAY_TIME);
+      }
+    });
+    renderTyping();
+  }
+
+  function renderTyping() {
+    const now = Date.now();
+    typingUsers.forEach((expires, user) => {
+      if (expires <= now) {
+        typingUsers.delete(user);
+      }
+    });
+    typingElement.textContent = typingUsers.size
+      ? Array.from(typingUsers.keys()).join(', ') + '님이 입력 중...'
+      : '';
+  }
+
+  setInterval(() => {
+    renderPresence();
+    renderTyping();
+  }, 1000);
 
   const form = document.getElementById('text_form');
   const messageInput = document.getElementById('message_input');
 
+  messageInput.addEventListener('input', () => {
+    const now = Date.now();
+    if (now - lastTypingSent >= TYPING_SEND_INTERVAL) {
+      lastTypingSent = now;
+      sendEvent({'type': 'typing'});
+    }
+  });
+
   form.addEventListener('submit', function (event) {
     event.preventDefault();
     const message = messageInput.value.trim();
@@ -47,26 +205,96 @@ document.addEventListener('DOMContentLoaded', () => {
       };
       chatSocket.send(JSON.stringify(messageData));
       messageInput.value = '';
+      lastTypingSent = 0;
     }
   });
 
-  function displayMessage(message) {
-    const chatRoom = document.getElementById('chat-room');
+  // 이미지는 HTTP 로 올린 뒤 websocket 으로는 id 만 보냄
+  const attachmentInput = document.getElementById('attachment_input');
+  const csrfToken = form.querySelector('[name=csrfmiddlewaretoken]').value;
+
+  attachmentInput.addEventListener('change', () => {
+    const file = attachmentInput.files[0];
+    if (!file) {
+      return;
+    }
+    const formData = new FormData();
+    formData.append('image', file);
+    fetch(uploadUrl, {
+      method: 'POST',
+      headers: {'X-CSRFToken': csrfToken},
+      body: formData
+    })
+      .then(response => response.json().then(data => ({ok: response.ok, data})))
+      .then(({ok, data}) => {
+        if (!ok) {
+          alert(data.message);
+          return;
+        }
+        sendEvent({'message': '', 'attachment_id': data.id});
+      })
+      .finally(() => {
+        attachmentInput.value = '';
+      });
+  });
+
+  // 서버에서 받은 메시지(websocket, API 공통)를 화면용 형식으로 변환
+  function toMessage(data) {
+    return {
+      id: data.id,
+      seq: data.seq,
+      sender: data.sender,
+      content: data.message,
+      formatted_timestamp: data.formatted_timestamp,
+      sender_image_url: data.sender_image_url,
+      attachment: data.attachment
+    };
+  }
 
+  // 썸네일은 업로드 직후 만들어지므로 아직 없으면 원본을 보여줌
+  function createAttachmentElement(attachment) {
+    const link = document.createElement('a');
+    link.classList.add('message-attachment');
+    link.href = attachment.url;
+    link.target = '_blank';
+    const img = document.createElement('img');
+    img.loading = 'lazy';
+    img.src = attachment.small_url;
+    img.onerror = () => {
+      img.onerror = null;
+      img.src = attachment.url;
+    };
+    link.appendChild(img);
+    return link;
+  }
+
+  function removeNoMessages() {
     const noMessagesElement = chatRoom.querySelector('p');
     if (noMessagesElement && noMessagesElement.textContent === "No messages yet.") {
       chatRoom.removeChild(noMessagesElement);
     }
+  }
 
+  function createMessageElement(message) {
     const messageElement = document.createElement('div');
     messageElement.classList.add('message');
+    // write-behind 모드에서 방금 받은 메시지는 아직 id 가 없음 (순번만 있음)
+    if (message.id) {
+      messageElement.dataset.id = message.id;
+    }
+    messageElement.dataset.seq = message.seq;
 
     if (message.sender === username) {
       messageElement.classList.add('my-message');
-      const me_content = document.createElement('p');
-      me_content.textContent = message.content;
-      me_content.classList.add('message-content_me')
-      messageElement.appendChild(me_content);
+      if (message.attachment) {
+        messageElement.appendChild(createAttachmentElement(message.attachment));
+      }
+      if (message.content) {
+        const me_content = document.createElement('p');
+        me_content.textContent = message.content;
+        me_content.classList.add('message-content_me')
+        messageElement.appendChild(me_content);
+      }
       
     } else {
       messageElement.classList.add('other-message');
@@ -87,10 +315,15 @@ document.addEventListener('DOMContentLoaded', () => {
 
       messageElement.appendChild(senderDiv);
 
-      const content = document.createElement('p');
-      content.textContent = message.content;
-      content.classList.add('message-content')
-      messageElement.appendChild(content);
+      if (message.attachment) {
+        messageElement.appendChild(createAttachmentElement(message.attachment));
+      }
+      if (message.content) {
+        const content = document.createElement('p');
+        content.textContent = message.content;
+        content.classList.add('message-content')
+        messageElement.appendChild(content);
+      }
 
 
     }
@@ -102,13 +335,52 @@ document.addEventListener('DOMContentLoaded', () => {
     timestamp.classList.add('time-stamp')
     messageElement.appendChild(timestamp);
 
-    chatRoom.appendChild(messageElement);
-    chatRoom.scrollTop = chatRoom.scrollHeight;
+    return messageElement;
+  }
+
+  function displayMessage(message) {
+    removeNoMessages();
+    // 늦게 도착한 앞 순번 메시지는 순번 자리에 끼워 넣음
+    const next = Array.from(chatRoom.querySelectorAll('.message[data-seq]')).find(
+      element => parseInt(element.dataset.seq) > message.seq
+    );
+    chatRoom.insertBefore(createMessageElement(message), next || null);
     scrollToBottom();
   }
 
+  // 스크롤이 맨 위에 닿으면 이전 메시지를 한 페이지씩 불러옴
+  function loadOlderMessages() {
+    const oldestMessage = chatRoom.querySelector('.message[data-id]');
+    if (!hasMore || isLoading || !oldestMessage) {
+      return;
+    }
+    isLoading = true;
+    fetch(messagesUrl + '?before=' + oldestMessage.dataset.id)
+      .then(response => response.json())
+      .then(data => {
+        const previousHeight = chatRoom.scrollHeight;
+        const fragment = document.createDocumentFragment();
+        data.messages.forEach(message => {
+          seenSeqs.add(message.seq);
+          fragment.appendChild(createMessageElement(toMessage(message)));
+        });
+        chatRoom.insertBefore(fragment, chatRoom.firstChild);
+        // 새로 추가된 높이만큼 내려서 보고 있던 위치 유지
+        chatRoom.scrollTop += chatRoom.scrollHeight - previousHeight;
+        hasMore = data.has_more;
+      })
+      .finally(() => {
+        isLoading = false;
+      });
+  }
+
+  chatRoom.addEventListener('scroll', () => {
+    if (chatRoom.scrollTop < 50) {
+      loadOlderMessages();
+    }
+  });
+
   function scrollToBottom() {
-    const chatRoom = document.getElementById('chat-room');
     chatRoom.scrollTop = chatRoom.scrollHeight;
     }
     
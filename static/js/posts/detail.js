@@ -2,12 +2,31 @@ function showAlert() {
   alert("이전 글이 없습니다.");
 }
 
+function showNextAlert() {
+  alert("다음 글이 없습니다.");
+}
+
 
 
 function toggleReviewUpdateForm(review_id) {
   const form = document.getElementById("reviewUpdateForm" + review_id);
   const box = document.querySelector(".review--box" + review_id);
   const button = document.getElementById("reviewUpdateButton" + review_id);
+
+  // 수정 폼은 처음 열 때 서버에서 받아옴
+  if (!form.dataset.loaded) {
+    axios.get(form.dataset.url)
+      .then((response) => {
+        form.innerHTML = response.data;
+        form.dataset.loaded = "true";
+        toggleReviewUpdateForm(review_id);
+      })
+      .catch((error) => {
+        console.log(error.response);
+        alert("수정 폼을 불러오지 못했습니다. 잠시 후 다시 시도해 주세요.");
+      });
+    return;
+  }
   
   if (form.style.display === "none") {
     form.style.display = "block";
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.18 on 2026-10-20 00:45
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0002_reaction_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['store', 'created_at', 'id'], name='stores_product_created_id_idx'),
+        ),
+    ]
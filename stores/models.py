@@ -11,6 +11,8 @@ from django.dispatch import receiver
 from imagekit.models import ProcessedImageField
 from imagekit.processors import ResizeToFill
 
+from utils.renditions import add_renditions
+
 POINT_PER_PRICE = 0.01
 
 
@@ -31,6 +33,10 @@ class Store(models.Model):
         return f"{self.user.username}의 상점: {self.name}"
 
 
+add_renditions(Store, "image")
+add_renditions(Store, "main_image")
+
+
 class Product(models.Model):
     store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name="products")
     like_users = models.ManyToManyField(
@@ -49,11 +55,24 @@ class Product(models.Model):
     detail_image = ProcessedImageField(
         upload_to=p_product_image_path, blank=True, null=True
     )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # 상세 페이지의 같은 상점 이전/다음 상품 (utils.pagination.adjacent_objects)
+            models.Index(
+                fields=["store", "created_at", "id"],
+                name="stores_product_created_id_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.store.name} 상점의 {self.name}"
 
 
+add_renditions(Product, "detail_image")
+
+
 class ProductImage(models.Model):
     product = models.ForeignKey(
         Product, on_delete=models.CASCADE, related_name="images"
@@ -67,6 +86,9 @@ class ProductImage(models.Model):
     image = ProcessedImageField(upload_to=product_image_path, blank=True, null=True)
 
 
+add_renditions(ProductImage, "image")
+
+
 class ProductReview(models.Model):
     product = models.ForeignKey(
         Product, on_delete=models.CASCADE, related_name="p_reviews"
@@ -105,6 +127,8 @@ class ProductReview(models.Model):
     dislike_users = models.ManyToManyField(
         settings.AUTH_USER_MODEL, related_name="dislike_p_reviews"
     )
+    like_count = models.PositiveIntegerField(default=0)
+    dislike_count = models.PositiveIntegerField(default=0)
 
     # @receiver(post_save)
     def save(self, *args, **kwargs):
@@ -115,6 +139,13 @@ class ProductReview(models.Model):
         super(ProductReview, self).save(*args, **kwargs)
 
 
+add_renditions(ProductReview, "image1")
+add_renditions(ProductReview, "image2")
+add_renditions(ProductReview, "image3")
+add_renditions(ProductReview, "image4")
+add_renditions(ProductReview, "image5")
+
+
 # class ProductReviewImage(models.Model):
 #     review = models.ForeignKey(ProductReview, on_delete=models.CASCADE, related_name='images')
 
@@ -1,3 +1,46 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from .models import Product, ProductReview, Store
+
+
+class ReviewReactionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.seller = User.objects.create_user(
+            "seller", "seller@example.com", "pw", first_name="판매자"
+        )
+        cls.buyer = User.objects.create_user(
+            "buyer", "buyer@example.com", "pw", first_name="구매자"
+        )
+        cls.store = Store.objects.create(user=cls.seller, name="상점")
+        cls.product = Product.objects.create(
+            store=cls.store, name="상품", price=1000, category="기타"
+        )
+        cls.review = ProductReview.objects.create(
+            product=cls.product, user=cls.buyer, title="후기"
+        )
+
+    def react(self, name):
+        args = [self.store.pk, self.product.pk, self.review.pk]
+        return self.client.post(reverse(f"stores:{name}", args=args)).json()
+
+    def test_like_and_dislike_toggle_counters(self):
+        self.client.force_login(self.buyer)
+
+        self.assertEqual(self.react("reviews_likes")["review_likes_count"], 1)
+        self.assertEqual(
+            self.react("reviews_dislikes"),
+            {
+                "r_is_disliked": True,
+                "review_dislikes_count": 1,
+                "r_is_liked": True,
+                "review_likes_count": 1,
+            },
+        )
+        self.assertEqual(self.react("reviews_likes")["review_likes_count"], 0)
+
+        self.review.refresh_from_db()
+        self.assertEqual((self.review.like_count, self.review.dislike_count), (0, 1))
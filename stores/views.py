@@ -2,6 +2,9 @@ from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.shortcuts import redirect, render
 
+from utils.pagination import adjacent_objects
+from utils.reactions import has_reacted, reacted_ids, toggle_reaction
+
 from .forms import *
 from .models import Product, ProductReview, Store
 
@@ -115,7 +118,10 @@ def products_create(request, store_pk):
 def products_detail(request, store_pk, product_pk):
     store = Store.objects.get(pk=store_pk)
     product = Product.objects.get(pk=product_pk)
-    reviews = ProductReview.objects.filter(product=product)
+    reviews = ProductReview.objects.filter(product=product).select_related("user")
+    previous_product, next_product = adjacent_objects(
+        product, store.products.only("id", "name")
+    )
     for review in reviews:
         review.review_images = [
             review.image1,
@@ -128,6 +134,11 @@ def products_detail(request, store_pk, product_pk):
         "store": store,
         "product": product,
         "reviews": reviews,
+        "previous_product": previous_product,
+        "next_product": next_product,
+        "is_liked": has_reacted(product, "like_users", request.user),
+        "liked_review_ids": reacted_ids(reviews, "like_users", request.user),
+        "disliked_review_ids": reacted_ids(reviews, "dislike_users", request.user),
     }
     return render(request, "stores/products_detail.html", context)
 
@@ -249,17 +260,12 @@ def reviews_delete(request, store_pk, product_pk, review_pk):
 @login_required
 def reviews_likes(request, store_pk, product_pk, review_pk):
     review = ProductReview.objects.get(pk=review_pk)
-    if request.user in review.like_users.all():
-        review.like_users.remove(request.user)
-        r_is_liked = False
-    else:
-        review.like_users.add(request.user)
-        r_is_liked = True
+    r_is_liked, review_likes_count = toggle_reaction(review, "like_users", request.user)
     context = {
         "r_is_liked": r_is_liked,
-        "review_likes_count": review.like_users.count(),
-        "r_is_disliked": request.user in review.dislike_users.all(),
-        "review_dislikes_count": review.dislike_users.count(),
+        "review_likes_count": review_likes_count,
+        "r_is_disliked": has_reacted(review, "dislike_users", request.user),
+        "review_dislikes_count": review.dislike_count,
     }
     return JsonResponse(context)
 
@@ -267,16 +273,13 @@ def reviews_likes(request, store_pk, product_pk, review_pk):
 @login_required
 def reviews_dislikes(request, store_pk, product_pk, review_pk):
     review = ProductReview.objects.get(pk=review_pk)
-    if request.user in review.dislike_users.all():
-        review.dislike_users.remove(request.user)
-        r_is_disliked = False
-    else:
-        review.dislike_users.add(request.user)
-        r_is_disliked = True
+    r_is_disliked, review_dislikes_count = toggle_reaction(
+        review, "dislike_users", request.user
+    )
     context = {
         "r_is_disliked": r_is_disliked,
-        "review_dislikes_count": review.dislike_users.count(),
-        "r_is_liked": request.user in review.like_users.all(),
-        "review_likes_count": review.like_users.count(),
+        "review_dislikes_count": review_dislikes_count,
+        "r_is_liked": has_reacted(review, "like_users", request.user),
+        "review_likes_count": review.like_count,
     }
     return JsonResponse(context)
@@ -1,5 +1,38 @@
-import urllib.request
+"""
+에코 뉴스 검색 결과 캐시.
+
+- 요청 처리 중에는 외부 API 를 부르지 않고 캐시된 결과를 바로 돌려준다.
+- NEWS_CACHE_TTL 이 지난 결과도 그대로 보여주고, 갱신은 백그라운드 thread 에서
+  키워드마다 하나씩만 한다 (stale-while-revalidate).
+- 마지막으로 성공한 결과는 NEWS_CACHE_PATH 에 저장해 재시작하거나 API 가 실패해도
+  이전 뉴스를 보여준다.
+- NEWS_PROVIDER=stub 이면 네트워크 없이 고정된 결과를 쓴다.
+"""
+import json
+import logging
+import os
+import threading
+import time
 import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEYWORD = "친환경"
+EMPTY_RESULT = {"items": []}
+# 갱신에 실패하면 이 시간(초) 동안은 다시 시도하지 않음
+RETRY_AFTER = 60
+
+executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="news-refresh")
+
+_lock = threading.Lock()
+_cache = {}
+_refreshing = set()
+_failed_at = {}
+
 
 def search_naver_news(keyword):
     client_id = "jn1lIFp4CBHFiQdNmMqQ"
@@ -9,10 +42,88 @@ def search_naver_news(keyword):
     request = urllib.request.Request(url)
     request.add_header("X-Naver-Client-Id", client_id)
     request.add_header("X-Naver-Client-Secret", client_secret)
-    response = urllib.request.urlopen(request)
+    response = urllib.request.urlopen(request, timeout=settings.NEWS_TIMEOUT)
     rescode = response.getcode()
     if rescode == 200:
         response_body = response.read()
-        return response_body.decode('utf-8')
+        return response_body.decode("utf-8")
     else:
-        return "Error Code:" + rescode
+        return "Error Code:" + str(rescode)
+
+
+def stub_news(keyword):
+    items = [
+        {
+            "title": f"{keyword} 뉴스 {i}",
+            "link": f"https://example.com/news/{i}",
+            "description": f"{keyword} 관련 테스트용 기사입니다.",
+            "pubDate": "Mon, 01 Jan 2024 09:00:00 +0900",
+        }
+        for i in range(1, 11)
+    ]
+    return json.dumps({"items": items}, ensure_ascii=False)
+
+
+PROVIDERS = {
+    "naver": search_naver_news,
+    "stub": stub_news,
+}
+
+
+def _load():
+    try:
+        with open(settings.NEWS_CACHE_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save(keyword, entry):
+    path = str(settings.NEWS_CACHE_PATH)
+    with _lock:
+        saved = _load()
+        saved[keyword] = entry
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(saved, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+def refresh_news(keyword=DEFAULT_KEYWORD):
+    """provider 에서 다시 받아 캐시와 파일에 저장. 실패하면 예외를 그대로 올림"""
+    result = json.loads(PROVIDERS[settings.NEWS_PROVIDER](keyword))
+    if "items" not in result:
+        raise ValueError(f"뉴스 검색 결과에 items 가 없습니다: {result}")
+    entry = {"fetched_at": time.time(), "result": result}
+    _cache[keyword] = entry
+    _save(keyword, entry)
+    return result
+
+
+def _refresh_in_background(keyword):
+    try:
+        refresh_news(keyword)
+    except Exception:
+        logger.exception("뉴스 갱신 실패 (%s)", keyword)
+        _failed_at[keyword] = time.time()
+    finally:
+        with _lock:
+            _refreshing.discard(keyword)
+
+
+def get_news(keyword=DEFAULT_KEYWORD):
+    """캐시된 뉴스 검색 결과(dict). 오래됐거나 없으면 백그라운드 갱신을 예약"""
+    entry = _cache.get(keyword)
+    if entry is None:
+        entry = _load().get(keyword)
+        if entry is not None:
+            _cache[keyword] = entry
+
+    now = time.time()
+    stale = entry is None or now - entry["fetched_at"] > settings.NEWS_CACHE_TTL
+    if stale and now - _failed_at.get(keyword, 0) > RETRY_AFTER:
+        with _lock:
+            if keyword not in _refreshing:
+                _refreshing.add(keyword)
+                executor.submit(_refresh_in_background, keyword)
+    return entry["result"] if entry else EMPTY_RESULT
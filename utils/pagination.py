@@ -0,0 +1,60 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+
+def encode_cursor(obj):
+    value = json.dumps([obj.created_at.isoformat(), obj.pk])
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """잘못된 cursor 는 None (첫 페이지)"""
+    try:
+        value = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, pk = json.loads(value)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+
+
+def keyset_page(queryset, cursor=None, per_page=10):
+    """
+    (created_at, id) 내림차순으로 cursor 다음 per_page 개와 다음 페이지 cursor 를 반환.
+    OFFSET 이나 전체 COUNT 없이 (created_at, id) 인덱스를 타고 per_page + 1 개만 읽는다.
+    """
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        created_at, pk = position
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+    objects = list(queryset.order_by("-created_at", "-id")[: per_page + 1])
+    next_cursor = (
+        encode_cursor(objects[per_page - 1]) if len(objects) > per_page else None
+    )
+    return objects[:per_page], next_cursor
+
+
+def adjacent_objects(obj, queryset, field="created_at"):
+    """
+    (field, id) 순서에서 obj 바로 이전(더 오래된) 객체와 다음(더 최근) 객체.
+    시간이 같으면 id 로 순서를 정하고, (field, id) 복합 인덱스에서 한 번씩만 찾는다.
+    """
+    value = getattr(obj, field)
+    previous = (
+        queryset.filter(**{f"{field}__lte": value})
+        .exclude(**{field: value, "id__gte": obj.pk})
+        .order_by(f"-{field}", "-id")
+        .first()
+    )
+    next = (
+        queryset.filter(**{f"{field}__gte": value})
+        .exclude(**{field: value, "id__lte": obj.pk})
+        .order_by(field, "id")
+        .first()
+    )
+    return previous, next
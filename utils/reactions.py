@@ -0,0 +1,113 @@
+"""
+좋아요/싫어요 같은 반응(M2M)과 그 개수 컬럼을 함께 관리한다.
+
+M2M 필드 이름과 개수 컬럼은 COUNT_FIELDS 로 짝지어져 있다
+(like_users -> like_count, dislike_users -> dislike_count).
+토글은 through 테이블의 (대상, 사용자) unique 인덱스로 한 행만 지우거나 넣고,
+같은 트랜잭션에서 개수 컬럼을 F() 로 더하거나 빼므로 반응 수와 상관없이 일정한 비용이 든다.
+관리자 화면 등 이 모듈을 거치지 않은 변경으로 어긋난 개수는
+reconcile_reaction_counts 명령으로 다시 맞춘다.
+"""
+from django.apps import apps
+from django.db import IntegrityError, router, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+COUNT_FIELDS = {
+    "like_users": "like_count",
+    "dislike_users": "dislike_count",
+}
+
+# 개수 컬럼을 가진 (모델, M2M 필드)
+COUNTED_REACTIONS = [
+    ("posts.Post", "like_users"),
+    ("posts.Review", "like_users"),
+    ("posts.Review", "dislike_users"),
+    ("stores.ProductReview", "like_users"),
+    ("stores.ProductReview", "dislike_users"),
+    ("secondhands.S_Product", "like_users"),
+]
+
+
+def _through(model, field):
+    """through 모델과 (대상 쪽, 사용자 쪽) FK 컬럼 이름"""
+    m2m = model._meta.get_field(field)
+    return (
+        m2m.remote_field.through,
+        m2m.m2m_column_name(),
+        m2m.m2m_reverse_name(),
+    )
+
+
+def has_reacted(obj, field, user):
+    if not user.is_authenticated:
+        return False
+    through, source, target = _through(type(obj), field)
+    return through.objects.filter(**{source: obj.pk, target: user.pk}).exists()
+
+
+def toggle_reaction(obj, field, user):
+    """user 의 반응을 켜거나 끄고 (켜졌는지, 바뀐 개수)를 반환"""
+    model = type(obj)
+    through, source, target = _through(model, field)
+    count_field = COUNT_FIELDS[field]
+    rows = model.objects.filter(pk=obj.pk)
+    with transaction.atomic(using=router.db_for_write(model)):
+        deleted, _ = through.objects.filter(
+            **{source: obj.pk, target: user.pk}
+        ).delete()
+        if deleted:
+            reacted = False
+            # 어긋난 개수가 0 아래로 내려가 CHECK 제약에 걸리지 않도록
+            rows.update(**{count_field: Greatest(F(count_field) - deleted, 0)})
+        else:
+            reacted = True
+            try:
+                with transaction.atomic(using=router.db_for_write(model)):
+                    through.objects.create(**{source: obj.pk, target: user.pk})
+            except IntegrityError:
+                # 같은 사용자의 동시 요청이 먼저 넣은 경우
+                pass
+            else:
+                rows.update(**{count_field: F(count_field) + 1})
+        count = rows.values_list(count_field, flat=True).get()
+    return reacted, count
+
+
+def reconcile(model, field):
+    """개수 컬럼이 실제 반응 수와 다른 행을 고치고 고친 행 수를 반환"""
+    through, source, target = _through(model, field)
+    count_field = COUNT_FIELDS[field]
+    actual = Coalesce(
+        Subquery(
+            through.objects.filter(**{source: OuterRef("pk")})
+            .values(source)
+            .annotate(count=Count("pk"))
+            .values("count")
+        ),
+        0,
+    )
+    drifted = (
+        model.objects.annotate(actual=actual)
+        .exclude(**{count_field: F("actual")})
+        .values_list("pk", flat=True)
+    )
+    return model.objects.filter(pk__in=list(drifted)).update(**{count_field: actual})
+
+
+def counted_reactions():
+    for label, field in COUNTED_REACTIONS:
+        yield apps.get_model(label), field
+
+
+def reacted_ids(objects, field, user):
+    """objects 중 user 가 반응한 객체의 id 집합 (쿼리 한 번)"""
+    objects = list(objects)
+    if not objects or not user.is_authenticated:
+        return set()
+    through, source, target = _through(type(objects[0]), field)
+    return set(
+        through.objects.filter(
+            **{target: user.pk, f"{source}__in": [obj.pk for obj in objects]}
+        ).values_list(source, flat=True)
+    )
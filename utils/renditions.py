@@ -0,0 +1,149 @@
+"""
+업로드 이미지의 크기별 사본 (small/medium/large, JPEG 와 WebP).
+
+- add_renditions(Model, "image") 는 image_small, image_small_webp, image_medium, ...
+  ImageSpecField 를 모델에 붙인다.
+- 원본이 저장되면 사본은 commit 뒤 thread pool 에서 만들고(BackgroundStrategy),
+  화면에서는 파일이 있는지 확인하지 않고 URL 만 쓴다 (chat/thumbnails.py 와 같은 방식).
+  아직 만들어지지 않은 사본은 {% responsive_image %} 가 원본으로 대신 보여준다.
+- 객체가 삭제되거나 원본 파일이 바뀌면 이전 원본의 사본도 지운다.
+- 이미 올라와 있는 이미지는 python manage.py generate_renditions 로 미리 만든다.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.db import router, transaction
+from django.db.models.signals import post_delete, pre_save
+from imagekit.models import ImageSpecField
+from imagekit.processors import ResizeToFit
+
+logger = logging.getLogger(__name__)
+
+RENDITION_WIDTHS = {
+    "small": 320,
+    "medium": 640,
+    "large": 1280,
+}
+# 속성 이름 뒤에 붙는 접미사: (format, options)
+RENDITION_FORMATS = {
+    "": ("JPEG", {"quality": 85}),
+    "_webp": ("WEBP", {"quality": 80}),
+}
+
+# generate_renditions 명령이 훑는 (모델, 원본 필드 이름)
+RENDITION_FIELDS = []
+
+executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="renditions")
+
+
+def _generate(file):
+    # 요청에서 저장한 원본 파일 객체는 이미 닫혔거나 요청 thread 가 쓰고 있을 수
+    # 있으므로 storage 에서 새로 읽음
+    source = file.generator.source
+    file.generator.source = source.field.attr_class(
+        source.instance, source.field, source.name
+    )
+    try:
+        file.generate()
+    except Exception:
+        logger.exception("이미지 사본 생성 실패 (%s)", file.name)
+
+
+class BackgroundStrategy:
+    """원본이 저장되면 thread pool 에서 만들고, URL 조회 때는 확인/생성하지 않는 strategy"""
+
+    def on_source_saved(self, file):
+        transaction.on_commit(lambda: executor.submit(_generate, file))
+
+    def should_verify_existence(self, file):
+        return False
+
+
+def renditions(file, suffix=""):
+    """원본 FieldFile 의 사본을 [(가로 폭, ImageCacheFile), ...] 로 반환"""
+    return [
+        (width, getattr(file.instance, f"{file.field.name}_{size}{suffix}"))
+        for size, width in RENDITION_WIDTHS.items()
+    ]
+
+
+def all_renditions(file):
+    """JPEG, WebP 사본 전부"""
+    return [
+        spec for suffix in RENDITION_FORMATS for _, spec in renditions(file, suffix)
+    ]
+
+
+def _delete_files(specs):
+    for spec in specs:
+        if spec.storage.exists(spec.name):
+            spec.storage.delete(spec.name)
+
+
+def _delete_renditions(sender, instance, field_name, **kwargs):
+    file = getattr(instance, field_name)
+    if not file:
+        return
+    _delete_files(all_renditions(file))
+
+
+def _delete_replaced_renditions(
+    sender, instance, raw=False, update_fields=None, **kwargs
+):
+    """원본 파일이 바뀌거나 지워지면 commit 뒤 이전 원본의 사본을 지움"""
+    if raw or instance.pk is None:
+        return
+    field_names = [
+        name
+        for model, name in RENDITION_FIELDS
+        if model is sender and (update_fields is None or name in update_fields)
+    ]
+    if not field_names:
+        return
+    # 모델마다 원본 필드 전체를 한 번에 조회
+    saved = sender._default_manager.filter(pk=instance.pk).values(*field_names).first()
+    if saved is None:
+        return
+    replaced = {
+        name: saved[name]
+        for name in field_names
+        if saved[name] and saved[name] != getattr(instance, name).name
+    }
+    if not replaced:
+        return
+    # 사본 이름은 원본 파일 이름으로 정해지므로 이전 파일을 가진 객체로 계산
+    previous = sender(**replaced)
+    specs = [
+        spec for name in replaced for spec in all_renditions(getattr(previous, name))
+    ]
+    transaction.on_commit(
+        partial(_delete_files, specs), using=router.db_for_write(sender)
+    )
+
+
+def add_renditions(model, field_name):
+    for size, width in RENDITION_WIDTHS.items():
+        for suffix, (format, options) in RENDITION_FORMATS.items():
+            model.add_to_class(
+                f"{field_name}_{size}{suffix}",
+                ImageSpecField(
+                    source=field_name,
+                    processors=[ResizeToFit(width, upscale=False)],
+                    format=format,
+                    options=options,
+                    cachefile_strategy=BackgroundStrategy,
+                ),
+            )
+    RENDITION_FIELDS.append((model, field_name))
+    pre_save.connect(
+        _delete_replaced_renditions,
+        sender=model,
+        dispatch_uid=f"renditions_{model._meta.label}",
+    )
+    post_delete.connect(
+        partial(_delete_renditions, field_name=field_name),
+        sender=model,
+        weak=False,
+        dispatch_uid=f"renditions_{model._meta.label}_{field_name}",
+    )
@@ -0,0 +1,49 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from utils.renditions import renditions
+
+register = template.Library()
+
+# 사본이 아직 없으면 <source> 를 지우고 원본을 보여줌
+FALLBACK = (
+    "this.onerror=null;"
+    "this.parentNode.querySelectorAll('source').forEach((s) => s.remove());"
+    "this.removeAttribute('srcset');"
+    "this.src=this.dataset.fallback;"
+)
+
+
+@register.filter
+def srcset(file, format="jpeg"):
+    """{{ post_image.image|srcset }} / {{ post_image.image|srcset:"webp" }}"""
+    if not file:
+        return ""
+    suffix = "_webp" if format == "webp" else ""
+    return ", ".join(f"{spec.url} {width}w" for width, spec in renditions(file, suffix))
+
+
+@register.simple_tag
+def responsive_image(file, sizes="100vw", **attrs):
+    """
+    WebP 와 JPEG 사본의 srcset 을 가진 <picture>.
+    {% responsive_image product.image sizes="(max-width: 768px) 50vw, 25vw" class="image" alt="" %}
+    """
+    if not file:
+        return ""
+    attrs.setdefault("loading", "lazy")
+    medium = dict(renditions(file))[640]
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" data-fallback="{}" '
+        'onerror="{}"{}></picture>',
+        srcset(file, "webp"),
+        sizes,
+        medium.url,
+        srcset(file),
+        sizes,
+        file.url,
+        FALLBACK,
+        flatatt(attrs),
+    )